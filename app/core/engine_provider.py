@@ -0,0 +1,198 @@
+# app/core/engine_provider.py
+
+import logging
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from picsy_engine_prototype import PicsyEngine, PicsyUser
+from picsy_results import PublishedResults
+from picsy_scheduler import ContributionScheduler
+
+from .. import models
+from ..crud import crud_evaluation
+from .config import (DEFAULT_ALPHA_LIKE, DEFAULT_ALPHA_LIKE_MAX, DEFAULT_GAMMA_RATE,
+                     DEFAULT_MAX_ITERATIONS, DEFAULT_TOLERANCE, PICSY_CONTRIBUTION_UPDATE,
+                     PICSY_EVALUATION_FLUSH_SECONDS, PICSY_SOLVE_DEBOUNCE_SECONDS, PICSY_SOLVE_INTERVAL_SECONDS,
+                     PICSY_SOLVE_MAX_STALENESS_SECONDS, PICSY_SOLVE_POLICY, PICSY_STORAGE)
+
+logger = logging.getLogger(__name__)
+
+# APIプロセス内で共有する PicsyEngine。最初に必要になった時点で、DBの全ユーザーで作る。
+# エンジンはスレッドセーフではないので、読み書きは必ず engine_lock を取ってから行う。
+# 貢献度の計算は _scheduler のスレッドが engine_lock を取って行う。
+_engine: Optional[PicsyEngine] = None
+_scheduler: Optional[ContributionScheduler] = None
+engine_lock = threading.RLock()
+# 最後にDBへ書き戻した（または読み込んだ）評価行列の内容。書き戻しはこれとの差分だけを書く。
+_persisted_state: Optional[crud_evaluation.EvaluationState] = None
+# _persisted_state を作った時点のエンジンの変更の目印（_change_marker の値）
+_persisted_marker: Optional[tuple] = None
+_flush_lock = threading.Lock()
+# 評価行列を PICSY_EVALUATION_FLUSH_SECONDS 秒ごとに書き戻すスレッド（エンジンと一緒に作る）
+_flusher: Optional["EvaluationFlusher"] = None
+
+
+def to_picsy_user(user: models.User) -> PicsyUser:
+    """DBのユーザーをエンジンのユーザーに変換する（エンジン側のユーザーIDはDBのIDの文字列）"""
+    return PicsyUser(user_id=str(user.id), username=user.username)
+
+
+def get_engine(db: Session, required_user_ids: Iterable[int] = ()) -> PicsyEngine:
+    """
+    required_user_ids のユーザーが全て参加しているエンジンを返す。engine_lock を取った状態で呼ぶこと。
+    エンジンは最初に呼ばれたときに、DBの評価行列 (evaluations, user_budgets) を一括で読み込んで作る。
+    エンジンに未参加のユーザー（エンジン作成後に登録されたユーザー）は、この時点で追加する。
+    """
+    global _engine, _scheduler, _persisted_state, _persisted_marker, _flusher
+    if _engine is None:
+        users = db.query(models.User).order_by(models.User.id).all()
+        budgets, rows, cols, values, _persisted_state = crud_evaluation.load_evaluations(
+            db, [user.id for user in users])
+        _engine = PicsyEngine.from_evaluations(
+            [to_picsy_user(user) for user in users], budgets, rows, cols, values,
+            alpha_like_default=DEFAULT_ALPHA_LIKE,
+            alpha_like_max=DEFAULT_ALPHA_LIKE_MAX,
+            gamma_rate=DEFAULT_GAMMA_RATE,
+            max_iterations=DEFAULT_MAX_ITERATIONS,
+            tolerance=DEFAULT_TOLERANCE,
+            storage=PICSY_STORAGE,
+            contribution_update=PICSY_CONTRIBUTION_UPDATE,
+        )
+        _scheduler = ContributionScheduler(
+            _engine,
+            policy=PICSY_SOLVE_POLICY,
+            debounce=PICSY_SOLVE_DEBOUNCE_SECONDS,
+            max_staleness=PICSY_SOLVE_MAX_STALENESS_SECONDS,
+            interval=PICSY_SOLVE_INTERVAL_SECONDS,
+            lock=engine_lock,
+        )
+        _scheduler.start()
+        _persisted_marker = _change_marker()
+        _flusher = EvaluationFlusher(sessionmaker(bind=db.get_bind()), PICSY_EVALUATION_FLUSH_SECONDS)
+        _flusher.start()
+        return _engine
+
+    missing = {user_id for user_id in required_user_ids
+               if str(user_id) not in _engine.user_id_to_index}
+    if missing:
+        users = db.query(models.User).filter(
+            models.User.id.in_(missing)).order_by(models.User.id).all()
+        _engine.add_users([to_picsy_user(user) for user in users])
+    return _engine
+
+
+def get_published_results(db: Session, required_user_ids: Iterable[int] = ()) -> PublishedResults:
+    """
+    最新の公開済み計算結果を返す。公開結果は読み取り専用なので、通常はロックを取らずに読む。
+    エンジンが未作成のときと、required_user_ids に未参加のユーザーがいるときだけロックを取って追加する。
+    """
+    engine = _engine
+    if engine is not None:
+        published = engine.published
+        if all(str(user_id) in published.user_id_to_index for user_id in required_user_ids):
+            return published
+    with engine_lock:
+        return get_engine(db, required_user_ids).published
+
+
+def wait_for_fresh_results(timeout: Optional[float] = None) -> bool:
+    """
+    ここまでの「いいね」などを全て反映した貢献度の計算が終わるまで待つ（engine_lock を持たずに呼ぶこと）。
+    timeout 秒以内に終われば True。
+    """
+    scheduler = _scheduler
+    return scheduler is None or scheduler.wait_for_fresh(timeout)
+
+
+def _change_marker() -> tuple:
+    """
+    エンジンの評価行列が変わると変わる値。変更はスケジューラーへの通知か、その場での計算（公開）を伴う。
+    engine_lock を取った状態で呼ぶこと。
+    """
+    return _scheduler.mutation_count, _engine.published.version
+
+
+def flush_evaluations(db: Session) -> Dict[str, int]:
+    """
+    エンジンの評価行列をDBに書き戻す。前回の書き戻し（または読み込み）から変わった行だけを upsert する。
+    前回からエンジンへの変更が1つもなければ何もしない。
+    エンジンの内容は engine_lock を取ってコピーし、DBへの書き込みはロックを放してから行う。
+    """
+    global _persisted_state, _persisted_marker
+    with _flush_lock:
+        with engine_lock:
+            if _engine is None:
+                return {}
+            engine = _engine
+            marker = _change_marker()
+            if marker == _persisted_marker:
+                return {}
+            current = crud_evaluation.engine_evaluation_state(engine)
+            previous = _persisted_state
+        counts = crud_evaluation.write_evaluation_changes(db, previous, current)
+        with engine_lock:
+            if _engine is engine:  # 書き込み中に reset_engine された場合は基準を戻さない
+                _persisted_state = current
+                _persisted_marker = marker
+        return counts
+
+
+class EvaluationFlusher:
+    """
+    interval 秒ごとに flush_evaluations を呼ぶバックグラウンドのスレッド。
+    「いいね」の行はリクエストごとにコミットされるので、評価行列もこの間隔で書き戻しておき、
+    プロセスが異常終了したときに likes と evaluations / user_budgets の食い違いを小さくする。
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], interval: float):
+        if interval <= 0:
+            raise ValueError("intervalは0より大きい必要があります。")
+        self.session_factory = session_factory
+        self.interval: float = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="picsy-evaluation-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """スレッドを止める（書き戻しの途中なら終わるのを待つ）。"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.session_factory() as db:
+                    flush_evaluations(db)
+            except Exception:  # DBが一時的に使えなくても、次の間隔でもう一度書き戻す
+                logger.exception("評価行列の書き戻しに失敗しました。")
+
+
+def stop_evaluation_flusher():
+    """定期的な書き戻しを止める（終了時に最後の flush_evaluations を呼ぶ前に使う）。"""
+    flusher = _flusher
+    if flusher is not None:
+        flusher.stop()
+
+
+def reset_engine():
+    """
+    共有エンジンを破棄する（次に get_engine を呼んだときにDBから作り直される）。
+    書き戻していない評価行列の変更は失われるので、残す場合は先に flush_evaluations を呼ぶこと。
+    """
+    global _engine, _scheduler, _persisted_state, _persisted_marker, _flusher
+    stop_evaluation_flusher()  # 書き戻し中なら終わるのを待つので、engine_lock を取る前に止める
+    if _scheduler is not None:
+        _scheduler.detach()  # 計算中なら終わるのを待つので、engine_lock を取る前に止める
+    with engine_lock:
+        _engine = None
+        _scheduler = None
+        _flusher = None
+        _persisted_state = None
+        _persisted_marker = None
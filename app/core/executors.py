@@ -0,0 +1,59 @@
+# app/core/executors.py
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from .config import (DB_EXECUTOR_MAX_PENDING, DB_EXECUTOR_WORKERS, PASSWORD_HASH_MAX_PENDING,
+                     PASSWORD_HASH_WORKERS)
+
+T = TypeVar("T")
+
+
+class ExecutorBusyError(RuntimeError):
+    """executor の待ち行列が一杯で、これ以上の仕事を受け付けられないときに送出される（APIでは503になる）"""
+
+
+class BoundedExecutor:
+    """
+    イベントループを止めないように、同期処理を専用のスレッドで実行する executor。
+
+    同時に動かすスレッドの数 (max_workers) に加えて、実行中と待ち行列の仕事の合計 (max_pending) にも
+    上限を設ける。上限を超えた run() は待たずに ExecutorBusyError にするので、ログインが殺到しても
+    待ち行列が伸び続けず、他のAPI（「いいね」など）が使うスレッドやメモリを食いつぶさない。
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, thread_name_prefix: str):
+        if max_workers <= 0 or max_pending < max_workers:
+            raise ValueError("max_workersは1以上、max_pendingはmax_workers以上である必要があります。")
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.thread_name_prefix = thread_name_prefix
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """fn(*args, **kwargs) をスレッドで実行し、その結果を待つ。"""
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorBusyError(f"{self.thread_name_prefix} executor is busy")
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        # 呼び出し側がキャンセルされてもスレッドの処理は続くので、枠は処理が終わった時点で返す
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+
+# bcrypt によるパスワードのハッシュ化・照合（1回 100〜300ms のCPU処理）専用
+password_executor = BoundedExecutor(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, "password-hash")
+# async なエンドポイント・依存関係から同期の SQLAlchemy を呼ぶとき用
+db_executor = BoundedExecutor(DB_EXECUTOR_WORKERS, DB_EXECUTOR_MAX_PENDING, "db")
+
+
+async def run_in_db_executor(fn: Callable[..., T], *args, **kwargs) -> T:
+    """DBを使う同期関数を db_executor で実行する（Session は同時に1つのスレッドからしか使わないこと）"""
+    return await db_executor.run(fn, *args, **kwargs)
+
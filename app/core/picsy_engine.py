@@ -63,25 +63,45 @@ def calculate_E_prime(E_matrix, num_users):
         # N-1 でのゼロ除算を避けるためのチェック
         raise ValueError("ユーザー数は2以上である必要があります。")
 
-    # 1. 予算行列 B の作成
-    #    E_matrix の対角成分 (E_ii) を取り出し、それらを対角に持つ行列 B を作る
-    diagonal_elements_E = np.diag(E_matrix)  # E_matrix の対角成分を1次元配列として取得
-    B = np.diag(diagonal_elements_E)      # 1次元配列を対角行列に変換 (他の要素は0)
-
-    # 2. 分配行列 D の作成
-    #    D は対角成分が0で、非対角成分が1の N x N 行列
-    #    np.eye(num_users) は単位行列 (対角成分が1で他が0)
-    #    np.ones((num_users, num_users)) は全要素が1の行列
-    D = np.ones((num_users, num_users)) - np.eye(num_users)
-
-    # 3. E' の計算 (PICSY資料 式4.62)
-    #    B @ D は行列Bと行列Dの積 (Python 3.5+ の行列積演算子)
-    #    num_users - 1 で割る
-    E_prime_matrix = E_matrix - B + (B @ D) / (num_users - 1)
+    # 1. 予算ベクトルの取り出し
+    #    E_matrix の対角成分 (E_ii) が各ユーザーの予算
+    budgets = np.diag(E_matrix)  # E_matrix の対角成分を1次元配列として取得
+
+    # 2. E' の計算 (PICSY資料 式4.62)
+    #    式通りに B (予算の対角行列) と D (対角0・非対角1の行列) の積 B @ D を取ると O(N^3) かかるが、
+    #    B @ D は「予算_i を i 行の対角以外の全要素に並べた行列」に過ぎない。
+    #    そこで予算_i / (N-1) を i 行全体に足し、最後に対角成分 (予算 - 予算 + 分配分) を0に戻す。
+    E_prime_matrix = E_matrix + (budgets / (num_users - 1))[:, np.newaxis]
+    np.fill_diagonal(E_prime_matrix, 0.0)
 
     return E_prime_matrix
 
 
+def left_multiply_E_prime(c_vector, E_matrix, num_users):
+    """
+    E' を作らずに c @ E' を計算する (貢献度計算のべき乗法の1ステップ用)。
+
+    E' = (E の非対角部分) + (予算_i / (N-1) を i 行の対角以外に加えたもの) なので、
+    (c @ E')_j = (c @ E の非対角部分)_j + (Σ_i c_i * 予算_i - c_j * 予算_j) / (N - 1)
+    となり、E' の組み立てなしに O(N^2) (疎行列なら O(非ゼロ要素数 + N)) で計算できる。
+
+    Args:
+        c_vector (np.ndarray): 長さ N の貢献度ベクトル。
+        E_matrix (np.ndarray): N x N の評価行列。
+        num_users (int): 総ユーザー数 N。
+
+    Returns:
+        np.ndarray: c @ E' に等しい長さ N のベクトル。
+    """
+    if num_users <= 1:
+        raise ValueError("ユーザー数は2以上である必要があります。")
+
+    budgets = np.diag(E_matrix)
+    weighted_budgets = c_vector * budgets
+    offdiag_product = c_vector @ E_matrix - weighted_budgets  # c @ (E - B)
+    return offdiag_product + (np.sum(weighted_budgets) - weighted_budgets) / (num_users - 1)
+
+
 # --- 2. E から E' への変換 ---
 print("\n[ステップ2: E から E' への変換 (仮想中央銀行法)]")
 
@@ -123,6 +143,13 @@ try:
     if valid_E_prime:
         print("検証OK: E'^(0) は期待値と一致し、対角成分はほぼ0、行和はほぼ1です。")
 
+    # E' を作らない c @ E' の計算が、E' との行列積と一致するかを確認
+    c_test = np.ones(NUM_USERS)
+    if np.allclose(left_multiply_E_prime(c_test, E, NUM_USERS), c_test @ E_prime0):
+        print("検証OK: E' を作らない c @ E' の計算結果が c @ E'^(0) と一致します。")
+    else:
+        print("警告: E' を作らない c @ E' の計算結果が c @ E'^(0) と一致しません。")
+
 except ValueError as e:
     print(f"エラー: E' の計算中に問題が発生しました - {e}")
 
@@ -6,6 +6,7 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from .config import SECRET_KEY, ALGORITHM
+from .executors import password_executor
 
 # パスワードのハッシュ化方式としてbcryptを指定
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -21,6 +22,16 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password を password_executor のスレッドで実行する（イベントループを止めない）"""
+    return await password_executor.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash を password_executor のスレッドで実行する（イベントループを止めない）"""
+    return await password_executor.run(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """JWTアクセストークンを作成する"""
     to_encode = data.copy()
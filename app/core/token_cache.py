@@ -0,0 +1,160 @@
+# app/core/token_cache.py
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .. import models
+from .config import ACCESS_TOKEN_EXPIRE_MINUTES, TOKEN_CACHE_MAX_ENTRIES
+
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """認証済みユーザー（DBのセッションに結び付かないので、キャッシュしてリクエスト間で共有できる）"""
+    id: int
+    username: str
+    email: str
+
+    @classmethod
+    def from_model(cls, user: models.User) -> "AuthenticatedUser":
+        return cls(id=user.id, username=user.username, email=user.email)
+
+
+class TokenCache:
+    """
+    検証済みのアクセストークンと、そのユーザーを覚えておく TTL 付きの LRU キャッシュ。
+
+    - キーはトークンそのものではなく、その sha256 ダイジェスト（メモリ上にトークンを残さない）。
+    - 各エントリーはトークンの有効期限 (exp) と ttl_seconds（既定は ACCESS_TOKEN_EXPIRE_MINUTES）の
+      早い方で期限切れになる。max_entries を超えたら最も長く使われていないものから捨てる。
+    - 同じトークンは署名も中身も同じなので、ヒットした場合は JWT の検証もDBの検索も省ける。
+    - ユーザーが変更・削除されたら invalidate_user() でそのユーザーのエントリーを全て消す
+      （ORM のセッションで User を更新・削除したときは自動で呼ばれる。query(User).update() などの
+      一括更新・一括削除では対象のユーザーが分からないので、キャッシュ全体を消す。
+      Session を通さない Core の update/delete 文では呼ばれないので、その場合は自分で呼ぶこと）。
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = ACCESS_TOKEN_EXPIRE_MINUTES * 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[bytes, Tuple[AuthenticatedUser, float]]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[AuthenticatedUser]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, expires_at = entry
+            if time.monotonic() >= expires_at:
+                self._remove(key, user.id)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return user
+
+    def put(self, token: str, user: AuthenticatedUser, token_expires_at: Optional[float] = None):
+        """
+        検証済みのトークンを登録する。token_expires_at はトークンの exp（UNIX時刻の秒）。
+        """
+        ttl = self.ttl_seconds
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+        if ttl <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, self._entries[key][0].id)
+            self._entries[key] = (user, time.monotonic() + ttl)
+            self._keys_by_user.setdefault(user.id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                old_key, (old_user, _) = next(iter(self._entries.items()))
+                self._remove(old_key, old_user.id)
+                self.evictions += 1
+
+    def _remove(self, key: bytes, user_id: int):
+        del self._entries[key]
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    def invalidate_token(self, token: str):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._remove(key, entry[0].id)
+                self.invalidations += 1
+
+    def invalidate_user(self, user_id: int):
+        """ユーザーのトークンを全てキャッシュから消す（次のリクエストでDBから読み直す）"""
+        with self._lock:
+            for key in self._keys_by_user.pop(user_id, set()):
+                del self._entries[key]
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# APIプロセス内で共有するキャッシュ
+token_cache = TokenCache()
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: models.User):
+    """ユーザーが更新・削除されたら、そのユーザーのキャッシュ済みトークンを無効にする"""
+    token_cache.invalidate_user(target.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk_changed_users(orm_execute_state):
+    """
+    query(User).update() / delete() や update(User) 文の一括実行ではマッパーのイベントが呼ばれないので、
+    User が対象ならキャッシュ全体を消す。
+    """
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if any(mapper.class_ is models.User for mapper in orm_execute_state.all_mappers):
+        token_cache.clear()
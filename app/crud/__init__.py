@@ -0,0 +1,3 @@
+# app/crud/__init__.py
+
+from . import crud_user, crud_content, crud_like, crud_evaluation
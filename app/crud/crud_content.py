@@ -1,17 +1,62 @@
 # app/crud/crud_content.py
 
-from sqlalchemy.orm import Session
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, joinedload
 from .. import models, schemas
 
 
 def get_content(db: Session, content_id: int):
     """IDを指定してコンテンツを1件取得する"""
-    return db.query(models.Content).filter(models.Content.id == content_id).first()
+    return (db.query(models.Content)
+            .options(joinedload(models.Content.creator))
+            .filter(models.Content.id == content_id)
+            .first())
+
+
+def encode_cursor(content: models.Content) -> str:
+    """一覧の次のページの開始位置を表すカーソル（最後に返したコンテンツの created_at と id）を作る"""
+    payload = json.dumps([content.created_at.isoformat(), content.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """encode_cursor で作ったカーソルを (created_at, id) に戻す。不正なカーソルなら ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, content_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(content_id)
+    except (TypeError, ValueError) as exc:  # binascii.Error と JSONDecodeError は ValueError の派生
+        raise ValueError("Invalid cursor") from exc
 
 
-def get_contents(db: Session, skip: int = 0, limit: int = 100):
-    """コンテンツの一覧を取得する"""
-    return db.query(models.Content).offset(skip).limit(limit).all()
+def get_contents(db: Session, limit: int = 100,
+                 cursor: Optional[str] = None) -> Tuple[List[models.Content], Optional[str]]:
+    """
+    コンテンツの一覧を新しい順に取得し、(コンテンツのリスト, 次のページのカーソル) を返す。
+    OFFSET ではなく (created_at, id) のキーセットで続きを取るので、どのページも
+    ix_contents_created_at_id を辿るだけで済み、作成者も JOIN で同時に読むのでクエリは常に1回。
+    最後のページでは次のカーソルは None になる。
+    """
+    query = db.query(models.Content).options(joinedload(models.Content.creator))
+    if cursor is not None:
+        created_at, content_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            models.Content.created_at < created_at,
+            and_(models.Content.created_at == created_at, models.Content.id < content_id),
+        ))
+    # 1件多く取り、続きがあるかどうかを判定する
+    rows = (query.order_by(models.Content.created_at.desc(), models.Content.id.desc())
+            .limit(limit + 1)
+            .all())
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
 
 
 def create_user_content(db: Session, content: schemas.ContentCreate, user_id: int):
@@ -0,0 +1,192 @@
+# app/crud/crud_evaluation.py
+
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import and_, bindparam, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from picsy_engine_prototype import PicsyEngine
+
+from .. import models
+
+
+@dataclass(frozen=True)
+class EvaluationState:
+    """
+    DBのユーザーIDで表した評価行列の内容。最後に書き戻した時点の内容を覚えておき、
+    次の書き戻しでは今の内容との差分（変わった行）だけを書き込む。
+    """
+    keys: np.ndarray     # 他者評価のキー (from_user_id << 32 | to_user_id の uint64) の昇順
+    values: np.ndarray   # keys と同じ並びの評価値
+    user_ids: np.ndarray  # 予算を持つユーザーIDの昇順
+    budgets: np.ndarray  # user_ids と同じ並びの予算（DBに行がなければ、読み込み時と同じ既定値の1）
+
+
+MAX_PACKED_USER_ID = 2 ** 32 - 1  # 他者評価のキーに詰められるユーザーIDの上限
+
+
+def _edge_keys(from_ids: np.ndarray, to_ids: np.ndarray) -> np.ndarray:
+    """
+    (from_user_id, to_user_id) を1つの uint64 にまとめる。並びは (from, to) の辞書順と同じ。
+    IDが 0..MAX_PACKED_USER_ID に収まらないと別の組と重なるので、その場合は ValueError。
+    """
+    from_ids = np.asarray(from_ids, dtype=np.int64)
+    to_ids = np.asarray(to_ids, dtype=np.int64)
+    for ids in (from_ids, to_ids):
+        if len(ids) and (ids.min() < 0 or ids.max() > MAX_PACKED_USER_ID):
+            raise ValueError(f"評価行列のユーザーIDは0以上 {MAX_PACKED_USER_ID} 以下である必要があります。")
+    return (from_ids.astype(np.uint64) << np.uint64(32)) | to_ids.astype(np.uint64)
+
+
+def _split_keys(keys: np.ndarray) -> Tuple[list, list]:
+    """_edge_keys の逆。(from_user_id のリスト, to_user_id のリスト) を返す。"""
+    keys = np.asarray(keys, dtype=np.uint64)
+    return (keys >> np.uint64(32)).tolist(), (keys & np.uint64(MAX_PACKED_USER_ID)).tolist()
+
+
+def _sorted_state(from_ids, to_ids, values, user_ids, budgets) -> EvaluationState:
+    keys = _edge_keys(from_ids, to_ids)
+    order = np.argsort(keys, kind="stable")
+    user_order = np.argsort(user_ids, kind="stable")
+    return EvaluationState(keys=keys[order], values=np.asarray(values, dtype=float)[order],
+                           user_ids=np.asarray(user_ids, dtype=np.int64)[user_order],
+                           budgets=np.asarray(budgets, dtype=float)[user_order])
+
+
+def _stream_columns(db: Session, statement, num_columns: int, chunk_size: int):
+    """
+    statement の結果を yield_per で chunk_size 行ずつ読み、各列の NumPy 配列を返す。
+    行ごとに Python のオブジェクトを作り足していかず、チャンク単位で配列に変換する。
+    ORM の結果処理を通さないように、セッションの接続で Core として実行する（約2倍速い）。
+    """
+    chunks = []
+    result = db.connection().execute(statement.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        flat = np.fromiter(chain.from_iterable(partition), dtype=float, count=num_columns * len(partition))
+        chunks.append(flat.reshape(-1, num_columns))
+    if not chunks:
+        return [np.empty(0) for _ in range(num_columns)]
+    table = np.concatenate(chunks)
+    return [table[:, k] for k in range(num_columns)]
+
+
+def load_evaluations(db: Session, user_ids: Sequence[int], chunk_size: int = 50000):
+    """
+    user_ids のユーザー（この並びがエンジンのインデックスになる）の評価行列をDBから読み込み、
+    (予算ベクトル, rows, cols, values, 読み込んだ内容の EvaluationState) を返す。
+    user_ids に含まれないユーザーが関わる評価は読み飛ばす。予算の行がないユーザーの予算は1。
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    num_users = len(user_ids)
+    index_of = np.full(int(user_ids.max()) + 1 if num_users else 0, -1, dtype=np.int64)
+    index_of[user_ids] = np.arange(num_users)
+
+    def to_index(ids: np.ndarray) -> np.ndarray:
+        ids = ids.astype(np.int64)
+        indices = np.full(len(ids), -1, dtype=np.int64)
+        in_range = (ids >= 0) & (ids < len(index_of))
+        indices[in_range] = index_of[ids[in_range]]
+        return indices
+
+    budget_user_ids, budget_values = _stream_columns(
+        db, select(models.UserBudget.user_id, models.UserBudget.budget), 2, chunk_size)
+    budget_index = to_index(budget_user_ids)
+    known = budget_index >= 0
+    budgets = np.ones(num_users, dtype=float)
+    budgets[budget_index[known]] = budget_values[known]
+
+    from_ids, to_ids, values = _stream_columns(
+        db, select(models.Evaluation.from_user_id, models.Evaluation.to_user_id, models.Evaluation.value),
+        3, chunk_size)
+    rows, cols = to_index(from_ids), to_index(to_ids)
+    known = (rows >= 0) & (cols >= 0)
+    rows, cols, values = rows[known], cols[known], values[known]
+
+    # 予算の行がないユーザーは1が書き込まれていたものとして扱い、1のままなら書き戻さない
+    state = _sorted_state(user_ids[rows], user_ids[cols], values, user_ids, budgets)
+    return budgets, rows, cols, values, state
+
+
+def engine_evaluation_state(engine: PicsyEngine) -> EvaluationState:
+    """エンジンの今の評価行列を EvaluationState にする（エンジン側のユーザーIDはDBのIDの文字列）"""
+    budgets, rows, cols, values = engine.export_evaluations()
+    user_ids = np.array([int(user.user_id) for user in engine.users], dtype=np.int64)
+    return _sorted_state(user_ids[rows], user_ids[cols], values, user_ids, budgets)
+
+
+def _diff(previous_keys, previous_values, current_keys, current_values) -> Tuple[np.ndarray, np.ndarray]:
+    """current のうち previous から追加・変更された位置と、previous にしかないキーを返す"""
+    if len(previous_keys) == 0:
+        return np.arange(len(current_keys)), previous_keys
+    pos = np.minimum(np.searchsorted(previous_keys, current_keys), len(previous_keys) - 1)
+    found = previous_keys[pos] == current_keys
+    changed = np.flatnonzero(~found | (previous_values[pos] != current_values))
+    removed = previous_keys[~np.isin(previous_keys, current_keys, assume_unique=True)]
+    return changed, removed
+
+
+def _upsert(db: Session, model, index_elements, value_column: str, rows: list):
+    """
+    主キーが同じ行があれば値を更新し、なければ挿入する。PostgreSQL と SQLite は ON CONFLICT で、
+    それ以外のDBは同じ主キーの行を削除してから挿入し直す（同じトランザクションの中で行う）。
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        statement = postgresql.insert(model)
+    elif dialect == "sqlite":
+        statement = sqlite.insert(model)
+    else:
+        table = model.__table__
+        db.execute(delete(table).where(and_(*(table.c[column] == bindparam(f"b_{column}")
+                                              for column in index_elements))),
+                   [{f"b_{column}": row[column] for column in index_elements} for row in rows])
+        db.execute(insert(table), rows)
+        return
+    statement = statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={value_column: statement.excluded[value_column], "updated_at": func.now()})
+    db.execute(statement, rows)
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def write_evaluation_changes(db: Session, previous: EvaluationState, current: EvaluationState,
+                             chunk_size: int = 50000) -> Dict[str, int]:
+    """
+    previous（前回書き戻した内容）から変わった評価・予算の行だけを upsert し、
+    なくなった行を削除して1回コミットする。書き込んだ行数を返す。
+    """
+    changed, removed = _diff(previous.keys, previous.values, current.keys, current.values)
+    evaluation_rows = [
+        {"from_user_id": from_id, "to_user_id": to_id, "value": value}
+        for from_id, to_id, value in zip(*_split_keys(current.keys[changed]), current.values[changed].tolist())
+    ]
+    for rows in _chunks(evaluation_rows, chunk_size):
+        _upsert(db, models.Evaluation, ["from_user_id", "to_user_id"], "value", rows)
+    if len(removed):
+        table = models.Evaluation.__table__
+        statement = delete(table).where(table.c.from_user_id == bindparam("b_from"),
+                                        table.c.to_user_id == bindparam("b_to"))
+        removed_from, removed_to = _split_keys(removed)
+        removed_rows = [{"b_from": from_id, "b_to": to_id} for from_id, to_id in zip(removed_from, removed_to)]
+        for rows in _chunks(removed_rows, chunk_size):
+            db.execute(statement, rows)
+
+    changed_users, removed_users = _diff(previous.user_ids, previous.budgets, current.user_ids, current.budgets)
+    budget_rows = [{"user_id": user_id, "budget": budget}
+                   for user_id, budget in zip(current.user_ids[changed_users].tolist(),
+                                              current.budgets[changed_users].tolist())]
+    if budget_rows:
+        _upsert(db, models.UserBudget, ["user_id"], "budget", budget_rows)
+    if len(removed_users):
+        db.execute(delete(models.UserBudget).where(models.UserBudget.user_id.in_(removed_users.tolist())))
+    db.commit()
+    return {"evaluations_upserted": len(evaluation_rows), "evaluations_deleted": len(removed),
+            "budgets_upserted": len(budget_rows), "budgets_deleted": len(removed_users)}
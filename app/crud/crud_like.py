@@ -0,0 +1,37 @@
+# app/crud/crud_like.py
+
+from typing import Dict, List
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from .. import models
+
+
+def get_creator_ids(db: Session, content_ids: List[int]) -> Dict[int, int]:
+    """コンテンツIDから作成者IDへの対応を1回のクエリで取得する（存在しないIDは含まれない）"""
+    rows = db.execute(
+        select(models.Content.id, models.Content.creator_id)
+        .where(models.Content.id.in_(set(content_ids)))
+    )
+    return {content_id: creator_id for content_id, creator_id in rows}
+
+
+def create_like(db: Session, user_id: int, content_id: int, accepted: bool, alpha_used: float = None):
+    """「いいね」を1件記録する"""
+    db_like = models.Like(user_id=user_id, content_id=content_id,
+                          accepted=accepted, alpha_used=alpha_used)
+    db.add(db_like)
+    db.commit()
+    db.refresh(db_like)
+    return db_like
+
+
+def create_likes_bulk(db: Session, rows: List[dict]):
+    """
+    「いいね」をまとめて記録する。1つのトランザクションの中で executemany として
+    一括 INSERT するので、件数に関わらずコミットは1回だけになる。
+    rows は user_id, content_id, accepted, alpha_used を持つ dict のリスト。
+    """
+    if rows:
+        db.execute(insert(models.Like), rows)
+    db.commit()
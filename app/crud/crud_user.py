@@ -0,0 +1,38 @@
+# app/crud/crud_user.py
+
+from typing import Optional
+
+from sqlalchemy.orm import Session
+from .. import models, schemas
+from ..core.security import get_password_hash
+
+
+def get_user(db: Session, user_id: int):
+    """IDを指定してユーザーを1件取得する"""
+    return db.query(models.User).filter(models.User.id == user_id).first()
+
+
+def get_user_by_email(db: Session, email: str):
+    """メールアドレスを指定してユーザーを1件取得する"""
+    return db.query(models.User).filter(models.User.email == email).first()
+
+
+def get_user_by_username(db: Session, username: str):
+    """ユーザー名を指定してユーザーを1件取得する"""
+    return db.query(models.User).filter(models.User.username == username).first()
+
+
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: Optional[str] = None):
+    """
+    パスワードをハッシュ化して新しいユーザーを作成する。
+    hashed_password を渡した場合は（呼び出し側で別スレッドでハッシュ化済みとして）それを使う。
+    """
+    db_user = models.User(
+        username=user.username,
+        email=user.email,
+        hashed_password=hashed_password if hashed_password is not None else get_password_hash(user.password),
+    )
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
@@ -1,15 +1,58 @@
 # app/database.py
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-from .core.config import DATABASE_URL
+from .core.config import (DATABASE_URL, DB_MAX_OVERFLOW, DB_POOL_PRE_PING, DB_POOL_RECYCLE_SECONDS,
+                          DB_POOL_SIZE, DB_POOL_TIMEOUT_SECONDS, SQLITE_BUSY_TIMEOUT_MS,
+                          SQLITE_JOURNAL_MODE, SQLITE_MMAP_SIZE, SQLITE_SYNCHRONOUS)
+
+
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    """SQLite の接続ごとに PRAGMA を設定する（engine の "connect" イベントから呼ばれる）"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={int(SQLITE_MMAP_SIZE)}")
+    cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+
+def create_db_engine(url: str = DATABASE_URL) -> Engine:
+    """
+    接続先に合わせてSQLAlchemyのエンジンを作成する。
+    SQLite はスレッドをまたいで接続を使えるようにし、接続ごとに PRAGMA を設定する（メモリ上のDBは除く）。
+    それ以外（PostgreSQLなど）は接続プールの大きさ・pre-ping・recycle を設定する。
+    """
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        return create_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            pool_recycle=DB_POOL_RECYCLE_SECONDS,
+        )
+
+    connect_args = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    if url.database in (None, "", ":memory:"):
+        return create_engine(url, connect_args=connect_args)
+    sqlite_engine = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+    )
+    event.listen(sqlite_engine, "connect", configure_sqlite_connection)
+    return sqlite_engine
+
 
 # SQLAlchemyのデータベースエンジンを作成
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+engine = create_db_engine()
 
 # データベースセッションを作成するためのクラス
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -1,15 +1,56 @@
-# app/main.py (中盤部分)
+# app/main.py
 
-# ... (Base.metadata.create_all(...) の後) ...
+from contextlib import asynccontextmanager
 
-from .routers import auth, users, contents  # contentsを追加
-app = FastAPI(...)
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from . import models  # noqa: F401  テーブル定義を Base.metadata に登録するためにインポート
+from .core.engine_provider import flush_evaluations, stop_evaluation_flusher
+from .core.executors import ExecutorBusyError
+from .database import Base, SessionLocal, engine
+from .routers import auth, users, contents, likes, leaderboard
+
+# データベースにテーブルを作成する（既に存在するテーブルはそのまま）
+Base.metadata.create_all(bind=engine)
+# 既存のテーブルに後から追加したインデックスは create_all では作られないので、無ければ作る
+for table in Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # 実行中は EvaluationFlusher が定期的に書き戻している。終了時にはそれを止めてから、
+    # 最後の書き戻し以降に変わった分をDBに書き戻す（次の起動時にここから読み込む）
+    stop_evaluation_flusher()
+    with SessionLocal() as db:
+        flush_evaluations(db)
+
+
+app = FastAPI(
+    title="PICSY-TrustLike API",
+    description="PICSYモデルを応用した「いいね」ベースの評価貨幣システム",
+    lifespan=lifespan,
+)
+
+
+@app.exception_handler(ExecutorBusyError)
+async def executor_busy_handler(request: Request, exc: ExecutorBusyError):
+    """パスワード照合などの待ち行列が一杯のときは、少し待ってから再試行してもらう"""
+    return JSONResponse(status_code=503, content={"detail": "Server is busy, please retry"},
+                        headers={"Retry-After": "1"})
 
 # --- APIルーターのインクルード ---
+# プレフィックスとタグは各ルーター側で定義している
+app.include_router(auth.router)
+app.include_router(users.router)
+app.include_router(contents.router)
+app.include_router(likes.router)
+app.include_router(leaderboard.router)
 
-app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
-app.include_router(users.router, prefix="/users", tags=["Users"])
-app.include_router(contents.router, prefix="/contents",
-                   tags=["Contents"])  # この行を追加
 
-# ... (ルートエンドポイントの定義はそのまま) ...
+@app.get("/")
+def read_root():
+    return {"message": "PICSY-TrustLike API へようこそ"}
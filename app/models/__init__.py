@@ -2,5 +2,5 @@
 
 from .user import User
 from .content import Content
-# 将来的にLikeモデルなどを追加
-# from .like import Like
+from .like import Like
+from .evaluation import Evaluation, UserBudget
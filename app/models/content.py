@@ -1,11 +1,17 @@
 # app/models/content.py
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
 from ..database import Base
 
+# SQLite には日時型がなく文字列で保存されるので、server_default (CURRENT_TIMESTAMP) と同じ
+# "YYYY-MM-DD HH:MM:SS" 形式でバインドする。既定の形式だとマイクロ秒が付き、カーソルとの比較がずれる。
+SQLITE_TIMESTAMP = sqlite.DATETIME(
+    storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d")
+
 
 class Content(Base):
     __tablename__ = "contents"
@@ -17,9 +23,15 @@ class Content(Base):
     # 外部キー制約: usersテーブルのidカラムと関連付ける
     creator_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True).with_variant(SQLITE_TIMESTAMP, "sqlite"),
+                        server_default=func.now())
     updated_at = Column(DateTime(timezone=True),
                         server_default=func.now(), onupdate=func.now())
 
     # Userモデルとのリレーションシップ（関連付け）を定義
     creator = relationship("User", back_populates="contents")
+
+    # 一覧のカーソルページング (created_at, id) の降順走査に使う複合インデックス
+    __table_args__ = (
+        Index("ix_contents_created_at_id", "created_at", "id"),
+    )
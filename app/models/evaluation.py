@@ -0,0 +1,32 @@
+# app/models/evaluation.py
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer
+from sqlalchemy.sql import func
+
+from ..database import Base
+
+
+class Evaluation(Base):
+    """
+    PICSYエンジンの評価行列Eの非対角成分（from_user_id から to_user_id への評価）。
+    値が0の要素は持たない疎な表現で、対角成分（予算）は UserBudget に分けて持つ。
+    """
+    __tablename__ = "evaluations"
+
+    from_user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    to_user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    value = Column(Float, nullable=False)
+
+    updated_at = Column(DateTime(timezone=True),
+                        server_default=func.now(), onupdate=func.now())
+
+
+class UserBudget(Base):
+    """PICSYエンジンの評価行列Eの対角成分（ユーザーの予算）。行のないユーザーの予算は1とみなす"""
+    __tablename__ = "user_budgets"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    budget = Column(Float, nullable=False)
+
+    updated_at = Column(DateTime(timezone=True),
+                        server_default=func.now(), onupdate=func.now())
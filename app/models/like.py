@@ -0,0 +1,26 @@
+# app/models/like.py
+
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from ..database import Base
+
+
+class Like(Base):
+    __tablename__ = "likes"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # 「いいね」したユーザーと、「いいね」されたコンテンツ
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    content_id = Column(Integer, ForeignKey("contents.id"), index=True, nullable=False)
+
+    # PICSYエンジンが評価移転を行ったか（予算不足などで拒否された場合は False）と、移転した評価量
+    accepted = Column(Boolean, nullable=False, default=True)
+    alpha_used = Column(Float, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    user = relationship("User")
+    content = relationship("Content")
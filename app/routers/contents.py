@@ -1,10 +1,12 @@
 # app/routers/contents.py
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from .. import crud, models, schemas
+from .. import crud, schemas
+from ..core.engine_provider import engine_lock, get_engine
+from ..core.token_cache import AuthenticatedUser
 from ..dependencies import get_db
 from .auth import get_current_user  # 認証済みユーザーを取得する依存関係をインポート
 
@@ -18,7 +20,7 @@ router = APIRouter(
 def create_content(
     content: schemas.ContentCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)  # 認証を要求
+    current_user: AuthenticatedUser = Depends(get_current_user)  # 認証を要求
 ):
     """
     認証済みユーザーとして新しいコンテンツを投稿する。
@@ -27,11 +29,23 @@ def create_content(
 
 
 @router.get("/", response_model=List[schemas.Content])
-def read_contents(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_contents(
+    response: Response,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
     """
-    コンテンツの一覧を取得する。
+    コンテンツの一覧を新しい順に取得する。
+    続きがある場合はレスポンスの X-Next-Cursor ヘッダーにカーソルが入るので、
+    次のページはそれを cursor に指定して取得する（ページが深くてもクエリのコストは変わらない）。
     """
-    contents = crud.crud_content.get_contents(db, skip=skip, limit=limit)
+    try:
+        contents, next_cursor = crud.crud_content.get_contents(db, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
     return contents
 
 
@@ -44,3 +58,41 @@ def read_content(content_id: int, db: Session = Depends(get_db)):
     if db_content is None:
         raise HTTPException(status_code=404, detail="Content not found")
     return db_content
+
+
+@router.post("/{content_id}/like", response_model=schemas.Like)
+def like_content(
+    content_id: int,
+    db: Session = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)  # 認証を要求
+):
+    """
+    認証済みユーザーとしてコンテンツに「いいね」し、PICSYエンジンでコンテンツ作成者へ評価を移転する。
+    自分のコンテンツへの「いいね」や予算不足の場合も記録はされ、accepted が false になる。
+    エンジンで予算を予約してから「いいね」の行をDBにコミットし、コミットできたら予約した「いいね」を
+    エンジンに適用する。DBへの書き込みに失敗したときは予約を取り消すので、エンジンは変わらない。
+    DBへの書き込みの間は engine_lock を持たない。
+    """
+    db_content = crud.crud_content.get_content(db, content_id=content_id)
+    if db_content is None:
+        raise HTTPException(status_code=404, detail="Content not found")
+
+    liker_id = str(current_user.id)
+    creator_id = str(db_content.creator_id)
+    with engine_lock:
+        engine = get_engine(db, [current_user.id, db_content.creator_id])
+        accepted, alpha = engine.reserve_likes(liker_id, [creator_id])
+    accepted = bool(accepted[0])
+    committed = False
+    try:
+        db_like = crud.crud_like.create_like(
+            db, user_id=current_user.id, content_id=content_id,
+            accepted=accepted, alpha_used=alpha if accepted else None)
+        committed = True
+    finally:
+        with engine_lock:
+            if committed:
+                engine.apply_reserved_likes(liker_id, [creator_id] if accepted else [], alpha)
+            else:
+                engine.release_likes(liker_id, alpha, int(accepted))
+    return db_like
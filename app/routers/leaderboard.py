@@ -0,0 +1,37 @@
+# app/routers/leaderboard.py
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy.orm import Session
+
+from .. import schemas
+from ..core.engine_provider import get_published_results
+from ..dependencies import get_db
+from .users import etag_matches, to_user_status
+
+router = APIRouter(
+    prefix="/leaderboard",
+    tags=["Leaderboard"]
+)
+
+
+@router.get("/", response_model=schemas.LeaderboardPage)
+def read_leaderboard(
+    request: Request,
+    response: Response,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    貢献度の高い順にユーザーを取得する（ダッシュボードの「トップコントリビューター」用）。
+    offset と limit で順位によるページングができる。ETag / If-None-Match に対応する。
+    """
+    published = get_published_results(db)
+    if etag_matches(request, response, published.etag):
+        return Response(status_code=304, headers={"ETag": published.etag})
+    entries = published.get_top(limit, offset)
+    return schemas.LeaderboardPage(
+        version=published.version,
+        total=len(published),
+        offset=offset,
+        entries=[to_user_status(entry, published.version, schemas.LeaderboardEntry) for entry in entries])
@@ -0,0 +1,59 @@
+# app/routers/likes.py
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from .. import crud, schemas
+from ..core.engine_provider import engine_lock, get_engine
+from ..core.token_cache import AuthenticatedUser
+from ..dependencies import get_db
+from .auth import get_current_user
+
+router = APIRouter(
+    tags=["Likes"]
+)
+
+
+@router.post("/likes:batch", response_model=schemas.LikeBatchResult)
+def like_contents_batch(
+    batch: schemas.LikeBatchCreate,
+    db: Session = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """
+    認証済みユーザーとして複数のコンテンツにまとめて「いいね」する。
+    エンジンには perform_likes_batch で1回で適用し（貢献度はバックグラウンドでまとめて計算し直す）、
+    DBには1つのトランザクションで一括 INSERT する。
+    存在しないコンテンツや自分のコンテンツへの「いいね」、予算不足の「いいね」は拒否される。
+    エンジンで予算を予約してからDBにコミットし、コミットできたら予約した「いいね」をエンジンに適用する。
+    DBへの書き込みに失敗したときは予約を取り消すので、エンジンは変わらない
+    （DBへの書き込みの間は engine_lock を持たない）。
+    """
+    creator_ids = crud.crud_like.get_creator_ids(db, batch.content_ids)
+    liked_creator_ids = [str(creator_ids.get(content_id, "")) for content_id in batch.content_ids]
+    liker_id = str(current_user.id)
+
+    with engine_lock:
+        engine = get_engine(db, [current_user.id, *creator_ids.values()])
+        accepted, alpha = engine.reserve_likes(liker_id, liked_creator_ids)
+    accepted = accepted.tolist()
+    rows = [
+        {"user_id": current_user.id, "content_id": content_id,
+         "accepted": ok, "alpha_used": alpha if ok else None}
+        for content_id, ok in zip(batch.content_ids, accepted)
+        if content_id in creator_ids  # 存在しないコンテンツは外部キーを満たさないので記録しない
+    ]
+    committed = False
+    try:
+        crud.crud_like.create_likes_bulk(db, rows)
+        committed = True
+    finally:
+        with engine_lock:
+            if committed:
+                engine.apply_reserved_likes(
+                    liker_id, [creator for creator, ok in zip(liked_creator_ids, accepted) if ok], alpha)
+            else:
+                engine.release_likes(liker_id, alpha, sum(accepted))
+
+    num_accepted = sum(accepted)
+    return {"accepted": num_accepted, "rejected": len(accepted) - num_accepted, "results": accepted}
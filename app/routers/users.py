@@ -0,0 +1,134 @@
+# app/routers/users.py
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from .. import crud, schemas
+from ..core import security
+from ..core.config import PICSY_SOLVE_MAX_STALENESS_SECONDS
+from ..core.engine_provider import get_published_results, wait_for_fresh_results
+from ..core.executors import run_in_db_executor
+from ..core.token_cache import AuthenticatedUser
+from ..dependencies import get_db
+from .auth import get_current_user
+
+router = APIRouter(
+    prefix="/users",
+    tags=["Users"]
+)
+
+
+def find_registration_conflict(db: Session, user: schemas.UserCreate) -> Optional[str]:
+    """登録できない理由（メールアドレスかユーザー名の重複）を返す。登録できるなら None"""
+    if crud.crud_user.get_user_by_email(db, email=user.email):
+        return "Email already registered"
+    if crud.crud_user.get_user_by_username(db, username=user.username):
+        return "Username already registered"
+    return None
+
+
+def create_user_record(db: Session, user: schemas.UserCreate, hashed_password: str) -> schemas.User:
+    """ユーザーを作成し、レスポンス用のスキーマに変換する（関連の読み込みもこのスレッドで済ませる）"""
+    return schemas.User.model_validate(crud.crud_user.create_user(db, user, hashed_password))
+
+
+@router.post("/", response_model=schemas.User)
+async def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    """
+    新しいユーザーを登録する。メールアドレスとユーザー名は重複できない。
+    DBの処理は db_executor、パスワードのハッシュ化は password_executor のスレッドで行う。
+    """
+    conflict = await run_in_db_executor(find_registration_conflict, db, user)
+    if conflict:
+        raise HTTPException(status_code=400, detail=conflict)
+    hashed_password = await security.get_password_hash_async(user.password)
+    return await run_in_db_executor(create_user_record, db, user, hashed_password)
+
+
+@router.get("/me", response_model=schemas.User)
+def read_users_me(current_user: AuthenticatedUser = Depends(get_current_user), db: Session = Depends(get_db)):
+    """
+    ログイン中のユーザー自身の情報（投稿したコンテンツを含む）を取得する。
+    """
+    db_user = crud.crud_user.get_user(db, user_id=current_user.id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return db_user
+
+
+def to_user_status(status: dict, version: int, schema=schemas.UserStatus):
+    """エンジンのステータス dict を APIスキーマに変換する（"N/A" は None にする）"""
+    return schema(
+        user_id=int(status["id"]),
+        username=status["name"],
+        contribution=status["contribution"] if status["contribution"] != "N/A" else None,
+        budget=status["budget"],
+        purchasing_power=status["purchasing_power"] if status["purchasing_power"] != "N/A" else None,
+        version=version,
+        **({"rank": status["rank"]} if "rank" in status else {}),
+    )
+
+
+def etag_matches(request: Request, response: Response, etag: str) -> bool:
+    """ETag ヘッダーを付け、クライアントが同じ版を持っている (If-None-Match が一致する) かを返す"""
+    response.headers["ETag"] = etag
+    return request.headers.get("if-none-match") == etag
+
+
+@router.get("/status", response_model=schemas.UserStatusList)
+def read_users_status(
+    request: Request,
+    response: Response,
+    ids: List[int] = Query(..., max_length=1000),
+    db: Session = Depends(get_db)
+):
+    """
+    複数ユーザーの貢献度・予算・購買力をまとめて取得する（例: /users/status?ids=1&ids=2）。
+    エンジンが最後に公開した計算結果を返し、計算中の途中状態は見えない。
+    同じ版を持っている場合は If-None-Match に ETag を渡すと 304 を返す。
+    """
+    published = get_published_results(db, ids)
+    if etag_matches(request, response, published.etag):
+        return Response(status_code=304, headers={"ETag": published.etag})
+    statuses = published.get_status_many([str(user_id) for user_id in ids])
+    return schemas.UserStatusList(
+        version=published.version,
+        statuses=[to_user_status(status, published.version) for status in statuses if status is not None])
+
+
+@router.get("/{user_id}/status", response_model=schemas.UserStatus)
+def read_user_status(
+    user_id: int,
+    request: Request,
+    response: Response,
+    fresh: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    ユーザーの貢献度・予算・購買力を取得する。ETag / If-None-Match に対応する。
+    貢献度はバックグラウンドで計算されるので、直前の「いいね」を反映した値が必要なら
+    fresh=true を付ける（計算が終わるまで最大 PICSY_SOLVE_MAX_STALENESS_SECONDS 待つ）。
+    """
+    if fresh:
+        wait_for_fresh_results(PICSY_SOLVE_MAX_STALENESS_SECONDS)
+    published = get_published_results(db, [user_id])
+    if str(user_id) not in published.user_id_to_index:
+        raise HTTPException(status_code=404, detail="User not found")
+    if etag_matches(request, response, published.etag):
+        return Response(status_code=304, headers={"ETag": published.etag})
+    return to_user_status(published.get_status(str(user_id)), published.version)
+
+
+@router.get("/{user_id}/rank", response_model=schemas.UserRank)
+def read_user_rank(user_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    """
+    ユーザーの貢献度の順位を取得する。ETag / If-None-Match に対応する。
+    """
+    published = get_published_results(db, [user_id])
+    if str(user_id) not in published.user_id_to_index:
+        raise HTTPException(status_code=404, detail="User not found")
+    if etag_matches(request, response, published.etag):
+        return Response(status_code=304, headers={"ETag": published.etag})
+    return schemas.UserRank(user_id=user_id, rank=published.get_rank(str(user_id)),
+                            total=len(published), version=published.version)
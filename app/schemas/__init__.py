@@ -1,5 +1,7 @@
 # app/schemas/__init__.py
 
-from .user import User, UserCreate
-from .token import Token, TokenData
+from .user import (User, UserCreate, UserStatus, UserStatusList,
+                   LeaderboardEntry, LeaderboardPage, UserRank)
+from .token import Token, TokenCacheStats, TokenData
 from .content import Content, ContentCreate
+from .like import Like, LikeBatchCreate, LikeBatchResult
@@ -0,0 +1,31 @@
+# app/schemas/like.py
+
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
+
+
+class Like(BaseModel):
+    id: int
+    user_id: int
+    content_id: int
+    accepted: bool  # PICSYエンジンが評価移転を行ったか（予算不足なら False）
+    alpha_used: Optional[float] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class LikeBatchCreate(BaseModel):
+    """
+    まとめて「いいね」するコンテンツIDの一覧。クライアント側でためた「いいね」を1回で送るためのもの。
+    同じコンテンツを複数回含めてもよく、その場合は含めた回数だけ「いいね」したものとして扱う。
+    """
+    content_ids: List[int] = Field(..., min_length=1, max_length=10000)
+
+
+class LikeBatchResult(BaseModel):
+    accepted: int
+    rejected: int
+    results: List[bool]  # content_ids と同じ順に、各「いいね」が評価移転されたか
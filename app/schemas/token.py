@@ -16,3 +16,17 @@ class TokenData(BaseModel):
     JWTトークンのペイロード（中身）に含まれるデータの形式を定義するスキーマ。
     """
     email: str | None = None
+
+
+class TokenCacheStats(BaseModel):
+    """
+    検証済みトークンのキャッシュの状態。
+    """
+    size: int
+    max_entries: int
+    hits: int
+    misses: int
+    hit_ratio: float
+    expirations: int
+    evictions: int
+    invalidations: int
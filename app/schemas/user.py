@@ -2,7 +2,7 @@
 
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 # Pydanticの循環参照問題を解決するために、Contentを直接インポートせず、
 # forward reference を使うか、モデルのリビルドを行う。
@@ -33,6 +33,40 @@ class User(UserBase):
     class Config:
         from_attributes = True
 
+# PICSYエンジンが公開している、ユーザーの貢献度・予算・購買力
+
+
+class UserStatus(BaseModel):
+    user_id: int
+    username: str
+    contribution: Optional[float] = None  # 貢献度計算に失敗している場合は None
+    budget: float
+    purchasing_power: Optional[float] = None
+    version: int  # この値を計算した貢献度計算の版数
+
+
+class UserStatusList(BaseModel):
+    version: int
+    statuses: List[UserStatus]  # 存在しないユーザーは含まれない
+
+
+class LeaderboardEntry(UserStatus):
+    rank: int  # 貢献度の順位（1始まり）
+
+
+class LeaderboardPage(BaseModel):
+    version: int
+    total: int  # 順位の付いているユーザーの総数
+    offset: int
+    entries: List[LeaderboardEntry]
+
+
+class UserRank(BaseModel):
+    user_id: int
+    rank: int
+    total: int
+    version: int
+
 # Pydanticの循環参照問題を解決するおまじない
 # FastAPI v0.95以降では自動化が進んでいるが、明示的に行うとより確実
 # User.model_rebuild() # Python 3.11以降ではUpdateForwardRefsが推奨されるが、FastAPIが内部で処理
@@ -0,0 +1,292 @@
+"""
+PicsyEngine の主要な処理の所要時間とピークメモリを、コミュニティの規模といいねグラフの形ごとに測る。
+
+    python benchmarks/bench_picsy_engine.py --output before.json
+    python benchmarks/bench_picsy_engine.py --output after.json --compare before.json
+
+測る処理: エンジンの作成 (初回の貢献度計算を含む)、perform_like、perform_natural_recovery、
+_calculate_E_prime (密行列モードのみ)、_calculate_contribution_vector、advance_phase。
+各処理は、合成したいいねグラフを適用したエンジンを毎回作り直してから (この部分は測らない)
+calls 回実行し、1回あたりの時間を repeats 回分集計する。ピークメモリは tracemalloc を有効にした
+別の1回で測る (tracemalloc は処理を遅くするので、時間の計測とは分ける)。
+
+結果は JSON で出力し、--compare で前回の JSON と最小値 (ノイズの影響を最も受けにくい) を比べる。
+threshold 倍より遅くなった処理があれば終了コード1で終わるので、コミット間の性能の後退を検出できる。
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import scipy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from picsy_engine_prototype import PicsyEngine, PicsyUser  # noqa: E402
+from picsy_storage import STORAGE_DENSE, STORAGE_SPARSE  # noqa: E402
+
+GRAPH_UNIFORM = "uniform"    # いいねする側もされる側も一様
+GRAPH_POWER_LAW = "powerlaw"  # いいねされる側の人気がべき分布 (一部のユーザーに集中する)
+GRAPH_CLIQUE = "clique"      # 少人数のグループの中でいいねし合う (グループ外へは一部だけ)
+GRAPH_KINDS = (GRAPH_UNIFORM, GRAPH_POWER_LAW, GRAPH_CLIQUE)
+
+STORAGE_AUTO = "auto"  # AUTO_DENSE_MAX_USERS 人までは密行列、それより多ければ疎行列
+AUTO_DENSE_MAX_USERS = 1000
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+POWER_LAW_EXPONENT = 1.2
+CLIQUE_SIZE = 10
+CLIQUE_INTERNAL_RATIO = 0.9
+
+OPERATIONS = ("construct", "perform_like", "perform_natural_recovery", "calculate_E_prime",
+              "calculate_contribution_vector", "advance_phase")
+
+
+def generate_like_graph(kind: str, num_users: int, num_likes: int, rng: np.random.Generator):
+    """
+    合成したいいねグラフを (liker_idx, liked_idx) の配列で返す。自分へのいいねは含まない。
+    """
+    likers = rng.integers(0, num_users, num_likes)
+    if kind == GRAPH_UNIFORM:
+        liked = rng.integers(0, num_users, num_likes)
+    elif kind == GRAPH_POWER_LAW:
+        # 人気の順位 r のユーザーが選ばれる確率を 1 / r^s に比例させる (順位はランダムに割り当てる)
+        weights = 1.0 / np.arange(1, num_users + 1) ** POWER_LAW_EXPONENT
+        popularity = rng.permutation(num_users)
+        liked = popularity[rng.choice(num_users, num_likes, p=weights / weights.sum())]
+    elif kind == GRAPH_CLIQUE:
+        clique_size = min(CLIQUE_SIZE, num_users)
+        clique_start = (likers // clique_size) * clique_size
+        clique_len = np.minimum(clique_size, num_users - clique_start)
+        liked = clique_start + (rng.random(num_likes) * clique_len).astype(np.int64)
+        outside = rng.random(num_likes) >= CLIQUE_INTERNAL_RATIO
+        liked[outside] = rng.integers(0, num_users, int(outside.sum()))
+    else:
+        raise ValueError(f"graphは {GRAPH_KINDS} のいずれかである必要があります。: '{kind}'")
+    # 自分へのいいねは、いいねする側からずらした相手に付け替える
+    self_likes = liked == likers
+    liked[self_likes] = (likers[self_likes] + rng.integers(1, num_users, int(self_likes.sum()))) % num_users
+    return likers, liked
+
+
+def resolve_storage(storage: str, num_users: int) -> str:
+    if storage == STORAGE_AUTO:
+        return STORAGE_DENSE if num_users <= AUTO_DENSE_MAX_USERS else STORAGE_SPARSE
+    return storage
+
+
+class Scenario:
+    """1つの規模・グラフ・保持方式の組み合わせ。毎回同じ乱数列から同じ状態のエンジンを作る。"""
+
+    def __init__(self, num_users: int, graph: str, storage: str, likes_per_user: float, seed: int):
+        self.num_users = num_users
+        self.graph = graph
+        self.storage = storage
+        self.seed = seed
+        self.users = [PicsyUser(user_id=f"u{i}", username=f"user{i}") for i in range(num_users)]
+        rng = np.random.default_rng(seed)
+        likers, liked = generate_like_graph(graph, num_users, int(likes_per_user * num_users), rng)
+        self.liker_ids = [self.users[i].user_id for i in likers]
+        self.liked_ids = [self.users[i].user_id for i in liked]
+
+    def new_engine(self) -> PicsyEngine:
+        return PicsyEngine(self.users, storage=self.storage)
+
+    def prepared_engine(self) -> PicsyEngine:
+        """いいねグラフを適用し、初期状態からの貢献度を計算し終えたエンジン"""
+        engine = self.new_engine()
+        engine.perform_likes_batch(self.liker_ids, self.liked_ids)
+        engine.calculate_all_contributions()
+        return engine
+
+    def like_pairs(self, count: int, repeat: int):
+        """perform_like で使う (いいねする側, される側)。予算が尽きないように、いいねする側は重複させない"""
+        rng = np.random.default_rng(self.seed + 1 + repeat)
+        likers = rng.permutation(self.num_users)[:count]
+        _, liked = generate_like_graph(self.graph, self.num_users, count, rng)
+        liked = np.where(liked == likers, (likers + 1) % self.num_users, liked)
+        return [(self.users[a].user_id, self.users[b].user_id) for a, b in zip(likers, liked)]
+
+
+def operation_runner(scenario: Scenario, operation: str, calls: int, repeat: int):
+    """
+    (準備, 計測する処理) を返す。準備の戻り値が計測する処理の引数になり、準備は計測しない。
+    戻り値は捨てる (作ったエンジンを溜め込むと、ピークメモリが calls 倍に見えてしまう)。
+    """
+    if operation == "construct":
+        def run(_):
+            for _ in range(calls):
+                scenario.new_engine()
+        return (lambda: None), run
+    if operation == "perform_like":
+        pairs = scenario.like_pairs(calls, repeat)
+
+        def run(engine):
+            for liker_id, liked_id in pairs:
+                engine.perform_like(liker_id, liked_id)
+        return scenario.prepared_engine, run
+
+    methods = {
+        "perform_natural_recovery": PicsyEngine.perform_natural_recovery,
+        "calculate_E_prime": PicsyEngine._calculate_E_prime,
+        "calculate_contribution_vector": PicsyEngine._calculate_contribution_vector,
+        "advance_phase": PicsyEngine.advance_phase,
+    }
+    if operation not in methods:
+        raise ValueError(f"不明な処理です: {operation}")
+    method = methods[operation]
+
+    def run(engine):
+        for _ in range(calls):
+            method(engine)
+    return scenario.prepared_engine, run
+
+
+def calls_for(operation: str, num_users: int) -> int:
+    """1回の計測で実行する回数 (規模が大きいほど1回が重いので減らす)"""
+    if operation == "perform_like":
+        return min(num_users, 50)
+    if operation == "construct":
+        return max(1, min(10, 10000 // num_users))
+    return max(1, min(20, 20000 // num_users))
+
+
+def measure(scenario: Scenario, operation: str, repeats: int, track_memory: bool):
+    if operation == "calculate_E_prime" and scenario.storage != STORAGE_DENSE:
+        return None  # 疎行列モードでは E' を作らない
+    calls = calls_for(operation, scenario.num_users)
+
+    per_call = []
+    for repeat in range(repeats):
+        setup, run = operation_runner(scenario, operation, calls, repeat)
+        state = setup()
+        start = time.perf_counter_ns()
+        run(state)
+        per_call.append((time.perf_counter_ns() - start) / calls / 1e9)
+
+    result = {
+        "num_users": scenario.num_users, "graph": scenario.graph, "storage": scenario.storage,
+        "operation": operation, "calls": calls, "repeats": repeats,
+        "min_s": min(per_call), "median_s": statistics.median(per_call),
+        "mean_s": statistics.fmean(per_call),
+        "stdev_s": statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+        "peak_bytes": None,
+    }
+    if track_memory:
+        setup, run = operation_runner(scenario, operation, calls, 0)
+        state = setup()
+        tracemalloc.start()
+        try:
+            baseline, _ = tracemalloc.get_traced_memory()
+            run(state)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result["peak_bytes"] = peak - baseline
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result: dict):
+    return (result["num_users"], result["graph"], result["storage"], result["operation"])
+
+
+def compare(results: list, baseline_results: list, threshold: float) -> bool:
+    """1回あたりの最小値を前回の結果と比べて表示し、threshold 倍を超えて遅くなった処理がなければ True"""
+    baseline = {result_key(result): result for result in baseline_results}
+    ok = True
+    print(f"{'N':>6} {'graph':<9} {'storage':<7} {'operation':<30} {'before':>10} {'after':>10} {'ratio':>6}")
+    for result in results:
+        before = baseline.get(result_key(result))
+        if before is None:
+            continue
+        ratio = result["min_s"] / before["min_s"] if before["min_s"] > 0 else float("inf")
+        regressed = ratio > threshold
+        ok = ok and not regressed
+        print(f"{result['num_users']:>6} {result['graph']:<9} {result['storage']:<7} {result['operation']:<30} "
+              f"{before['min_s'] * 1e3:>8.3f}ms {result['min_s'] * 1e3:>8.3f}ms {ratio:>6.2f}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="PicsyEngine の主要な処理のベンチマーク")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="ユーザー数 (カンマ区切り)")
+    parser.add_argument("--graphs", default=",".join(GRAPH_KINDS), help="いいねグラフの形 (カンマ区切り)")
+    parser.add_argument("--operations", default=",".join(OPERATIONS), help="測る処理 (カンマ区切り)")
+    parser.add_argument("--storage", default=STORAGE_AUTO, choices=(STORAGE_AUTO, STORAGE_DENSE, STORAGE_SPARSE))
+    parser.add_argument("--likes-per-user", type=float, default=5.0, help="いいねグラフの1人あたりのいいね数")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="tracemalloc によるピークメモリの計測を省く")
+    parser.add_argument("--output", help="結果の JSON を書き出すファイル (省略時は標準出力)")
+    parser.add_argument("--compare", help="比べる前回の結果の JSON")
+    parser.add_argument("--threshold", type=float, default=1.25, help="後退とみなす最小値の比")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    graphs = args.graphs.split(",")
+    operations = args.operations.split(",")
+    for operation in operations:
+        if operation not in OPERATIONS:
+            parser.error(f"operations は {OPERATIONS} から選んでください: {operation}")
+
+    results = []
+    for num_users in sizes:
+        for graph in graphs:
+            scenario = Scenario(num_users, graph, resolve_storage(args.storage, num_users),
+                                args.likes_per_user, args.seed)
+            for operation in operations:
+                result = measure(scenario, operation, args.repeats, not args.no_memory)
+                if result is None:
+                    continue
+                results.append(result)
+                peak = f"{result['peak_bytes'] / 2**20:.1f}MiB" if result["peak_bytes"] is not None else "-"
+                print(f"N={num_users:<6} {graph:<9} {scenario.storage:<7} {operation:<30} "
+                      f"median {result['median_s'] * 1e3:9.3f}ms  peak {peak}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(results, baseline["results"], args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""
+FastAPI アプリ (app.main:app) の負荷試験。エンドポイントごとのレイテンシ (p50/p95/p99) とスループットを測る。
+
+    python benchmarks/loadtest_api.py --users 100 --duration 10 --output loadtest.json
+    python benchmarks/loadtest_api.py --base-url http://localhost:8000   # 起動済みのサーバーに対して
+
+--base-url を省略すると、一時ディレクトリの SQLite を DATABASE_URL にして uvicorn を子プロセスで起動し、
+終わったら止める。PostgreSQL で測るときは DATABASE_URL を設定したサーバーを自分で起動して --base-url を渡す。
+
+シナリオ (この順に実行し、前のシナリオで作ったユーザー・トークン・コンテンツを後のシナリオで使う):
+  signup_login: users 人が同時に登録し、ログインしてトークンを得る (bcrypt の負荷)
+  post_burst:   全員が posts_per_user 件ずつコンテンツを一斉に投稿する
+  dashboard:    duration 秒間、一覧 (カーソルで2ページ目まで)・自分の情報・ステータス・ランキングを読む
+  like_storm:   duration 秒間、他人のコンテンツに「いいね」し続ける (一部は likes:batch でまとめて)
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import httpx
+from sqlalchemy.engine import make_url
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("signup_login", "post_burst", "dashboard", "like_storm")
+LIKE_BATCH_RATIO = 0.1  # like_storm で likes:batch を使う割合
+LIKE_BATCH_SIZE = 20
+
+
+class Recorder:
+    """エンドポイントごとのレイテンシとステータスコードを記録する"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    async def request(self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs):
+        """リクエストを送って記録する。endpoint はパスのIDを伏せた集計用の名前 (例: "GET /users/{id}/status")"""
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError as exc:
+            response, status = None, type(exc).__name__
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        self.statuses[endpoint][status] += 1
+        return response
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            ordered = sorted(latencies)
+            statuses = self.statuses[endpoint]
+            errors = sum(count for status, count in statuses.items()
+                         if not isinstance(status, int) or status >= 400)
+            endpoints[endpoint] = {
+                "requests": len(ordered),
+                "errors": errors,
+                "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+                "throughput_rps": len(ordered) / elapsed if elapsed > 0 else 0.0,
+                "mean_ms": statistics.fmean(ordered) * 1e3,
+                "p50_ms": percentile(ordered, 50) * 1e3,
+                "p95_ms": percentile(ordered, 95) * 1e3,
+                "p99_ms": percentile(ordered, 99) * 1e3,
+                "max_ms": ordered[-1] * 1e3,
+            }
+        return {"elapsed_s": elapsed, "endpoints": endpoints}
+
+
+def percentile(ordered: list, q: float) -> float:
+    """昇順のリストの q パーセンタイル (最近傍順位法)"""
+    if not ordered:
+        return 0.0
+    rank = max(1, int(-(-q * len(ordered) // 100)))  # ceil(q/100 * n)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class LoadTestState:
+    """シナリオ間で引き継ぐもの"""
+
+    def __init__(self):
+        self.users = []     # {"id", "email", "password", "token"}
+        self.contents = []  # (content_id, creator_id)
+
+
+def auth_header(user: dict) -> dict:
+    return {"Authorization": f"Bearer {user['token']}"}
+
+
+async def run_workers(concurrency: int, jobs, worker):
+    """jobs を concurrency 個のコルーチンで順に処理する"""
+    queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+
+    async def consume():
+        while True:
+            try:
+                job = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await worker(job)
+    await asyncio.gather(*(consume() for _ in range(concurrency)))
+
+
+async def run_for(duration: float, concurrency: int, step):
+    """duration 秒間、concurrency 個のコルーチンで step を繰り返す"""
+    deadline = time.perf_counter() + duration
+
+    async def loop(worker_id: int):
+        rng = random.Random(worker_id)
+        while time.perf_counter() < deadline:
+            await step(rng)
+    await asyncio.gather(*(loop(worker_id) for worker_id in range(concurrency)))
+
+
+async def scenario_signup_login(client, recorder, state, args):
+    run_id = os.urandom(3).hex()  # 既存のDBに対して何度実行してもユーザーが重複しないように
+
+    async def signup_and_login(i: int):
+        user = {"email": f"load{run_id}_{i}@example.com", "password": f"pw-{run_id}-{i}"}
+        response = await recorder.request(
+            client, "POST /users/", "POST", "/users/",
+            json={"username": f"load{run_id}_{i}", "email": user["email"], "password": user["password"]})
+        if response is None or response.status_code != 200:
+            return
+        user["id"] = response.json()["id"]
+        response = await recorder.request(
+            client, "POST /auth/token", "POST", "/auth/token",
+            data={"username": user["email"], "password": user["password"]})
+        if response is not None and response.status_code == 200:
+            user["token"] = response.json()["access_token"]
+            state.users.append(user)
+    await run_workers(args.concurrency, range(args.users), signup_and_login)
+
+
+async def scenario_post_burst(client, recorder, state, args):
+    async def post(job):
+        user, k = job
+        response = await recorder.request(
+            client, "POST /contents/", "POST", "/contents/", headers=auth_header(user),
+            json={"title": f"load test post {k} by {user['id']}", "body": "x" * 200})
+        if response is not None and response.status_code == 200:
+            state.contents.append((response.json()["id"], user["id"]))
+    jobs = [(user, k) for k in range(args.posts_per_user) for user in state.users]
+    await run_workers(args.concurrency, jobs, post)
+
+
+async def scenario_dashboard(client, recorder, state, args):
+    async def step(rng: random.Random):
+        user = rng.choice(state.users)
+        response = await recorder.request(client, "GET /contents/", "GET", "/contents/", params={"limit": 20})
+        cursor = response.headers.get("x-next-cursor") if response is not None else None
+        if cursor:
+            await recorder.request(client, "GET /contents/?cursor", "GET", "/contents/",
+                                   params={"limit": 20, "cursor": cursor})
+        await recorder.request(client, "GET /users/me", "GET", "/users/me", headers=auth_header(user))
+        await recorder.request(client, "GET /users/{id}/status", "GET", f"/users/{user['id']}/status")
+        await recorder.request(client, "GET /leaderboard/", "GET", "/leaderboard/", params={"limit": 20})
+    await run_for(args.duration, args.concurrency, step)
+
+
+async def scenario_like_storm(client, recorder, state, args):
+    async def step(rng: random.Random):
+        user = rng.choice(state.users)
+        others = [content_id for content_id, creator_id in rng.sample(state.contents, min(50, len(state.contents)))
+                  if creator_id != user["id"]]
+        if not others:
+            return
+        if rng.random() < LIKE_BATCH_RATIO:
+            await recorder.request(client, "POST /likes:batch", "POST", "/likes:batch", headers=auth_header(user),
+                                   json={"content_ids": others[:LIKE_BATCH_SIZE]})
+        else:
+            await recorder.request(client, "POST /contents/{id}/like", "POST", f"/contents/{others[0]}/like",
+                                   headers=auth_header(user))
+    await run_for(args.duration, args.concurrency, step)
+
+
+SCENARIO_FUNCTIONS = {
+    "signup_login": scenario_signup_login,
+    "post_burst": scenario_post_burst,
+    "dashboard": scenario_dashboard,
+    "like_storm": scenario_like_storm,
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_url: str, port: int, workers: int) -> subprocess.Popen:
+    """uvicorn で app.main:app を起動する (DBの設定は環境変数で渡す)"""
+    env = dict(os.environ, DATABASE_URL=database_url)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=REPO_ROOT, env=env)
+
+
+async def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"サーバーが起動しませんでした (終了コード {process.returncode})")
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{timeout}秒以内にサーバーが応答しませんでした: {base_url}")
+
+
+async def run_load_test(base_url: str, args) -> dict:
+    state = LoadTestState()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        for scenario in args.scenarios:
+            if scenario != "signup_login" and not state.users:
+                print(f"[{scenario}] ログインできたユーザーがいないので省略します", file=sys.stderr)
+                continue
+            if scenario == "like_storm" and len({creator_id for _, creator_id in state.contents}) < 2:
+                print(f"[{scenario}] 「いいね」できる他人のコンテンツがないので省略します", file=sys.stderr)
+                continue
+            recorder = Recorder()
+            start = time.perf_counter()
+            await SCENARIO_FUNCTIONS[scenario](client, recorder, state, args)
+            results[scenario] = recorder.summary(time.perf_counter() - start)
+            print_summary(scenario, results[scenario])
+    return results
+
+
+def print_summary(scenario: str, summary: dict):
+    print(f"\n[{scenario}] {summary['elapsed_s']:.1f}s", file=sys.stderr)
+    print(f"  {'endpoint':<28} {'reqs':>6} {'err':>5} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}",
+          file=sys.stderr)
+    for endpoint, stats in summary["endpoints"].items():
+        print(f"  {endpoint:<28} {stats['requests']:>6} {stats['errors']:>5} {stats['throughput_rps']:>8.1f} "
+              f"{stats['p50_ms']:>7.1f}ms {stats['p95_ms']:>7.1f}ms {stats['p99_ms']:>7.1f}ms "
+              f"{stats['max_ms']:>7.1f}ms", file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="PICSY-TrustLike API の負荷試験")
+    parser.add_argument("--base-url", help="起動済みのサーバーの URL (省略時は一時的な SQLite で uvicorn を起動する)")
+    parser.add_argument("--database-url", help="起動するサーバーの DATABASE_URL (省略時は一時ディレクトリの SQLite)")
+    parser.add_argument("--server-workers", type=int, default=1, help="起動する uvicorn のワーカープロセス数")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="実行するシナリオ (カンマ区切り)")
+    parser.add_argument("--users", type=int, default=50, help="signup_login で登録するユーザー数")
+    parser.add_argument("--posts-per-user", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=10.0, help="dashboard と like_storm の実行秒数")
+    parser.add_argument("--concurrency", type=int, default=20, help="同時に送るリクエストの数")
+    parser.add_argument("--timeout", type=float, default=30.0, help="1リクエストのタイムアウト秒数")
+    parser.add_argument("--output", help="結果の JSON を書き出すファイル")
+    args = parser.parse_args(argv)
+    args.scenarios = args.scenarios.split(",")
+    for scenario in args.scenarios:
+        if scenario not in SCENARIOS:
+            parser.error(f"scenarios は {SCENARIOS} から選んでください: {scenario}")
+
+    process = None
+    with tempfile.TemporaryDirectory(prefix="picsy-loadtest-") as tmpdir:
+        base_url = args.base_url
+        database_url = None
+        try:
+            if base_url is None:
+                database_url = args.database_url or f"sqlite:///{os.path.join(tmpdir, 'loadtest.db')}"
+                port = free_port()
+                base_url = f"http://127.0.0.1:{port}"
+                process = start_server(database_url, port, args.server_workers)
+                asyncio.run(wait_until_ready(base_url, process))
+            results = asyncio.run(run_load_test(base_url, args))
+        finally:
+            if process is not None:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "base_url": args.base_url,
+            "database_url": make_url(database_url).render_as_string(hide_password=True) if database_url else None,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "scenarios": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
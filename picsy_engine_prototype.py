@@ -1,6 +1,26 @@
+import logging
+import os
+import time
 import numpy as np
 from typing import List, Dict, Tuple  # Python 3.8以前でも動作するようにタプルもインポート
-from datetime import datetime  # いいねログのタイムスタンプ用
+from datetime import datetime  # いいねログのタイムスタンプ表示用
+
+from picsy_journal import (JOURNAL_LIKE, JOURNAL_PARAM, JOURNAL_PHASE, JOURNAL_PHASES, JOURNAL_RECOVERY,
+                           JOURNAL_USERS_ADDED, JOURNAL_USERS_REMOVED, PARAM_ALPHA_LIKE_DEFAULT,
+                           PARAM_ALPHA_LIKE_MAX, PARAM_GAMMA_RATE, PARAM_USER_ALPHA_LIKE, LikeJournal,
+                           decode_payload, read_journal)
+from picsy_like_log import DEFAULT_LIKE_LOG_CAPACITY, LIKE_LOG_RING, LikeLog
+from picsy_results import PublishedResults
+from picsy_scheduler import ContributionScheduler
+from picsy_shared_memory import SharedEngineWriter
+from picsy_snapshot import read_snapshot, write_snapshot
+from picsy_solvers import (SOLVER_POWER, SolverResult, ContributionProblem,
+                           get_contribution_solver, solve_linear, solve_power)
+from picsy_storage import (STORAGE_DENSE, STORAGE_SPARSE, LazyStoreSummary,
+                           create_evaluation_store, store_class, swap_remove_order)
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())  # ライブラリとして使うときは何も出力しない
 
 # --- システムのグローバル定数 ---
 DEFAULT_ALPHA_LIKE = 0.05      # 「いいね」1回あたりの標準評価移転量
@@ -8,6 +28,21 @@ DEFAULT_ALPHA_LIKE_MAX = 0.3   # ユーザーが設定できるalpha_likeの上
 DEFAULT_GAMMA_RATE = 0.1       # 自然回収率
 DEFAULT_MAX_ITERATIONS = 100   # 貢献度計算の最大反復回数
 DEFAULT_TOLERANCE = 1e-7       # 貢献度計算の収束許容誤差
+BUDGET_TOLERANCE = 1e-12       # 予算をちょうど使い切る「いいね」を丸め誤差で弾かないための許容誤差
+DEFAULT_PERTURBATION_BOUND = 1e-3  # 増分モードで再計算を省略できる E' の変化量の上限
+
+# --- 表示の詳しさ (verbosity) ---
+# どの設定でも診断情報は logging (ロガー名 "picsy_engine_prototype") に流れる。
+# verbosity はそれに加えて標準出力へ直接表示する範囲を決める。
+VERBOSITY_QUIET = 0    # 標準出力には何も表示しない (本番・ライブラリ用の既定値)
+VERBOSITY_SUMMARY = 1  # 起動・自然回収・パラメータ変更・警告などの要点だけを表示
+VERBOSITY_FULL = 2     # 従来通り全て表示 (評価行列全体・反復経過を含む。教材・デモ用)
+
+# --- 「いいね」後の貢献度更新方式 ---
+CONTRIBUTION_UPDATE_FULL = "full"                # 毎回 c=(1,...,1) から解き直す
+CONTRIBUTION_UPDATE_INCREMENTAL = "incremental"  # 前回の c から再開し、変化が小さければ省略
+CONTRIBUTION_UPDATE_MODES = (CONTRIBUTION_UPDATE_FULL,
+                             CONTRIBUTION_UPDATE_INCREMENTAL)
 
 
 class PicsyUser:
@@ -48,17 +83,30 @@ class PicsyEngine:
                  alpha_like_max: float = DEFAULT_ALPHA_LIKE_MAX,
                  gamma_rate: float = DEFAULT_GAMMA_RATE,
                  max_iterations: int = DEFAULT_MAX_ITERATIONS,
-                 tolerance: float = DEFAULT_TOLERANCE):
+                 tolerance: float = DEFAULT_TOLERANCE,
+                 storage: str = STORAGE_DENSE,
+                 contribution_update: str = CONTRIBUTION_UPDATE_FULL,
+                 perturbation_bound: float = DEFAULT_PERTURBATION_BOUND,
+                 lazy_decay: bool = False,
+                 solver: str = SOLVER_POWER,
+                 verbosity: int = VERBOSITY_QUIET,
+                 like_log_capacity: int = DEFAULT_LIKE_LOG_CAPACITY,
+                 like_log_retention: str = LIKE_LOG_RING,
+                 like_log_spill_path: str = None,
+                 evaluation_store=None,
+                 initial_c_vector: np.ndarray = None):
 
         if not user_list:
             raise ValueError("ユーザーリストが空です。最低1人以上のユーザーが必要です。")
 
-        self.users: List[PicsyUser] = user_list
+        self.verbosity: int = verbosity
+        self.users: List[PicsyUser] = list(user_list)  # add_users/remove_users で呼び出し側のリストを変えないようにコピー
         self.num_users: int = len(self.users)
 
         if self.num_users == 1:
-            print(
-                f"警告: ユーザー数が1人のため、PICSYの評価・貢献度計算は意味を成しません。({self.users[0].username})")
+            self._emit(VERBOSITY_SUMMARY, logging.WARNING,
+                       "警告: ユーザー数が1人のため、PICSYの評価・貢献度計算は意味を成しません。(%s)",
+                       self.users[0].username)
         elif self.num_users < 1:
             raise ValueError("ユーザーリストが空です。")
 
@@ -85,42 +133,152 @@ class PicsyEngine:
         self.gamma_rate: float = gamma_rate
         self.max_iterations: int = max_iterations
         self.tolerance: float = tolerance
+        get_contribution_solver(solver)  # 未登録のソルバー名ならここで ValueError
+        self.solver: str = solver
+        self.last_solver_result: SolverResult = None
+
+        if contribution_update not in CONTRIBUTION_UPDATE_MODES:
+            raise ValueError(
+                f"contribution_updateは {CONTRIBUTION_UPDATE_MODES} のいずれかである必要があります。")
+        if perturbation_bound < 0:
+            raise ValueError("perturbation_boundは0以上である必要があります。")
+        self.contribution_update: str = contribution_update
+        self.perturbation_bound: float = perturbation_bound
+        # 前回の貢献度計算以降に蓄積した E' の変化量 (残差 ||c @ E' - c||_1 / N の上界)
+        self._pending_perturbation: float = 0.0
+        # reserve_likes で予約され、まだ適用も取り消しもされていない予算 (ユーザーID -> 予約量)
+        self._reserved_budget: Dict[str, float] = {}
 
         self.user_alpha_settings: Dict[str, float] = {
             user.user_id: self.alpha_like_default for user in self.users
         }
 
-        self.E: np.ndarray = np.zeros(
-            (self.num_users, self.num_users), dtype=float)
-        if self.num_users > 0:
-            np.fill_diagonal(self.E, 1.0)
+        # 評価行列Eの保持方式: 小規模なら密行列、大規模なら予算+疎行列
+        # lazy_decay=True なら自然回収は全体倍率の更新だけで済ませ、他者評価の実値は読み出すときに倍率を掛けて求める
+        self.storage: str = storage
+        self.lazy_decay: bool = lazy_decay
+        if evaluation_store is None:
+            self._store = create_evaluation_store(
+                storage, self.num_users, lazy_decay=lazy_decay)
+        elif evaluation_store.mode != storage or evaluation_store.num_users != self.num_users:
+            raise ValueError("evaluation_storeの保持方式・ユーザー数がエンジンの設定と一致しません。")
+        else:
+            self._store = evaluation_store  # スナップショットから復元したストアをそのまま使う
 
-        self.like_log: List[Dict] = []
+        # いいね履歴: 型付き配列の列で持ち、保持件数は like_log_capacity まで (超えた分は捨てるか書き出す)
+        self.like_log: LikeLog = LikeLog(
+            like_log_capacity, like_log_retention, like_log_spill_path)
         self.current_day: int = 0
         self.current_phase: str = "開始前"
         self.contribution_calculation_count: int = 0
+        # 貢献度を計算するフェーズ (スケジューラーがないときと、スケジューラーの policy が on_phase のときに使う)
         self.phases_to_calculate_contribution: List[str] = ["朝", "昼", "晩"]
 
-        self.E_prime: np.ndarray = None
         self.c_vector: np.ndarray = None
-
-        print(f"\nPICSYエンジンを{self.num_users}人のユーザーで起動しました。")
-        user_name_list_str = ", ".join([user.username for user in self.users])
-        print(f"  参加ユーザー: {user_name_list_str}")
-        print(
-            f"  デフォルトα_like: {self.alpha_like_default}, 最大α_like: {self.alpha_like_max}, γ: {self.gamma_rate}")
-        print(
-            f"  貢献度計算設定 - 最大反復: {self.max_iterations}, 許容誤差: {self.tolerance}")
+        # 貢献度計算のたびに公開する読み取り専用の結果 (読み手はロックなしで参照できる)
+        self.published: PublishedResults = None
+        self.results_version: int = 0
+        self._results_token: str = os.urandom(4).hex()  # ETag がエンジンの起動をまたいで衝突しないように
+        self._membership_version: int = 0  # ユーザーの増減のたびに増える (公開結果の対応表の使い回し判定用)
+        # 先行書き込みジャーナル (attach_journal で設定)。再初期化するとインデックスが変わるので外れる
+        self.journal: LikeJournal = None
+        self.journal_checkpoint: Dict = None  # 復元元のスナップショットが保存された時点のジャーナルの位置
+        # 公開結果と評価行列を他のプロセスに見せる共有メモリ (attach_shared_memory で設定)
+        self.shared_memory: SharedEngineWriter = None
+        # 貢献度計算をバックグラウンドに任せるスケジューラー (ContributionScheduler の作成時に設定)
+        self.contribution_scheduler: ContributionScheduler = None
+
+        self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                   "\nPICSYエンジンを%d人のユーザーで起動しました。", self.num_users)
+        if self.verbosity >= VERBOSITY_FULL:  # 全ユーザー名の列挙はデモ表示のときだけ
+            user_name_list_str = ", ".join(
+                [user.username for user in self.users])
+            print(f"  参加ユーザー: {user_name_list_str}")
+        self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                   "  デフォルトα_like: %s, 最大α_like: %s, γ: %s",
+                   self.alpha_like_default, self.alpha_like_max, self.gamma_rate)
+        self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                   "  貢献度計算設定 - ソルバー: %s, 最大反復: %s, 許容誤差: %s",
+                   self.solver, self.max_iterations, self.tolerance)
+        self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                   "  評価行列の保持方式: %s (遅延自然回収: %s)", self.storage, self.lazy_decay)
+        self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                   "  貢献度更新方式: %s (省略許容量: %s)",
+                   self.contribution_update, self.perturbation_bound)
 
         if self.num_users > 0:
-            self.display_E(title="初期評価行列 E^(0)")
-            if self.num_users > 1:
+            self._emit_E("初期評価行列 E^(0)")
+            if initial_c_vector is not None and len(initial_c_vector) == self.num_users:
+                self.c_vector = initial_c_vector  # 復元時は保存されていた貢献度をそのまま使う
+                self._emit_c_vector()
+                self._publish_results()
+            elif self.num_users > 1:
                 self.calculate_all_contributions()
             else:
-                print("ユーザー数が1人のため、貢献度計算はスキップされます。")
+                self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                           "ユーザー数が1人のため、貢献度計算はスキップされます。")
                 self.c_vector = np.array([1.0])  # 1人の場合の貢献度は1
-                self.display_c_vector()  # 1人の場合の貢献度も表示
-        print("-" * 60)
+                self._emit_c_vector()  # 1人の場合の貢献度も表示
+                self._publish_results()
+        if self.verbosity >= VERBOSITY_SUMMARY:
+            print("-" * 60)
+
+    # --- 診断出力 ---
+    def _emit(self, verbosity: int, level: int, message: str, *args):
+        """
+        診断メッセージを出す。self.verbosity が verbosity 以上なら標準出力に表示し、
+        そうでなければ logging に渡す。message は % 形式で、実際に出力されるときだけ整形される。
+        """
+        if self.verbosity >= verbosity:
+            print(message % args if args else message)
+        elif logger.isEnabledFor(level):
+            logger.log(level, message.lstrip("\n"), *args)
+
+    def _emit_E(self, title: str):
+        """VERBOSITY_FULL なら評価行列全体を表示し、それ以外は要約だけを DEBUG ログに出す。"""
+        if self.verbosity >= VERBOSITY_FULL:
+            self.display_E(title)
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s: %s", title, LazyStoreSummary(self._store))
+
+    def _emit_c_vector(self):
+        if self.verbosity >= VERBOSITY_FULL:
+            self.display_c_vector()
+        elif logger.isEnabledFor(logging.DEBUG) and self.c_vector is not None and len(self.c_vector) > 0:
+            logger.debug("貢献度ベクトル c: N=%d, 最小 %.4f, 最大 %.4f, 合計 %.4f",
+                         len(self.c_vector), np.min(self.c_vector),
+                         np.max(self.c_vector), np.sum(self.c_vector))
+
+    def set_verbosity(self, verbosity: int):
+        self.verbosity = verbosity
+
+    @property
+    def E(self):
+        """
+        評価行列Eの実値のコピー。密行列モードでは np.ndarray、疎行列モードでは
+        対角に予算を載せた scipy.sparse の CSR 行列を返す。
+        読むだけなので、遅延自然回収の倍率はコピーにだけ掛け、評価行列の再正規化は行わない
+        (再正規化は renormalize_evaluations か、倍率が閾値を下回ったときだけ)。
+        """
+        return self._store.to_matrix()
+
+    @E.setter
+    def E(self, new_E: np.ndarray):
+        if self.storage != STORAGE_DENSE:
+            raise ValueError("評価行列Eの直接代入は密行列モードでのみ可能です。")
+        self._store.set_matrix(new_E)
+
+    @property
+    def decay_epoch(self) -> int:
+        """これまでに実行された自然回収の回数。"""
+        return self._store.decay_epoch
+
+    def renormalize_evaluations(self):
+        """
+        遅延自然回収で溜まっている全体倍率を評価行列に反映する。
+        定期的に呼ぶか、倍率が十分小さくなった時点でストアが自動で実行する。
+        """
+        self._store.renormalize()
 
     def _get_user_index(self, user_id: str) -> int:
         if user_id not in self.user_id_to_index:
@@ -142,16 +300,16 @@ class PicsyEngine:
         for i in range(self.num_users):
             row_str = f"{self.user_index_to_name.get(i, f'Idx {i}'):<9} |"
             for j in range(self.num_users):
-                row_str += f"{self.E[i, j]:^7.4f} |"
+                row_str += f"{self._store.get(i, j):^7.4f} |"
             print(row_str)
         print("-" * (len(header)))
         if self.num_users > 0:  # ユーザーがいる場合のみ行和検証
-            row_sums = np.sum(self.E, axis=1)
+            row_sums = self._store.row_sums()
             all_rows_sum_to_one = True
             for i in range(self.num_users):
                 if not np.isclose(row_sums[i], 1.0):
-                    print(f"警告:{self.user_index_to_name.get(i, f'Idx {i}')}の行和が1ではありません。:{
-                          row_sums[i]:.8f}")
+                    user_name = self.user_index_to_name.get(i, f'Idx {i}')
+                    print(f"警告:{user_name}の行和が1ではありません。:{row_sums[i]:.8f}")
                     all_rows_sum_to_one = False
             if all_rows_sum_to_one:
                 print("評価行列Eの全行の和はほぼ1です。")
@@ -169,184 +327,788 @@ class PicsyEngine:
 
         print(f"\n--- {title} ---")
         for i in range(self.num_users):
-            print(f"  {self.user_index_to_name.get(i, f'Idx {i}'):<10}: {
-                  self.c_vector[i]:.4f}")
+            user_name = self.user_index_to_name.get(i, f'Idx {i}')
+            print(f"  {user_name:<10}: {self.c_vector[i]:.4f}")
         if self.num_users > 0:
             print(
                 f"  要素の合計 (N={self.num_users} になるはず): {np.sum(self.c_vector):.4f}")
 
+    @property
+    def E_prime(self) -> np.ndarray:
+        """
+        貢献度計算用行列 E'。貢献度計算自体は E' を作らずに行うため、
+        参照されたときにだけ評価行列から組み立てる。
+        """
+        return self._calculate_E_prime()
+
     def _calculate_E_prime(self) -> np.ndarray:
-        if self.num_users <= 1:
+        # E' は非対角成分がほぼ全て非ゼロの密行列になるため、疎行列モードでは作らない
+        if self.num_users <= 1 or self.storage != STORAGE_DENSE:
             return None
-        diagonal_elements_E = np.diag(self.E)
-        B = np.diag(diagonal_elements_E)
-        D = np.ones((self.num_users, self.num_users)) - np.eye(self.num_users)
-        E_prime = self.E - B + (B @ D) / (self.num_users - 1)
+        # E' = E - B + (B @ D) / (N-1) だが、B @ D は「予算_i を i 行の対角以外に並べる」だけなので
+        # 行列積を使わずに O(N^2) で組み立てる
+        budgets = np.diag(self.E)
+        E_prime = self.E + (budgets / (self.num_users - 1))[:, np.newaxis]
+        np.fill_diagonal(E_prime, 0.0)
         return E_prime
 
-    def _calculate_contribution_vector(self, E_prime_matrix: np.ndarray) -> np.ndarray:
-        if E_prime_matrix is None or E_prime_matrix.shape[0] != self.num_users or E_prime_matrix.shape[1] != self.num_users:
-            return np.full(self.num_users, np.nan) if self.num_users > 0 else np.array([])
-
-        c_k = np.ones(self.num_users)
-        for iteration in range(self.max_iterations):
-            c_k_old = c_k.copy()
-            c_k_unnormalized = c_k_old @ E_prime_matrix
-            current_sum = np.sum(c_k_unnormalized)
-            if np.isclose(current_sum, 0):
-                print(f"      警告(Iter {iteration+1}): 貢献度の合計が0に近いため、計算を中断します。")
-                return np.full(self.num_users, np.nan)
-            c_k = (self.num_users / current_sum) * c_k_unnormalized
-            diff = np.sum(np.abs(c_k - c_k_old))
-            if (iteration + 1) % 10 == 0 or iteration == self.max_iterations - 1 or diff < self.tolerance:
+    def _contribution_problem(self) -> ContributionProblem:
+        """
+        E' を作らずに貢献度計算の問題を組み立てる（仮想中央銀行法の陰的適用）。
+        E' = (Eの非対角部分) + (予算_i / (N-1)) を i 行の対角以外に加えたもの、なので
+        (c @ E')_j = (c @ 非対角部分)_j + (Σ_i c_i * 予算_i - c_j * 予算_j) / (N-1)
+        """
+        return ContributionProblem(self.num_users, self._store.budgets(),
+                                   self._store.left_multiply_offdiag,
+                                   self._store.offdiag_matrix)
+
+    def _report_iteration_progress(self, iteration: int, diff: float, c_k: np.ndarray):
+        if iteration % 10 == 0 or iteration == self.max_iterations or diff < self.tolerance:
+            if self.verbosity >= VERBOSITY_FULL:
                 print(
-                    f"      Iter {(iteration+1):3d}: diff = {diff:.3e}, c = {['{:.4f}'.format(x) for x in c_k]}")
-            if diff < self.tolerance:
-                print(f"    反復計算収束 (Iter {iteration+1}回, 最終差分 {diff:.3e})")
-                return c_k
-        print(f"警告: 最大反復回数 ({self.max_iterations}回) に到達しましたが、収束しませんでした。")
-        print(f"      最終差分: {diff:.3e}")
-        return c_k
-
-    def calculate_all_contributions(self):
-        print("\n>>> 貢献度計算を開始します...")
+                    f"      Iter {iteration:3d}: diff = {diff:.3e}, c = {['{:.4f}'.format(x) for x in c_k]}")
+            else:
+                logger.debug("Iter %3d: diff = %.3e", iteration, diff)
+
+    def _calculate_contribution_vector(self, E_prime_matrix: np.ndarray = None,
+                                       initial_c: np.ndarray = None) -> np.ndarray:
+        """
+        E' の左固有ベクトル（要素の合計がN）を、self.solver で選んだソルバーで求める。
+        E_prime_matrix が None の場合は、E' を作らずに評価行列から陰的に計算する。
+        initial_c を渡すと、c=(1,...,1) の代わりにそこから反復を始める（ウォームスタート）。
+        ソルバーの反復回数・残差は self.last_solver_result に残る。
+        """
+        if E_prime_matrix is None:
+            if self.num_users <= 1:
+                return np.full(self.num_users, np.nan) if self.num_users > 0 else np.array([])
+            problem = self._contribution_problem()
+        elif E_prime_matrix.shape[0] != self.num_users or E_prime_matrix.shape[1] != self.num_users:
+            return np.full(self.num_users, np.nan) if self.num_users > 0 else np.array([])
+        else:
+            problem = ContributionProblem.from_E_prime(E_prime_matrix)
+
+        # 反復経過の報告は、表示かDEBUGログが有効なときだけ行う (文字列整形のコストを避ける)
+        progress = None
+        if self.verbosity >= VERBOSITY_FULL or logger.isEnabledFor(logging.DEBUG):
+            progress = self._report_iteration_progress
+
+        solve = get_contribution_solver(self.solver)
+        if problem.explicit_E_prime and solve is solve_linear:
+            solve = solve_power  # E' をそのまま渡されたときは直接解法が使えない
+        result = solve(problem, self.max_iterations, self.tolerance,
+                       initial_c=initial_c, progress=progress)
+        if not np.all(np.isfinite(result.c_vector)) and self.solver != SOLVER_POWER:
+            self._emit(VERBOSITY_SUMMARY, logging.WARNING,
+                       "警告: ソルバー '%s' が失敗したため、べき乗法で計算し直します。(%s)",
+                       self.solver, result.message)
+            result = solve_power(problem, self.max_iterations, self.tolerance,
+                                 initial_c=initial_c, progress=progress)
+        self.last_solver_result = result
+
+        if result.converged:
+            self._emit(VERBOSITY_FULL, logging.DEBUG,
+                       "    反復計算収束 (%s, Iter %d回, 残差 %.3e)",
+                       result.solver, result.iterations, result.residual)
+        else:
+            # 有限の値でも収束していない結果はそのまま公開されるので、必ず警告を出す
+            self._emit(VERBOSITY_SUMMARY, logging.WARNING, "警告: %s (%s)",
+                       result.message or "貢献度計算が収束しませんでした。", result.solver)
+            self._emit(VERBOSITY_SUMMARY, logging.WARNING,
+                       "      最終差分: %.3e, 残差: %.3e", result.last_diff, result.residual)
+        return result.c_vector
+
+    def calculate_all_contributions(self, initial_c: np.ndarray = None):
+        """
+        全ユーザーの貢献度を計算し直す。initial_c を渡すとそこから反復を始める。
+        省略時は、増分モードなら前回の c_vector、そうでなければ c=(1,...,1) から始める。
+        """
+        self._emit(VERBOSITY_FULL, logging.DEBUG, "\n>>> 貢献度計算を開始します...")
         if self.num_users == 0:
-            print("ユーザーがいないため、貢献度計算は実行されません。")
-            self.E_prime = np.array([])
+            self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                       "ユーザーがいないため、貢献度計算は実行されません。")
             self.c_vector = np.array([])
+            self._publish_results()
             return
         if self.num_users == 1:
-            print("ユーザー数が1人のため、貢献度計算は実行されません。")
-            self.E_prime = None  # E' は定義できない
+            self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                       "ユーザー数が1人のため、貢献度計算は実行されません。")
             self.c_vector = np.array([1.0])
-            self.display_c_vector()
+            self._emit_c_vector()
+            self._publish_results()
             return
 
-        self.E_prime = self._calculate_E_prime()
-        if self.E_prime is None:
-            self.c_vector = np.full(self.num_users, np.nan)
-        else:
-            self.c_vector = self._calculate_contribution_vector(self.E_prime)
+        # E' を作らず、評価行列から c @ E' を陰的に計算する (1反復あたり O(nnz + N))
+        # 増分モードでは前回の c_vector から反復を再開する
+        if initial_c is None and self.contribution_update == CONTRIBUTION_UPDATE_INCREMENTAL:
+            initial_c = self.c_vector
+        self.c_vector = self._calculate_contribution_vector(initial_c=initial_c)
+        self._pending_perturbation = 0.0
 
         if np.any(np.isnan(self.c_vector)):
-            print("!!! 貢献度計算に失敗しました。")
+            self._emit(VERBOSITY_SUMMARY, logging.ERROR, "!!! 貢献度計算に失敗しました。")
         else:
-            print("貢献度計算が完了しました。")
-        self.display_c_vector()
+            self._emit(VERBOSITY_FULL, logging.DEBUG, "貢献度計算が完了しました。")
+        self._emit_c_vector()
+        self._publish_results()
+
+    def _publish_results(self):
+        """
+        現在の貢献度と予算を読み取り専用の PublishedResults として公開する。
+        新しいインスタンスへの参照の差し替えだけなので、読み手が途中状態を見ることはない。
+        """
+        self.results_version += 1
+        self.published = PublishedResults.build(
+            self.results_version, self._results_token, self._membership_version,
+            [user.user_id for user in self.users], [user.username for user in self.users],
+            self.c_vector, self._store.budgets(), previous=self.published)
+        if self.shared_memory is not None:
+            self.shared_memory.publish(self)
+
+    def _publish_budgets(self):
+        """
+        貢献度の再計算を省略したときに、前回の貢献度と順位のまま予算だけを公開し直す。
+        参加ユーザーが前回の公開から変わっていれば、通常どおり全体を公開する。
+        """
+        if self.published is None or self.published.membership_version != self._membership_version:
+            self._publish_results()
+            return
+        self.results_version += 1
+        self.published = self.published.with_budgets(self.results_version, self._store.budgets())
+        if self.shared_memory is not None:
+            self.shared_memory.publish(self)
 
     # --- パラメータ設定メソッド --- (ここから追加/修正)
+    def set_solver(self, new_solver: str):
+        get_contribution_solver(new_solver)  # 未登録のソルバー名なら ValueError
+        self.solver = new_solver
+        self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                   "パラメータ変更: 貢献度計算ソルバーが '%s' に設定されました。", self.solver)
+
     def set_gamma_rate(self, new_gamma: float):
         if not (0 <= new_gamma < 1.0):
             raise ValueError("gamma_rateは0以上1.0未満である必要があります。")
+        if self.journal is not None:
+            self.journal.append_param(PARAM_GAMMA_RATE, new_gamma)
         self.gamma_rate = new_gamma
-        print(f"パラメータ変更: 自然回収率γが {self.gamma_rate:.2f} に設定されました。")
+        self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                   "パラメータ変更: 自然回収率γが %.2f に設定されました。", self.gamma_rate)
 
     def set_default_alpha_like(self, new_alpha_default: float):
         if not (0 < new_alpha_default <= self.alpha_like_max):
             raise ValueError(
                 f"デフォルトalpha_likeは0より大きく、最大alpha_like ({self.alpha_like_max:.2f}) 以下である必要があります。")
+        if self.journal is not None:
+            self.journal.append_param(PARAM_ALPHA_LIKE_DEFAULT, new_alpha_default)
         old_default = self.alpha_like_default
         self.alpha_like_default = new_alpha_default
         for user_id in self.user_alpha_settings:  # self.user_alpha_settings のキーでループ
             if np.isclose(self.user_alpha_settings[user_id], old_default):
                 self.user_alpha_settings[user_id] = self.alpha_like_default
-        print(
-            f"パラメータ変更: デフォルトalpha_likeが {self.alpha_like_default:.2f} に設定されました。")
+        self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                   "パラメータ変更: デフォルトalpha_likeが %.2f に設定されました。", self.alpha_like_default)
 
     def set_user_alpha_like(self, user_id: str, user_alpha: float):
         idx = self._get_user_index(user_id)
         if not (0 < user_alpha <= self.alpha_like_max):
             raise ValueError(
                 f"ユーザー設定alpha_likeは0より大きく、システム最大値 ({self.alpha_like_max:.2f}) 以下である必要があります。")
+        if self.journal is not None:
+            self.journal.append_param(PARAM_USER_ALPHA_LIKE, user_alpha, idx)
         self.user_alpha_settings[user_id] = user_alpha
-        print(
-            f"パラメータ変更: {self.user_index_to_name[idx]} のalpha_likeが {user_alpha:.2f} に設定されました。")
+        self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                   "パラメータ変更: %s のalpha_likeが %.2f に設定されました。",
+                   self.user_index_to_name[idx], user_alpha)
 
     def set_alpha_like_max(self, new_alpha_max: float):
         if not (0 < new_alpha_max < 1.0):
             raise ValueError("alpha_like_maxは0より大きく1.0未満である必要があります。")
+        if self.journal is not None:
+            self.journal.append_param(PARAM_ALPHA_LIKE_MAX, new_alpha_max)
 
         self.alpha_like_max = new_alpha_max  # 先にselfの値を更新
         if self.alpha_like_max < self.alpha_like_default:  # 更新後の値で比較
-            print(
-                f"警告: 新しいalpha_like_max ({self.alpha_like_max:.2f}) が現在のデフォルト値 ({self.alpha_like_default:.2f}) より小さいため、デフォルト値も更新します。")
+            self._emit(VERBOSITY_SUMMARY, logging.WARNING,
+                       "警告: 新しいalpha_like_max (%.2f) が現在のデフォルト値 (%.2f) より小さいため、デフォルト値も更新します。",
+                       self.alpha_like_max, self.alpha_like_default)
             self.alpha_like_default = self.alpha_like_max
 
         for user_id in self.user_alpha_settings:
             if self.user_alpha_settings[user_id] > self.alpha_like_max:
                 self.user_alpha_settings[user_id] = self.alpha_like_max
-                print(
-                    f"調整: {self._get_user_name_from_id(user_id)} のalpha_likeが上限値 {self.alpha_like_max:.2f} に調整されました。")
-        print(f"パラメータ変更: 最大alpha_likeが {self.alpha_like_max:.2f} に設定されました。")
+                self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                           "調整: %s のalpha_likeが上限値 %.2f に調整されました。",
+                           self._get_user_name_from_id(user_id), self.alpha_like_max)
+        self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                   "パラメータ変更: 最大alpha_likeが %.2f に設定されました。", self.alpha_like_max)
+
+    def get_user_alpha_like(self, user_id: str) -> float:
+        """このユーザーの「いいね」1回で実際に移転される評価量 (ユーザー設定を上限で切り詰めたもの)。"""
+        return min(self.user_alpha_settings.get(user_id, self.alpha_like_default), self.alpha_like_max)
 
     # --- PICSY 動的ロジック ---
+    def reserve_likes(self, liker_user_id: str, liked_content_creator_ids) -> Tuple[np.ndarray, float]:
+        """
+        liker_user_id から各作成者への「いいね」が成功するかを決め、成功する分の予算を予約する
+        (評価はまだ移転しない)。外部 (DBなど) への記録をロックの外で行う場合に使う。
+        予約済みの予算は、その後の「いいね」では使えない。記録に成功したら apply_reserved_likes で適用し、
+        失敗したら release_likes で予約を取り消す。
+
+        Returns:
+            Tuple[np.ndarray, float]: 各「いいね」が成功するかを表す bool 配列と、予約に使ったalpha。
+        """
+        liked_ids = list(liked_content_creator_ids)
+        alpha = self.get_user_alpha_like(liker_user_id)
+        accepted = self._plan_likes_batch([liker_user_id] * len(liked_ids), liked_ids)[0]
+        num_accepted = int(np.count_nonzero(accepted))
+        if num_accepted > 0:
+            self._reserved_budget[liker_user_id] = \
+                self._reserved_budget.get(liker_user_id, 0.0) + alpha * num_accepted
+        return accepted, alpha
+
+    def release_likes(self, liker_user_id: str, alpha: float, count: int):
+        """reserve_likes で予約した「いいね」count 件分 (1件あたり alpha) の予算を予約から外す。"""
+        remaining = self._reserved_budget.get(liker_user_id, 0.0) - alpha * count
+        if remaining > BUDGET_TOLERANCE:
+            self._reserved_budget[liker_user_id] = remaining
+        else:
+            self._reserved_budget.pop(liker_user_id, None)
+
+    def apply_reserved_likes(self, liker_user_id: str, liked_content_creator_ids, alpha: float):
+        """
+        reserve_likes で成功とされた「いいね」(liked_content_creator_ids はその作成者だけ) を、
+        予約したalphaのまま適用する。予算は予約で確保済みなので、ここでは確認し直さない。
+        予約の後に削除されたユーザーが関わる「いいね」は適用しない。
+        """
+        liked_ids = list(liked_content_creator_ids)
+        self.release_likes(liker_user_id, alpha, len(liked_ids))
+        liker_idx = self.user_id_to_index.get(liker_user_id)
+        if liker_idx is None or not liked_ids:
+            return
+        liked_idx = np.fromiter((self.user_id_to_index.get(user_id, -1) for user_id in liked_ids),
+                                dtype=np.int64, count=len(liked_ids))
+        liked_idx = liked_idx[(liked_idx >= 0) & (liked_idx != liker_idx)]
+        if len(liked_idx) > 0:
+            self._commit_likes(np.full(len(liked_idx), liker_idx, dtype=np.int64), liked_idx,
+                               np.full(len(liked_idx), alpha))
+
     def perform_like(self, liker_user_id: str, liked_content_creator_id: str):
         try:
             liker_idx = self._get_user_index(liker_user_id)
             liked_idx = self._get_user_index(liked_content_creator_id)
 
             if liker_idx == liked_idx:
-                print(
-                    f"情報: {self.user_index_to_name[liker_idx]} は自分自身に「いいね」できません（評価移転なし）。")
+                self._emit(VERBOSITY_FULL, logging.INFO,
+                           "情報: %s は自分自身に「いいね」できません（評価移転なし）。",
+                           self.user_index_to_name[liker_idx])
                 return False
 
-            actual_alpha_to_use = self.user_alpha_settings.get(
-                liker_user_id, self.alpha_like_default)
-            actual_alpha_to_use = min(actual_alpha_to_use, self.alpha_like_max)
-
-            print(
-                f"\n>>> {self.user_index_to_name[liker_idx]} が {self.user_index_to_name[liked_idx]} のコンテンツに「いいね」を実行中 (使用alpha: {actual_alpha_to_use:.3f})...")
-
-            if self.E[liker_idx, liker_idx] >= actual_alpha_to_use:
-                log_entry = {
-                    "timestamp": datetime.now(),
-                    "liker_id": liker_user_id,
-                    "liker_name": self.user_index_to_name[liker_idx],
-                    "liked_creator_id": liked_content_creator_id,
-                    "liked_creator_name": self.user_index_to_name[liked_idx],
-                    "alpha_used": actual_alpha_to_use
-                }
-                self.like_log.append(log_entry)
-                self.E[liker_idx, liker_idx] -= actual_alpha_to_use
-                self.E[liker_idx, liked_idx] += actual_alpha_to_use
-                print(f"  評価移転成功: {actual_alpha_to_use:.3f} ポイント。")
-                self.display_E(
+            actual_alpha_to_use = self.get_user_alpha_like(liker_user_id)
+
+            self._emit(VERBOSITY_FULL, logging.DEBUG,
+                       "\n>>> %s が %s のコンテンツに「いいね」を実行中 (使用alpha: %.3f)...",
+                       self.user_index_to_name[liker_idx], self.user_index_to_name[liked_idx],
+                       actual_alpha_to_use)
+
+            available = self._store.budget(liker_idx) - self._reserved_budget.get(liker_user_id, 0.0)
+            if available >= actual_alpha_to_use - BUDGET_TOLERANCE:
+                timestamp_ns = time.time_ns()
+                if self.journal is not None:
+                    self.journal.append_like(
+                        liker_idx, liked_idx, actual_alpha_to_use, timestamp_ns)
+                self.like_log.append(self.like_log.user_key(liker_user_id),
+                                     self.like_log.user_key(liked_content_creator_id),
+                                     actual_alpha_to_use, timestamp_ns)
+                self._store.transfer(liker_idx, liked_idx, actual_alpha_to_use)
+                self._emit(VERBOSITY_FULL, logging.DEBUG,
+                           "  評価移転成功: %.3f ポイント。", actual_alpha_to_use)
+                self._emit_E(
                     f"「いいね」後の評価行列 E (by {self.user_index_to_name[liker_idx]})")
                 if self.num_users > 1:
-                    self.calculate_all_contributions()
+                    self._update_contributions_after_likes(
+                        liker_idx, actual_alpha_to_use)
                 return True
             else:
-                print(
-                    f"  評価移転失敗: {self.user_index_to_name[liker_idx]} の予算不足です。")
-                print(
-                    f"    (現在の予算: {self.E[liker_idx, liker_idx]:.4f}, 「いいね」に必要な評価量: {actual_alpha_to_use:.3f})")
+                self._emit(VERBOSITY_FULL, logging.INFO,
+                           "  評価移転失敗: %s の予算不足です。", self.user_index_to_name[liker_idx])
+                self._emit(VERBOSITY_FULL, logging.INFO,
+                           "    (現在の予算: %.4f, 「いいね」に必要な評価量: %.3f)",
+                           self._store.budget(liker_idx), actual_alpha_to_use)
                 return False
         except ValueError as e:
-            print(f"エラー: 「いいね」処理中に問題が発生しました - {e}")
+            self._emit(VERBOSITY_SUMMARY, logging.WARNING,
+                       "エラー: 「いいね」処理中に問題が発生しました - %s", e)
             return False
 
+    def perform_likes_batch(self, liker_user_ids, liked_content_creator_ids) -> np.ndarray:
+        """
+        複数の「いいね」をまとめて適用し、貢献度の再計算はバッチ全体で1回だけ行う。
+
+        liker_user_ids と liked_content_creator_ids は同じ長さのユーザーIDの列
+        (リストや NumPy 配列)。「いいね」は与えられた順に適用したものとして扱い、
+        同じユーザーの「いいね」が続いて予算が尽きた場合はそれ以降が失敗になる。
+        存在しないユーザーIDや自分自身への「いいね」も失敗として扱う。
+
+        Returns:
+            np.ndarray: 各「いいね」が成功したかを表す bool 配列。
+        """
+        accepted, liker_idx, liked_idx, alpha_by_index = self._plan_likes_batch(
+            liker_user_ids, liked_content_creator_ids)
+        num_likes = len(accepted)
+        self._emit(VERBOSITY_FULL, logging.DEBUG,
+                   "\n>>> 「いいね」%d件をまとめて処理中...", num_likes)
+
+        accepted_idx = np.flatnonzero(accepted)
+        accepted_likers = liker_idx[accepted_idx]
+        accepted_liked = liked_idx[accepted_idx]
+        accepted_alphas = alpha_by_index[accepted_likers]
+        self._emit(VERBOSITY_SUMMARY, logging.INFO, "  評価移転成功: %d件 / 失敗: %d件",
+                   len(accepted_idx), num_likes - len(accepted_idx))
+        if len(accepted_idx) > 0:
+            self._commit_likes(accepted_likers, accepted_liked, accepted_alphas)
+        return accepted
+
+    def _commit_likes(self, liker_idx: np.ndarray, liked_idx: np.ndarray, alphas: np.ndarray):
+        """予算の確認が済んだ「いいね」をジャーナルに書き、適用して貢献度を更新する。"""
+        timestamp_ns = time.time_ns()
+        if self.journal is not None:
+            self.journal.append_likes(liker_idx, liked_idx, alphas, timestamp_ns)
+        self._apply_likes(liker_idx, liked_idx, alphas, timestamp_ns)
+        if self.num_users > 1:
+            self._update_contributions_after_likes(liker_idx, alphas)
+
+    def _plan_likes_batch(self, liker_user_ids, liked_content_creator_ids):
+        """
+        perform_likes_batch の「いいね」のうち成功するものを決める (エンジンは変更しない)。
+        reserve_likes で予約済みの予算は使えないものとして扱う。
+        (成功の bool 配列, いいねした人のインデックス, された人のインデックス, インデックス順の使用alpha) を返す。
+        """
+        liker_ids = np.asarray(liker_user_ids)
+        creator_ids = np.asarray(liked_content_creator_ids)
+        if liker_ids.ndim != 1 or liker_ids.shape != creator_ids.shape:
+            raise ValueError("liker_user_ids と liked_content_creator_ids は同じ長さの1次元配列である必要があります。")
+        num_likes = len(liker_ids)
+
+        liker_idx = np.fromiter((self.user_id_to_index.get(user_id, -1) for user_id in liker_ids.tolist()),
+                                dtype=np.int64, count=num_likes)
+        liked_idx = np.fromiter((self.user_id_to_index.get(user_id, -1) for user_id in creator_ids.tolist()),
+                                dtype=np.int64, count=num_likes)
+        accepted = (liker_idx >= 0) & (liked_idx >= 0) & (liker_idx != liked_idx)
+
+        # ユーザーごとの使用alpha (上限で切り詰め) をインデックス順の配列にする
+        alpha_by_index = np.array([
+            self.get_user_alpha_like(self.user_index_to_id[i]) for i in range(self.num_users)
+        ])
+
+        candidates = np.flatnonzero(accepted)
+        if len(candidates) > 0:
+            # 同じユーザーの「いいね」を元の順序のまま並べ、予算の消費量を累積和で求める。
+            # alphaはユーザーごとに一定なので、一度予算不足になったらそれ以降も全て失敗する。
+            order = candidates[np.argsort(liker_idx[candidates], kind="stable")]
+            ordered_likers = liker_idx[order]
+            ordered_alphas = alpha_by_index[ordered_likers]
+            cumulative = np.cumsum(ordered_alphas)
+            group_starts = np.flatnonzero(
+                np.r_[True, ordered_likers[1:] != ordered_likers[:-1]])
+            group_lengths = np.diff(np.r_[group_starts, len(order)])
+            spent_before_group = np.repeat(
+                cumulative[group_starts] - ordered_alphas[group_starts], group_lengths)
+            budgets = np.array(self._store.budgets(), dtype=float)
+            for user_id, reserved in self._reserved_budget.items():
+                reserved_idx = self.user_id_to_index.get(user_id)
+                if reserved_idx is not None:
+                    budgets[reserved_idx] -= reserved
+            within_budget = budgets[ordered_likers] - \
+                (cumulative - spent_before_group - ordered_alphas) >= ordered_alphas - BUDGET_TOLERANCE
+            accepted[order[~within_budget]] = False
+        return accepted, liker_idx, liked_idx, alpha_by_index
+
+    def _apply_likes(self, liker_idx: np.ndarray, liked_idx: np.ndarray, alphas: np.ndarray, timestamp_ns):
+        """
+        予算の確認が済んだ「いいね」をインデックスで受け取り、評価行列といいね履歴に反映する。
+        貢献度の更新は呼び出し側で行う。timestamp_ns はスカラーでも配列でもよい。
+        """
+        if len(liker_idx) == 0:
+            return
+        self._store.transfer_many(liker_idx, liked_idx, alphas)
+
+        # いいね履歴にはインデックスではなく、ユーザーIDに対応するキーで記録する
+        involved, inverse = np.unique(
+            np.concatenate([liker_idx, liked_idx]), return_inverse=True)
+        log_keys = self.like_log.user_keys(
+            [self.user_index_to_id[i] for i in involved.tolist()])[inverse]
+        self.like_log.append_many(
+            log_keys[:len(liker_idx)], log_keys[len(liker_idx):], alphas, timestamp_ns)
+
+    def _update_contributions_after_likes(self, liker_idx, alpha):
+        """
+        「いいね」による評価移転の後に貢献度を更新する。
+        liker_idx と alpha はスカラー (1件) でも配列 (バッチ) でもよい。
+
+        増分モードでは、評価行列側で変わるのは予算 E_ii と評価 E_ij の2要素だけで、
+        E' はそこから陰的に決まる。E' の i 行の変化量は L1 ノルムで 2α(N-2)/(N-1) なので、
+        前回の c に対する残差 ||c @ E' - c||_1 は c_i * 2α(N-2)/(N-1) 以下しか増えない。
+        この上界の累積 (1人あたり) が perturbation_bound 以内なら再計算を省略し、
+        超えたら前回の c_vector から反復を再開する。省略した場合も、予算は公開し直す。
+        """
+        if (self.contribution_update != CONTRIBUTION_UPDATE_INCREMENTAL
+                or self.c_vector is None or np.any(np.isnan(self.c_vector))):
+            self._refresh_contributions()
+            return
+
+        row_change = 2 * np.asarray(alpha) * \
+            (self.num_users - 2) / (self.num_users - 1)
+        self._pending_perturbation += float(
+            np.sum(self.c_vector[liker_idx] * row_change)) / self.num_users
+        if self._pending_perturbation <= self.perturbation_bound:
+            self._emit(VERBOSITY_FULL, logging.DEBUG,
+                       "  貢献度の変化が許容範囲内のため再計算を省略します (累積変化量: %.3e)",
+                       self._pending_perturbation)
+            self._publish_budgets()
+            return
+        self._refresh_contributions()
+
+    def _refresh_contributions(self, initial_c: np.ndarray = None):
+        """
+        評価行列や参加ユーザーが変わった後に貢献度を更新する。
+        スケジューラーがあれば計算はそちらに任せて変更を知らせるだけにする。initial_c (ユーザー増減時の
+        ウォームスタート) があれば、計算が終わるまでの暫定の貢献度として公開しておく。
+        スケジューラーがない場合と、公開できる暫定値がない場合はその場で計算する。
+        """
+        if self.contribution_scheduler is None:
+            self.calculate_all_contributions(initial_c=initial_c)
+            return
+        if initial_c is not None:
+            self.c_vector = initial_c
+            self._publish_results()
+        elif self.c_vector is None or len(self.c_vector) != self.num_users:
+            self.calculate_all_contributions()
+            return
+        self.contribution_scheduler.notify()
+
     def perform_natural_recovery(self):
-        print(f"\n>>> 自然回収処理を実行中 (gamma = {self.gamma_rate})...")
+        self._emit(VERBOSITY_FULL, logging.DEBUG,
+                   "\n>>> 自然回収処理を実行中 (gamma = %s)...", self.gamma_rate)
         if self.num_users == 0:
-            print("ユーザーがいないため自然回収はスキップされます。")
+            self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                       "ユーザーがいないため自然回収はスキップされます。")
             return
 
-        new_E = self.E.copy()
-        for i in range(self.num_users):
-            sum_others_new_row_i = 0  # この行の新しい他者評価の合計を計算
-            for j in range(self.num_users):
-                if i == j:
-                    continue
-                new_E[i, j] = (1 - self.gamma_rate) * self.E[i, j]
-                sum_others_new_row_i += new_E[i, j]
+        if self.journal is not None:
+            self.journal.append_recovery(self.gamma_rate)
+        self._store.decay(self.gamma_rate)
+        self._emit(VERBOSITY_SUMMARY, logging.INFO, "自然回収処理が完了しました。")
+        self._emit_E("自然回収後の評価行列 E")
+        if self.num_users > 1:
+            self._refresh_contributions()
+
+    # --- 参加ユーザーの増減 ---
+    def add_users(self, new_users: List[PicsyUser]):
+        """
+        評価行列や履歴を保ったまま新しいユーザーを追加する。
+        新規ユーザーは予算1・評価0で参加し、インデックスは末尾に割り当てられる。
+        貢献度は既存の c_vector に新規ユーザー分 (平均値1) を足したものから計算し直す。
+        """
+        new_ids = [user.user_id for user in new_users]
+        duplicated = [user_id for user_id in new_ids if user_id in self.user_id_to_index]
+        if duplicated or len(set(new_ids)) != len(new_ids):
+            raise ValueError(f"既に存在する、または重複したユーザーIDがあります: {duplicated or new_ids}")
+        if not new_users:
+            return
 
-            new_E[i, i] = 1.0 - sum_others_new_row_i  # 予算を行和が1になるように設定
+        if self.journal is not None:
+            self.journal.append_users_added([(user.user_id, user.username) for user in new_users])
+        old_num_users = self.num_users
+        self._insert_users(new_users)
+        self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                   "\n>>> ユーザーを%d人追加しました (合計 %d人)。", len(new_users), self.num_users)
+
+        warm_start = None
+        if self.c_vector is not None and len(self.c_vector) == old_num_users and np.all(np.isfinite(self.c_vector)):
+            warm_start = np.concatenate([self.c_vector, np.ones(len(new_users))])
+        self._refresh_contributions(initial_c=warm_start)
+
+    def remove_users(self, user_ids: List[str]):
+        """
+        評価行列や履歴を保ったままユーザーを取り除く。
+
+        - 取り除くユーザーの位置には末尾のユーザーを移す (swap-remove)。
+          移動したユーザーのインデックスだけが変わり、対応表もそれに合わせて更新する。
+        - 取り除くユーザーが受け取っていた評価 E_ki は、評価していた k の予算 E_kk に戻す。
+          取り除くユーザー自身の評価 (行) はそのまま消える。どちらも残るユーザーの行和は1のまま。
+        - 貢献度は残ったユーザーの c_vector を合計Nに正規化し直したものから計算し直す。
+        """
+        indices = sorted({self._get_user_index(user_id) for user_id in user_ids}, reverse=True)
+        if len(indices) >= self.num_users:
+            raise ValueError("全てのユーザーを取り除くことはできません。最低1人以上のユーザーが必要です。")
+        if not indices:
+            return
 
-        self.E = new_E
-        print("自然回収処理が完了しました。")
-        self.display_E("自然回収後の評価行列 E")
+        if self.journal is not None:
+            self.journal.append_users_removed([self.user_index_to_id[idx] for idx in indices])
+        valid_c = (self.c_vector is not None and len(self.c_vector) == self.num_users
+                   and np.all(np.isfinite(self.c_vector)))
+        new_order = self._delete_users(indices)
+        self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                   "\n>>> ユーザーを%d人取り除きました (合計 %d人)。", len(indices), self.num_users)
+
+        warm_start = None
+        if valid_c:
+            warm_start = self.c_vector[new_order]
+            warm_start = warm_start * (self.num_users / np.sum(warm_start))
+        self.c_vector = None
+        self._refresh_contributions(initial_c=warm_start)
+
+    def _insert_users(self, new_users: List[PicsyUser]):
+        """新しいユーザーを評価行列と対応表の末尾に加える (貢献度は計算し直さない)。"""
+        old_num_users = self.num_users
+        self._membership_version += 1
+        self._store.add_users(len(new_users))
+        for offset, user in enumerate(new_users):
+            idx = old_num_users + offset
+            self.users.append(user)
+            self.user_id_to_index[user.user_id] = idx
+            self.user_index_to_name[idx] = user.username
+            self.user_index_to_id[idx] = user.user_id
+            self.user_alpha_settings[user.user_id] = self.alpha_like_default
+        self.num_users = old_num_users + len(new_users)
+
+    def _delete_users(self, indices: List[int]) -> np.ndarray:
+        """
+        降順に並べたインデックスのユーザーを swap-remove で取り除く (貢献度は計算し直さない)。
+        新しい位置ごとの元のインデックスを返す。
+        """
+        new_order = swap_remove_order(self.num_users, indices)
+        self._membership_version += 1
+        self._store.remove_users(indices)
+        for idx in indices:  # 大きい順に swap-remove
+            last = len(self.users) - 1
+            removed_user = self.users[idx]
+            del self.user_id_to_index[removed_user.user_id]
+            self.user_alpha_settings.pop(removed_user.user_id, None)
+            if idx != last:
+                moved_user = self.users[last]
+                self.users[idx] = moved_user
+                self.user_id_to_index[moved_user.user_id] = idx
+                self.user_index_to_name[idx] = moved_user.username
+                self.user_index_to_id[idx] = moved_user.user_id
+            self.users.pop()
+            del self.user_index_to_name[last]
+            del self.user_index_to_id[last]
+        self.num_users = len(self.users)
+        return new_order
+
+    # --- スナップショット ---
+    def _current_params(self) -> Dict:
+        """__init__ に渡せる形の現在のエンジン設定 (verbosity を除く)。"""
+        return {
+            "alpha_like_default": self.alpha_like_default,
+            "alpha_like_max": self.alpha_like_max,
+            "gamma_rate": self.gamma_rate,
+            "max_iterations": self.max_iterations,
+            "tolerance": self.tolerance,
+            "storage": self.storage,
+            "contribution_update": self.contribution_update,
+            "perturbation_bound": self.perturbation_bound,
+            "lazy_decay": self.lazy_decay,
+            "solver": self.solver,
+            "like_log_capacity": self.like_log.capacity,
+            "like_log_retention": self.like_log.retention,
+            "like_log_spill_path": self.like_log.spill_path
+        }
+
+    def save_snapshot(self, path: str):
+        """
+        エンジンの状態 (評価行列、貢献度、パラメータ、ユーザーごとのalpha、日付・フェーズ、
+        いいね履歴) を path のディレクトリに保存する。評価行列は保存値のまま書くので、
+        遅延自然回収の倍率が溜まっていても実値化は起こらない。
+        """
+        like_records, like_log_state = self.like_log.snapshot_state()
+        arrays = dict(self._store.snapshot_arrays())
+        arrays["like_log"] = like_records
+        if self.c_vector is not None:
+            arrays["c_vector"] = self.c_vector
+        metadata = {
+            "params": self._current_params(),
+            "users": [[user.user_id, user.username] for user in self.users],
+            "user_alpha_settings": {user_id: float(alpha) for user_id, alpha in self.user_alpha_settings.items()},
+            "current_day": self.current_day,
+            "current_phase": self.current_phase,
+            "contribution_calculation_count": self.contribution_calculation_count,
+            "phases_to_calculate_contribution": self.phases_to_calculate_contribution,
+            "store": {"offdiag_scale": self._store.offdiag_scale, "decay_epoch": self._store.decay_epoch},
+            "like_log": like_log_state,
+            "journal": None,
+        }
+        if self.journal is not None:
+            # スナップショットに含まれるのはここまでの記録なので、その位置を残しておく
+            self.journal.flush()
+            metadata["journal"] = {"path": os.path.abspath(self.journal.path),
+                                   "position": self.journal.position}
+        write_snapshot(path, metadata, arrays)
+        self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                   "スナップショットを保存しました: %s", path)
+
+    @classmethod
+    def from_snapshot(cls, path: str, mmap_mode: str = "c", verify: bool = True,
+                      verbosity: int = VERBOSITY_QUIET) -> "PicsyEngine":
+        """
+        save_snapshot() で保存したスナップショットからエンジンを復元する。
+
+        密行列モードの評価行列はメモリマップ (既定は copy-on-write) で開くので、
+        巨大な行列でも全体を読み込まずにすぐ使い始められる。保存されていた貢献度を
+        そのまま使い、計算し直さない。verify=False ならチェックサムの確認を省く。
+        """
+        metadata, arrays = read_snapshot(path, mmap_mode=mmap_mode, verify=verify)
+        params = metadata["params"]
+        store = store_class(params["storage"]).from_snapshot_arrays(
+            arrays, lazy_decay=params["lazy_decay"],
+            offdiag_scale=metadata["store"]["offdiag_scale"],
+            decay_epoch=metadata["store"]["decay_epoch"])
+        engine = cls([PicsyUser(user_id, username) for user_id, username in metadata["users"]],
+                     verbosity=verbosity, evaluation_store=store,
+                     initial_c_vector=np.array(arrays["c_vector"]) if "c_vector" in arrays else None,
+                     **params)
+        engine.user_alpha_settings.update(metadata["user_alpha_settings"])
+        engine.current_day = metadata["current_day"]
+        engine.current_phase = metadata["current_phase"]
+        engine.contribution_calculation_count = metadata["contribution_calculation_count"]
+        engine.phases_to_calculate_contribution = metadata["phases_to_calculate_contribution"]
+        engine.like_log.restore_state(arrays["like_log"], metadata["like_log"])
+        engine.journal_checkpoint = metadata.get("journal")
+        return engine
+
+    # --- 評価行列の一括入出力 (DBなど外部の保存先との受け渡し用) ---
+    @classmethod
+    def from_evaluations(cls, user_list: List[PicsyUser], budgets: np.ndarray, rows: np.ndarray,
+                         cols: np.ndarray, values: np.ndarray, **engine_kwargs) -> "PicsyEngine":
+        """
+        予算ベクトルと他者評価の COO 形式 (rows, cols, values; インデックスは user_list の並び)
+        から評価行列を一度に組み立ててエンジンを作る。貢献度は作成時に計算する。
+        """
+        storage = engine_kwargs.get("storage", STORAGE_DENSE)
+        store = store_class(storage).from_coo(
+            np.asarray(budgets, dtype=float), np.asarray(rows, dtype=np.int64),
+            np.asarray(cols, dtype=np.int64), np.asarray(values, dtype=float),
+            lazy_decay=engine_kwargs.get("lazy_decay", False))
+        return cls(user_list, evaluation_store=store, **engine_kwargs)
+
+    def export_evaluations(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        評価行列の実値を (予算ベクトル, rows, cols, values) で返す (from_evaluations の逆)。
+        他者評価は非ゼロ要素だけの COO 形式で、遅延自然回収の倍率は掛けた後の値になる。
+        """
+        rows, cols, values = self._store.to_coo()
+        return self._store.budgets(), rows, cols, values
+
+    # --- 共有メモリ ---
+    def attach_shared_memory(self, writer: SharedEngineWriter):
+        """
+        以降、貢献度を公開するたびに、公開結果を writer の共有メモリにも書き出す (評価行列は
+        writer.matrix_interval 秒に1回と、publish_shared_matrix() を呼んだとき)。
+        このエンジンのプロセスが唯一の書き手になり、他のプロセスは SharedEngineReader で
+        コピーせずに読む。公開済みの結果があれば、すぐに書き出す。
+        """
+        self.shared_memory = writer
+        if self.published is not None:
+            writer.publish(self)
+
+    def publish_shared_matrix(self):
+        """評価行列を今すぐ共有メモリに書き出す (attach_shared_memory() していなければ何もしない)。"""
+        if self.shared_memory is not None and self.published is not None:
+            self.shared_memory.publish_matrix(self)
+
+    # --- 先行書き込みジャーナル ---
+    def attach_journal(self, journal: LikeJournal):
+        """
+        以降の「いいね」・自然回収・パラメータ変更・フェーズ進行・ユーザー増減を、
+        状態を変える前に journal に記録する。
+        """
+        self.journal = journal
+
+    def replay_journal(self, path: str, start: int = 0) -> int:
+        """
+        ジャーナルの start 件目以降を再生して状態を進め、再生した記録の数を返す。
+
+        連続する「いいね」の記録はまとめて transfer_many で適用し、予算の確認や
+        貢献度の計算は行わない (記録されているのは受け付け済みの「いいね」だけなので)。
+        貢献度は最後に1回だけ計算し直す。再生中はジャーナルへの記録を止める。
+        """
+        records = read_journal(path, start)
+        kinds = records["kind"]
+        run_ends = np.r_[np.flatnonzero(np.diff(kinds)) + 1, len(records)]
+        journal, self.journal = self.journal, None
+        pos = 0
+        try:
+            while pos < len(records):
+                kind = kinds[pos]
+                if kind == JOURNAL_LIKE:
+                    end = int(run_ends[np.searchsorted(run_ends, pos, side="right")])
+                    run = records[pos:end]
+                    self._apply_likes(run["a"].astype(np.int64), run["b"].astype(np.int64),
+                                      run["value"], run["timestamp_ns"])
+                    pos = end
+                    continue
+                record = records[pos]
+                pos += 1
+                if kind == JOURNAL_RECOVERY:
+                    self._store.decay(float(record["value"]))
+                elif kind == JOURNAL_PARAM:
+                    self._replay_param(int(record["a"]), int(record["b"]), float(record["value"]))
+                elif kind == JOURNAL_PHASE:
+                    self.current_day = int(record["a"])
+                    self.current_phase = JOURNAL_PHASES[int(record["b"])]
+                    if self.current_phase in self.phases_to_calculate_contribution and self.num_users > 1:
+                        self.contribution_calculation_count += 1
+                elif kind in (JOURNAL_USERS_ADDED, JOURNAL_USERS_REMOVED):
+                    payload, pos = decode_payload(records, pos - 1)
+                    if payload is None:  # 書き込み途中で落ちた最後の記録
+                        break
+                    if kind == JOURNAL_USERS_ADDED:
+                        self._insert_users([PicsyUser(user_id, username) for user_id, username in payload])
+                    else:
+                        self._delete_users(sorted({self._get_user_index(user_id) for user_id in payload},
+                                                  reverse=True))
+                    self.c_vector = None
+                else:
+                    raise ValueError(f"ジャーナルに不明な種類の記録があります: kind={kind} (位置 {start + pos - 1})")
+        finally:
+            self.journal = journal
+
+        self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                   "ジャーナルを再生しました: %d件 (%s, %d件目から)", pos, path, start)
+        self._pending_perturbation = 0.0
         if self.num_users > 1:
-            self.calculate_all_contributions()
+            self.calculate_all_contributions(
+                initial_c=self.c_vector if self.c_vector is not None and len(self.c_vector) == self.num_users
+                else None)
+        return pos
+
+    def _replay_param(self, param: int, user_idx: int, value: float):
+        if param == PARAM_GAMMA_RATE:
+            self.set_gamma_rate(value)
+        elif param == PARAM_ALPHA_LIKE_DEFAULT:
+            self.set_default_alpha_like(value)
+        elif param == PARAM_ALPHA_LIKE_MAX:
+            self.set_alpha_like_max(value)
+        elif param == PARAM_USER_ALPHA_LIKE:
+            self.set_user_alpha_like(self.user_index_to_id[user_idx], value)
+        else:
+            raise ValueError(f"ジャーナルに不明なパラメータ番号があります: {param}")
+
+    @classmethod
+    def restore(cls, snapshot_path: str, journal_path: str = None, mmap_mode: str = "c",
+                verify: bool = True, verbosity: int = VERBOSITY_QUIET) -> "PicsyEngine":
+        """
+        スナップショットを読み込み、それ以降のジャーナルを再生して最新の状態に戻す。
+        journal_path を省略するとスナップショットに記録されたジャーナルを使う。
+        スナップショットがジャーナルの位置を持っていなければ、ジャーナルの先頭から再生する。
+        """
+        engine = cls.from_snapshot(snapshot_path, mmap_mode=mmap_mode, verify=verify, verbosity=verbosity)
+        checkpoint = engine.journal_checkpoint or {}
+        journal_path = journal_path or checkpoint.get("path")
+        if journal_path is not None:
+            engine.replay_journal(journal_path, start=checkpoint.get("position", 0))
+        return engine
 
     # --- エンジン再初期化メソッド ---
     def reinitialize_engine(self,
@@ -355,8 +1117,15 @@ class PicsyEngine:
                             alpha_like_max: float = None,
                             gamma_rate: float = None,
                             max_iterations: int = None,
-                            tolerance: float = None):
-        print(f"\n>>> エンジンを再初期化します (新ユーザー数: {len(new_user_list)})...")
+                            tolerance: float = None,
+                            storage: str = None,
+                            contribution_update: str = None,
+                            perturbation_bound: float = None,
+                            lazy_decay: bool = None,
+                            solver: str = None,
+                            verbosity: int = None):
+        self._emit(VERBOSITY_SUMMARY, logging.INFO,
+                   "\n>>> エンジンを再初期化します (新ユーザー数: %d)...", len(new_user_list))
 
         # __init__ に処理を委譲（パラメータは None の場合、既存値を維持するロジックを __init__ 側で持つか、
         # ここで明示的に現在の値をデフォルトとして渡す）
@@ -364,13 +1133,8 @@ class PicsyEngine:
         # __init__ とほぼ同じロジックをここに記述する（または、__init__を内部ヘルパーに分割する）
 
         # 簡潔にするため、パラメータは指定されなければ現在のエンジン設定を引き継ぐ
-        current_params = {
-            "alpha_like_default": self.alpha_like_default,
-            "alpha_like_max": self.alpha_like_max,
-            "gamma_rate": self.gamma_rate,
-            "max_iterations": self.max_iterations,
-            "tolerance": self.tolerance
-        }
+        current_params = self._current_params()
+        current_params["verbosity"] = self.verbosity
         if alpha_like_default is not None:
             current_params["alpha_like_default"] = alpha_like_default
         if alpha_like_max is not None:
@@ -381,7 +1145,22 @@ class PicsyEngine:
             current_params["max_iterations"] = max_iterations
         if tolerance is not None:
             current_params["tolerance"] = tolerance
-
+        if storage is not None:
+            current_params["storage"] = storage
+        if contribution_update is not None:
+            current_params["contribution_update"] = contribution_update
+        if perturbation_bound is not None:
+            current_params["perturbation_bound"] = perturbation_bound
+        if lazy_decay is not None:
+            current_params["lazy_decay"] = lazy_decay
+        if solver is not None:
+            current_params["solver"] = solver
+        if verbosity is not None:
+            current_params["verbosity"] = verbosity
+
+        # 共有メモリの書き手と貢献度計算のスケジューラーは再初期化後も引き継ぐ
+        shared_memory = self.shared_memory
+        contribution_scheduler = self.contribution_scheduler
         # 新しいインスタンスを作るかのように、selfの属性を再設定
         self.__init__(  # 自分自身の__init__を再度呼び出すことでリセット
             user_list=new_user_list,
@@ -389,46 +1168,54 @@ class PicsyEngine:
             alpha_like_max=current_params["alpha_like_max"],
             gamma_rate=current_params["gamma_rate"],
             max_iterations=current_params["max_iterations"],
-            tolerance=current_params["tolerance"]
+            tolerance=current_params["tolerance"],
+            storage=current_params["storage"],
+            contribution_update=current_params["contribution_update"],
+            perturbation_bound=current_params["perturbation_bound"],
+            lazy_decay=current_params["lazy_decay"],
+            solver=current_params["solver"],
+            verbosity=current_params["verbosity"],
+            like_log_capacity=current_params["like_log_capacity"],
+            like_log_retention=current_params["like_log_retention"],
+            like_log_spill_path=current_params["like_log_spill_path"]
         )
-        print(f"エンジンが新ユーザー構成で再初期化されました。")
+        if shared_memory is not None:
+            self.attach_shared_memory(shared_memory)
+        self.contribution_scheduler = contribution_scheduler
+        self._emit(VERBOSITY_SUMMARY, logging.INFO, "エンジンが新ユーザー構成で再初期化されました。")
 
     # --- 状態取得・表示メソッド群 --- (ここから追加/修正)
 
     def get_user_budget(self, user_id: str) -> float:
         idx = self._get_user_index(user_id)
-        return self.E[idx, idx]
+        return self._store.budget(idx)
 
+    # 貢献度・購買力・ステータスは、最後に公開された結果 (self.published) から読む。
+    # 増分モードで再計算を省略した「いいね」の後も予算は公開し直すので、予算は現在値になる
+    # (貢献度は最後に計算した時点の値のまま)。
     def get_user_contribution(self, user_id: str) -> float:
-        if self.c_vector is None or (self.num_users > 0 and np.any(np.isnan(self.c_vector))):
-            return np.nan if self.num_users > 0 else 0.0  # ユーザー0なら貢献度も0
-        idx = self._get_user_index(user_id)
-        # ユーザー数が1でc_vectorが[1.0]のような場合、idxが0以外だとエラーになるのでチェック
-        if idx < len(self.c_vector):
-            return self.c_vector[idx]
-        return np.nan  # インデックス範囲外の場合 (基本的には起こらないはず)
+        return self.published.get_contribution(user_id)
 
     def get_user_purchasing_power(self, user_id: str) -> float:
-        budget = self.get_user_budget(user_id)
-        contribution = self.get_user_contribution(user_id)
-        if np.isnan(budget) or np.isnan(contribution):
-            return np.nan
-        return budget * contribution
+        return self.published.get_purchasing_power(user_id)
 
     def get_user_status(self, user_id: str) -> Dict:
-        idx = self._get_user_index(user_id)
-        username = self.user_index_to_name[idx]
-        contribution = self.get_user_contribution(user_id)
-        budget = self.get_user_budget(user_id)
-        purchasing_power = self.get_user_purchasing_power(user_id)
+        return self.published.get_status(user_id)
 
-        return {
-            "id": user_id,
-            "name": username,
-            "contribution": contribution if not np.isnan(contribution) else "N/A",
-            "budget": budget,
-            "purchasing_power": purchasing_power if not np.isnan(purchasing_power) else "N/A"
-        }
+    def get_status_many(self, user_ids: List[str]) -> List[Dict]:
+        """複数ユーザーのステータスを1回でまとめて返す。存在しないユーザーの位置は None。"""
+        return self.published.get_status_many(user_ids)
+
+    def get_top_contributors(self, limit: int = 10, offset: int = 0) -> List[Dict]:
+        """
+        貢献度の上位 offset+1 位から limit 人分のステータスを "rank" 付きで返す。
+        上位 LEADERBOARD_TOP_K 人までは公開時に求めてあり、それより深いページは全順位から返す。
+        """
+        return self.published.get_top(limit, offset)
+
+    def get_user_rank(self, user_id: str) -> int:
+        """貢献度の順位 (1始まり、NaN は最下位扱い)。"""
+        return self.published.get_rank(user_id)
 
     def display_all_user_status(self):
         print("\n--- 全ユーザーステータス ---")
@@ -454,15 +1241,22 @@ class PicsyEngine:
             print("まだ「いいね」の履歴はありません。")
             return
 
-        for log_entry in reversed(self.like_log[-10:]):
-            timestamp_str = log_entry['timestamp'].strftime(
-                '%Y-%m-%d %H:%M:%S')
-            print(f"[{timestamp_str}] {log_entry['liker_name']} ({log_entry['liker_id']}) "
-                  f"-> {log_entry['liked_creator_name']} ({log_entry['liked_creator_id']}) "
-                  f"| α={log_entry['alpha_used']:.3f}")
+        for record in reversed(self.like_log.tail(10)):
+            timestamp_str = datetime.fromtimestamp(
+                record['timestamp_ns'] / 1e9).strftime('%Y-%m-%d %H:%M:%S')
+            liker_id = self.like_log.user_id(record['liker'])
+            liked_creator_id = self.like_log.user_id(record['liked'])
+            print(f"[{timestamp_str}] {self._log_display_name(liker_id)} ({liker_id}) "
+                  f"-> {self._log_display_name(liked_creator_id)} ({liked_creator_id}) "
+                  f"| α={record['alpha']:.3f}")
         if len(self.like_log) > 10:
             print(f"...他{len(self.like_log)-10}件")
 
+    def _log_display_name(self, user_id: str) -> str:
+        """いいね履歴の表示用の名前。既に取り除かれたユーザーなら (退会済み) と表示する。"""
+        idx = self.user_id_to_index.get(user_id)
+        return self.user_index_to_name[idx] if idx is not None else "(退会済み)"
+
     def display_system_status(self):
         print("\n--- システム状況 ---")
         print(f"  経過日数: {self.current_day} 日目")
@@ -480,7 +1274,8 @@ class PicsyEngine:
                 self.current_phase = "朝"
                 self.current_day = 1
             else:  # ユーザーがいない場合は何もしない
-                print("ユーザーがいないためフェーズを進行できません。")
+                self._emit(VERBOSITY_SUMMARY, logging.WARNING,
+                           "ユーザーがいないためフェーズを進行できません。")
                 return
 
         else:
@@ -490,10 +1285,18 @@ class PicsyEngine:
             if next_phase_idx == 0:
                 self.current_day += 1
 
-        print(f"\n=== {self.current_day}日目 - {self.current_phase} ===")
-        self.display_system_status()
+        if self.journal is not None:
+            self.journal.append_phase(self.current_day, self.current_phase)
+        self._emit(VERBOSITY_SUMMARY, logging.INFO, "\n=== %d日目 - %s ===",
+                   self.current_day, self.current_phase)
+        if self.verbosity >= VERBOSITY_FULL:
+            self.display_system_status()
 
-        if self.current_phase in self.phases_to_calculate_contribution:
+        # スケジューラーがあれば計算の時期はその policy に従う (on_phase のときだけ下のリストを使う)
+        if self.contribution_scheduler is not None:
+            if self.num_users > 1 and self.contribution_scheduler.notify_phase(self.current_phase):
+                self.contribution_calculation_count += 1
+        elif self.current_phase in self.phases_to_calculate_contribution:
             if self.num_users > 1:
                 self.calculate_all_contributions()
                 self.contribution_calculation_count += 1
@@ -521,7 +1324,8 @@ if __name__ == "__main__":
         alpha_like_max=DEFAULT_ALPHA_LIKE_MAX,
         gamma_rate=DEFAULT_GAMMA_RATE,
         max_iterations=50,
-        tolerance=1e-6
+        tolerance=1e-6,
+        verbosity=VERBOSITY_FULL  # 教材・デモ用に全ての経過を表示する
     )
     engine.phases_to_calculate_contribution = ["晩"]
 
@@ -585,13 +1389,15 @@ if __name__ == "__main__":
 
     print("\n" + "="*10 + " ユーザー0人テスト " + "="*10)
     engine_zero_user = PicsyEngine(
-        user_list=[], alpha_like_default=0.01, alpha_like_max=0.1, gamma_rate=0.01)
+        user_list=[], alpha_like_default=0.01, alpha_like_max=0.1, gamma_rate=0.01,
+        verbosity=VERBOSITY_FULL)
     engine_zero_user.advance_phase()  # 何も起こらないはず
     engine_zero_user.display_all_user_status()
 
     print("\n" + "="*10 + " ユーザー1人テスト " + "="*10)
     engine_one_user = PicsyEngine(user_list=[PicsyUser(
-        "single001", " एकल")], alpha_like_default=0.01, alpha_like_max=0.1, gamma_rate=0.01)
+        "single001", " एकल")], alpha_like_default=0.01, alpha_like_max=0.1, gamma_rate=0.01,
+        verbosity=VERBOSITY_FULL)
     engine_one_user.advance_phase()
     # 1人なのでいいねはできない
     # engine_one_user.perform_like("single001", "single001") # エラーまたは情報メッセージ
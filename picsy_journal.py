@@ -0,0 +1,235 @@
+import json
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# --- ジャーナルの記録形式 ---
+# 1件32バイト固定の構造化レコードを追記していく。
+# ユーザー一覧のような可変長のデータは、見出しレコードの直後に b 個の PAYLOAD レコードとして続ける。
+# PAYLOAD レコードは kind が JOURNAL_PAYLOAD で、kind より後ろの28バイトに UTF-8 の JSON を
+# 順に詰めて持つ (最後のレコードの余りは \0 埋め)。
+JOURNAL_RECORD_DTYPE = np.dtype([
+    ("kind", "<u4"),
+    ("a", "<i4"),             # LIKE: 評価者のインデックス / PARAM: パラメータ番号 / PHASE: 日数 / ユーザー増減: 人数
+    ("b", "<i4"),             # LIKE: 被評価者のインデックス / PARAM: 対象ユーザーのインデックス / PHASE: フェーズ番号 / ユーザー増減: PAYLOAD数
+    ("reserved", "<u4"),
+    ("timestamp_ns", "<i8"),
+    ("value", "<f8"),         # LIKE: alpha / RECOVERY: gamma / PARAM: 新しい値
+])
+JOURNAL_RECORD_SIZE = JOURNAL_RECORD_DTYPE.itemsize  # 32
+_PAYLOAD_OFFSET = JOURNAL_RECORD_DTYPE.fields["a"][1]  # PAYLOAD レコードのデータの開始位置 (kind の後ろ)
+_PAYLOAD_BYTES = JOURNAL_RECORD_SIZE - _PAYLOAD_OFFSET  # PAYLOAD レコード1件に入るデータのバイト数
+
+JOURNAL_LIKE = 1
+JOURNAL_RECOVERY = 2
+JOURNAL_PARAM = 3
+JOURNAL_USERS_ADDED = 4
+JOURNAL_USERS_REMOVED = 5
+JOURNAL_PHASE = 6
+JOURNAL_PAYLOAD = 7
+
+# JOURNAL_PARAM の a に入れるパラメータ番号
+PARAM_GAMMA_RATE = 1
+PARAM_ALPHA_LIKE_DEFAULT = 2
+PARAM_ALPHA_LIKE_MAX = 3
+PARAM_USER_ALPHA_LIKE = 4
+
+# JOURNAL_PHASE の b に入れるフェーズ番号
+JOURNAL_PHASES = ("開始前", "朝", "昼", "晩")
+
+DEFAULT_FSYNC_BATCH = 4096    # この件数たまったらまとめて書き込み、fsync する
+DEFAULT_FSYNC_INTERVAL = 1.0  # 前回の fsync からこの秒数が過ぎたら、件数に関わらず書き込む
+
+
+class LikeJournal:
+    """
+    「いいね」・自然回収・パラメータ変更などを記録する追記専用のバイナリジャーナル。
+
+    エンジンは状態を変える前に記録を追加する (write-ahead)。記録はいったんメモリ上のバッファに
+    ため、fsync_batch 件たまるか、前回の fsync から fsync_interval 秒過ぎた時点で
+    まとめて書き込んで fsync する (グループコミット)。後から記録が追加されなくても、
+    バックグラウンドのスレッドが fsync_interval 秒ごとにバッファの残りを書き込むので、
+    プロセスが落ちたときに失われうるのは最後の fsync_interval 秒 (か fsync_batch 件) の記録だけになる。
+    確実に残したい時点では flush() を呼ぶ。fsync_interval=None ならスレッドを使わない。
+    記録の追加・書き込みはスレッドセーフ。
+
+    position はジャーナル先頭からの記録数で、スナップショットにはこの位置を保存しておく。
+    """
+
+    def __init__(self, path: str, fsync_batch: int = DEFAULT_FSYNC_BATCH,
+                 fsync_interval: Optional[float] = DEFAULT_FSYNC_INTERVAL):
+        if fsync_batch <= 0:
+            raise ValueError("fsync_batchは1以上である必要があります。")
+        if fsync_interval is not None and fsync_interval <= 0:
+            raise ValueError("fsync_intervalは0より大きい必要があります。")
+        self.path: str = path
+        self.fsync_batch: int = fsync_batch
+        self.fsync_interval: float = fsync_interval
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        # 書き込み途中で落ちた場合の端数のバイトは切り捨てる
+        size = os.fstat(self._fd).st_size
+        if size % JOURNAL_RECORD_SIZE:
+            os.ftruncate(self._fd, size - size % JOURNAL_RECORD_SIZE)
+        self._written: int = size // JOURNAL_RECORD_SIZE
+        self._buffer = np.zeros(fsync_batch, dtype=JOURNAL_RECORD_DTYPE)
+        self._buffered: int = 0
+        self._last_sync: float = time.monotonic()
+        self._lock = threading.RLock()  # バッファとファイルへの書き込みを守る
+        self._closed = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if fsync_interval is not None:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="picsy-journal-flusher",
+                                             daemon=True)
+            self._flusher.start()
+
+    @property
+    def position(self) -> int:
+        """これまでに追加された記録の数 (バッファ上の未書き込み分を含む)。"""
+        return self._written + self._buffered
+
+    def __enter__(self) -> "LikeJournal":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- 記録の追加 ---
+    def append_like(self, liker_idx: int, liked_idx: int, alpha: float, timestamp_ns: int = None):
+        self._append_record(JOURNAL_LIKE, liker_idx, liked_idx, alpha, timestamp_ns)
+
+    def append_likes(self, liker_idx: np.ndarray, liked_idx: np.ndarray, alphas: np.ndarray,
+                     timestamp_ns: int = None):
+        records = np.zeros(len(liker_idx), dtype=JOURNAL_RECORD_DTYPE)
+        records["kind"] = JOURNAL_LIKE
+        records["a"] = liker_idx
+        records["b"] = liked_idx
+        records["timestamp_ns"] = time.time_ns() if timestamp_ns is None else timestamp_ns
+        records["value"] = alphas
+        self._append_records(records)
+
+    def append_recovery(self, gamma: float):
+        self._append_record(JOURNAL_RECOVERY, 0, 0, gamma)
+
+    def append_param(self, param: int, value: float, user_idx: int = -1):
+        self._append_record(JOURNAL_PARAM, param, user_idx, value)
+
+    def append_phase(self, day: int, phase: str):
+        self._append_record(JOURNAL_PHASE, day, JOURNAL_PHASES.index(phase), 0.0)
+
+    def append_users_added(self, users: List[Tuple[str, str]]):
+        """追加したユーザーの (ユーザーID, 名前) の一覧を記録する。"""
+        self._append_payload(JOURNAL_USERS_ADDED, len(users), [list(user) for user in users])
+
+    def append_users_removed(self, user_ids: List[str]):
+        self._append_payload(JOURNAL_USERS_REMOVED, len(user_ids), list(user_ids))
+
+    def _append_record(self, kind: int, a: int, b: int, value: float, timestamp_ns: int = None):
+        with self._lock:
+            record = self._buffer[self._buffered]
+            record["kind"] = kind
+            record["a"] = a
+            record["b"] = b
+            record["timestamp_ns"] = time.time_ns() if timestamp_ns is None else timestamp_ns
+            record["value"] = value
+            self._buffered += 1
+            self._maybe_flush()
+
+    def _append_payload(self, kind: int, count: int, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        num_blocks = -(-len(data) // _PAYLOAD_BYTES)
+        records = np.zeros(1 + num_blocks, dtype=JOURNAL_RECORD_DTYPE)
+        records[0]["kind"] = kind
+        records[0]["a"] = count
+        records[0]["b"] = num_blocks
+        records[0]["timestamp_ns"] = time.time_ns()
+        records[1:]["kind"] = JOURNAL_PAYLOAD
+        padded = np.zeros(num_blocks * _PAYLOAD_BYTES, dtype=np.uint8)
+        padded[:len(data)] = np.frombuffer(data, dtype=np.uint8)
+        blocks = records[1:].view(np.uint8).reshape(num_blocks, JOURNAL_RECORD_SIZE)
+        blocks[:, _PAYLOAD_OFFSET:] = padded.reshape(num_blocks, _PAYLOAD_BYTES)
+        self._append_records(records)
+
+    def _append_records(self, records: np.ndarray):
+        with self._lock:
+            if self._buffered + len(records) <= len(self._buffer):
+                self._buffer[self._buffered:self._buffered + len(records)] = records
+                self._buffered += len(records)
+                self._maybe_flush()
+            else:  # バッファに収まらない量は、たまっている分に続けてそのまま書き込む
+                self._write_buffer()
+                os.write(self._fd, records.tobytes())
+                self._written += len(records)
+                self._sync()
+
+    # --- 書き込み ---
+    def _maybe_flush(self):
+        if self._buffered >= len(self._buffer) or (
+                self.fsync_interval is not None
+                and time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.flush()
+
+    def _flush_periodically(self):
+        """バックグラウンドのスレッドの本体。fsync_interval 秒ごとに、たまっている記録を書き込む。"""
+        while not self._closed.wait(self.fsync_interval):
+            with self._lock:
+                if self._fd is not None and self._buffered:
+                    self.flush()
+
+    def _write_buffer(self):
+        if self._buffered:
+            os.write(self._fd, self._buffer[:self._buffered].tobytes())
+            self._written += self._buffered
+            self._buffered = 0
+
+    def _sync(self):
+        os.fsync(self._fd)
+        self._last_sync = time.monotonic()
+
+    def flush(self, sync: bool = True):
+        """バッファにたまった記録を書き込む。sync=True なら fsync まで行う。"""
+        with self._lock:
+            self._write_buffer()
+            if sync:
+                self._sync()
+
+    def close(self):
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        with self._lock:
+            if self._fd is not None:
+                self.flush()
+                os.close(self._fd)
+                self._fd = None
+
+
+def read_journal(path: str, start: int = 0) -> np.ndarray:
+    """ジャーナルの start 件目以降を構造化配列として読み込む。末尾の不完全な記録は無視する。"""
+    if not os.path.exists(path):
+        return np.empty(0, dtype=JOURNAL_RECORD_DTYPE)
+    num_records = os.path.getsize(path) // JOURNAL_RECORD_SIZE - start
+    if num_records <= 0:
+        return np.empty(0, dtype=JOURNAL_RECORD_DTYPE)
+    return np.fromfile(path, dtype=JOURNAL_RECORD_DTYPE, count=num_records,
+                       offset=start * JOURNAL_RECORD_SIZE)
+
+
+def decode_payload(records: np.ndarray, header_pos: int):
+    """
+    header_pos の見出しレコードに続く PAYLOAD を JSON として読み、(内容, 次の記録の位置) を返す。
+    PAYLOAD が途中で切れている (書き込み途中で落ちた) 場合は (None, len(records)) を返す。
+    """
+    num_blocks = int(records[header_pos]["b"])
+    end = header_pos + 1 + num_blocks
+    if end > len(records):
+        return None, len(records)
+    blocks = records[header_pos + 1:end]
+    if np.any(blocks["kind"] != JOURNAL_PAYLOAD):
+        raise ValueError(f"ジャーナルの PAYLOAD が壊れています (位置 {header_pos + 1})")
+    data = np.ascontiguousarray(blocks).view(np.uint8).reshape(num_blocks, JOURNAL_RECORD_SIZE)
+    data = data[:, _PAYLOAD_OFFSET:].tobytes().rstrip(b"\0")
+    return json.loads(data.decode("utf-8")), end
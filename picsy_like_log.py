@@ -0,0 +1,227 @@
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# --- いいね履歴の保持方式 ---
+LIKE_LOG_RING = "ring"    # 直近 capacity 件だけをメモリに残し、古いものから捨てる
+LIKE_LOG_SPILL = "spill"  # メモリが capacity 件で一杯になったら、まとめてファイルに書き出す
+LIKE_LOG_RETENTIONS = (LIKE_LOG_RING, LIKE_LOG_SPILL)
+
+DEFAULT_LIKE_LOG_CAPACITY = 1_000_000  # 約17MB (1件あたり int32×2 + int64 + float32)
+INITIAL_LIKE_LOG_SIZE = 1024  # 最初に確保する件数。capacity まで2倍ずつ広げる
+
+# いいね1件の記録形式。tail() の戻り値と書き出しファイルはこの形式の構造化配列
+LIKE_RECORD_DTYPE = np.dtype([
+    ("liker", "<i4"),         # ユーザーキー (LikeLog.user_id(key) でIDに戻す)
+    ("liked", "<i4"),
+    ("timestamp_ns", "<i8"),  # UNIXエポックからのナノ秒
+    ("alpha", "<f4"),
+])
+
+
+class LikeLog:
+    """
+    「いいね」履歴を型付きの列 (int32 ユーザーキー, int64 タイムスタンプ, float32 α) で持つログ。
+
+    ユーザーはエンジンのインデックスではなく、初めて現れた順に振るユーザーキーで記録する。
+    エンジン側でユーザーの追加・削除によってインデックスが変わっても、過去の記録は変わらない。
+    名前は記録せず、表示するときにエンジンの対応表から引く。
+
+    保持方式:
+        ring:  直近 capacity 件だけを残す。それより古い記録は上書きされる (dropped に件数を数える)。
+        spill: capacity 件たまったら spill_path に追記し、メモリ上の記録を空にする。
+               書き出した記録は read_spilled() で読み出せる。
+    """
+
+    def __init__(self, capacity: int = DEFAULT_LIKE_LOG_CAPACITY,
+                 retention: str = LIKE_LOG_RING, spill_path: Optional[str] = None):
+        if capacity <= 0:
+            raise ValueError("capacityは1以上である必要があります。")
+        if retention not in LIKE_LOG_RETENTIONS:
+            raise ValueError(
+                f"retentionは {LIKE_LOG_RETENTIONS} のいずれかである必要があります。: '{retention}'")
+        if retention == LIKE_LOG_SPILL and not spill_path:
+            raise ValueError("retention='spill' の場合は spill_path を指定する必要があります。")
+        self.capacity: int = capacity
+        self.retention: str = retention
+        self.spill_path: Optional[str] = spill_path
+
+        size = min(capacity, INITIAL_LIKE_LOG_SIZE)
+        self._liker = np.empty(size, dtype=np.int32)
+        self._liked = np.empty(size, dtype=np.int32)
+        self._timestamp_ns = np.empty(size, dtype=np.int64)
+        self._alpha = np.empty(size, dtype=np.float32)
+        self._start: int = 0   # 最古の記録の位置 (ring で一周した後だけ0以外になる)
+        self._count: int = 0   # メモリ上にある記録の数
+
+        self.total: int = 0    # これまでに追加された記録の総数
+        self.dropped: int = 0  # ring で上書きされた記録の数
+        self.spilled: int = 0  # spill_path に書き出した記録の数
+
+        self._user_ids: List[str] = []
+        self._user_keys: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self.total
+
+    @property
+    def nbytes(self) -> int:
+        return (self._liker.nbytes + self._liked.nbytes
+                + self._timestamp_ns.nbytes + self._alpha.nbytes)
+
+    # --- ユーザーキー ---
+    def user_key(self, user_id: str) -> int:
+        """ユーザーIDに対応するキーを返す。初めてのIDなら新しく振る。"""
+        key = self._user_keys.get(user_id)
+        if key is None:
+            key = len(self._user_ids)
+            self._user_ids.append(user_id)
+            self._user_keys[user_id] = key
+        return key
+
+    def user_keys(self, user_ids: List[str]) -> np.ndarray:
+        return np.fromiter((self.user_key(user_id) for user_id in user_ids),
+                           dtype=np.int32, count=len(user_ids))
+
+    def user_id(self, key: int) -> str:
+        return self._user_ids[key]
+
+    # --- 追加 ---
+    def append(self, liker_key: int, liked_key: int, alpha: float, timestamp_ns: int = None):
+        """1件追加する。容量に達するまでの拡張を除けば O(1)。"""
+        self._make_room(1)
+        size = len(self._liker)
+        pos = (self._start + self._count) % size
+        self._liker[pos] = liker_key
+        self._liked[pos] = liked_key
+        self._timestamp_ns[pos] = time.time_ns() if timestamp_ns is None else timestamp_ns
+        self._alpha[pos] = alpha
+        if self._count == size:  # ring: 最古の記録を上書きした
+            self._start = (self._start + 1) % size
+            self.dropped += 1
+        else:
+            self._count += 1
+        self.total += 1
+
+    def append_many(self, liker_keys: np.ndarray, liked_keys: np.ndarray, alphas: np.ndarray,
+                    timestamp_ns=None):
+        """まとめて追加する。timestamp_ns はスカラー (全件同時刻) でも配列でもよい。"""
+        liker_keys = np.asarray(liker_keys, dtype=np.int32)
+        num_records = len(liker_keys)
+        if num_records == 0:
+            return
+        liked_keys = np.asarray(liked_keys, dtype=np.int32)
+        alphas = np.asarray(alphas, dtype=np.float32)
+        timestamps = np.broadcast_to(
+            np.asarray(time.time_ns() if timestamp_ns is None else timestamp_ns, dtype=np.int64),
+            (num_records,))
+        self.total += num_records
+        if self.retention == LIKE_LOG_RING and num_records > self.capacity:
+            # 残るのは最後の capacity 件だけなので、それより前は書き込まずに捨てる
+            skipped = num_records - self.capacity
+            self.dropped += skipped
+            liker_keys, liked_keys = liker_keys[skipped:], liked_keys[skipped:]
+            alphas, timestamps = alphas[skipped:], timestamps[skipped:]
+            num_records = self.capacity
+
+        offset = 0
+        while offset < num_records:
+            self._make_room(num_records - offset)
+            size = len(self._liker)
+            tail = (self._start + self._count) % size
+            chunk = min(num_records - offset, size - tail)
+            if self.retention == LIKE_LOG_SPILL:
+                chunk = min(chunk, size - self._count)
+            end = offset + chunk
+            self._liker[tail:tail + chunk] = liker_keys[offset:end]
+            self._liked[tail:tail + chunk] = liked_keys[offset:end]
+            self._timestamp_ns[tail:tail + chunk] = timestamps[offset:end]
+            self._alpha[tail:tail + chunk] = alphas[offset:end]
+            overwritten = self._count + chunk - size
+            if overwritten > 0:  # ring: 上書きした分だけ最古の位置を進める
+                self._start = (self._start + overwritten) % size
+                self.dropped += overwritten
+                self._count = size
+            else:
+                self._count += chunk
+            offset = end
+
+    def _make_room(self, wanted: int):
+        """
+        これから wanted 件書き込む前に呼ぶ。容量まで余裕があれば配列を広げ、
+        spill で一杯ならファイルに書き出す。ring で一杯なら何もしない (呼び出し側が上書きする)。
+        """
+        size = len(self._liker)
+        if self._count + wanted <= size:
+            return
+        if size < self.capacity:
+            new_size = min(self.capacity, max(2 * size, self._count + wanted))
+            order = self._ordered_positions()
+            for name in ("_liker", "_liked", "_timestamp_ns", "_alpha"):
+                old = getattr(self, name)
+                new = np.empty(new_size, dtype=old.dtype)
+                new[:self._count] = old[order]
+                setattr(self, name, new)
+            self._start = 0
+        elif self.retention == LIKE_LOG_SPILL and self._count == size:
+            self._spill()
+
+    def _ordered_positions(self) -> np.ndarray:
+        return (self._start + np.arange(self._count)) % len(self._liker)
+
+    def _records(self, positions: np.ndarray) -> np.ndarray:
+        records = np.empty(len(positions), dtype=LIKE_RECORD_DTYPE)
+        records["liker"] = self._liker[positions]
+        records["liked"] = self._liked[positions]
+        records["timestamp_ns"] = self._timestamp_ns[positions]
+        records["alpha"] = self._alpha[positions]
+        return records
+
+    def _spill(self):
+        with open(self.spill_path, "ab") as f:
+            self._records(self._ordered_positions()).tofile(f)
+        self.spilled += self._count
+        self._start = 0
+        self._count = 0
+
+    # --- 読み出し ---
+    def tail(self, n: int) -> np.ndarray:
+        """メモリ上に残っている直近 n 件を、古い順の構造化配列 (LIKE_RECORD_DTYPE) で返す。"""
+        n = max(0, min(n, self._count))
+        positions = (self._start + np.arange(self._count - n, self._count)) % len(self._liker)
+        return self._records(positions)
+
+    def read_spilled(self, mmap: bool = True) -> np.ndarray:
+        """spill_path に書き出した記録を古い順に返す。mmap=True ならメモリマップで開く。"""
+        if self.spill_path is None or not os.path.exists(self.spill_path) \
+                or os.path.getsize(self.spill_path) == 0:
+            return np.empty(0, dtype=LIKE_RECORD_DTYPE)
+        if mmap:
+            return np.memmap(self.spill_path, dtype=LIKE_RECORD_DTYPE, mode="r")
+        return np.fromfile(self.spill_path, dtype=LIKE_RECORD_DTYPE)
+
+    # --- スナップショット ---
+    def snapshot_state(self):
+        """(メモリ上の記録の構造化配列, それ以外の状態の dict) を返す。"""
+        state = {
+            "capacity": self.capacity,
+            "retention": self.retention,
+            "spill_path": self.spill_path,
+            "total": self.total,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "user_ids": list(self._user_ids),
+        }
+        return self.tail(self._count), state
+
+    def restore_state(self, records: np.ndarray, state: dict):
+        """snapshot_state() で保存した内容を、空のログに読み戻す。"""
+        for user_id in state["user_ids"]:
+            self.user_key(user_id)
+        self.append_many(records["liker"], records["liked"], records["alpha"],
+                         records["timestamp_ns"])
+        self.total = state["total"]
+        self.dropped = state["dropped"]
+        self.spilled = state["spilled"]
@@ -0,0 +1,195 @@
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+LEADERBOARD_TOP_K = 100  # 公開のたびに argpartition で求めておく上位の人数
+
+
+class ContributionRanking:
+    """
+    貢献度の順位表。公開結果ごとに1つ作られ、作成後は変更しない (遅延計算する全順位を除く)。
+
+    - 上位 top_k 人は作成時に np.argpartition で求める (O(N + k log k))。
+    - 全員の順位 (order と、その逆置換 ranks) は順位や深いページが初めて要求された時点で計算する。
+      前回の順位表で全順位が計算済みで参加ユーザーが変わっていなければ、前回の順に並べた配列を
+      安定ソート (timsort) し直すだけで済むので、ほぼ整列済みの入力として O(N) に近い時間で終わる。
+      その場合は作成時に計算しておき、順位の問い合わせは常に O(1) にする。
+    - 貢献度が NaN のユーザーは最下位扱い。同じ貢献度ではインデックス (または前回の順位) が先の方が上位。
+    """
+
+    __slots__ = ("_keys", "top_k", "_top", "_order", "_ranks")
+
+    def __init__(self, c_vector: np.ndarray, top_k: int = LEADERBOARD_TOP_K,
+                 previous: Optional["ContributionRanking"] = None):
+        # 降順に並べるため符号を反転し、NaN は最後に来るように +inf にする
+        keys = np.where(np.isnan(c_vector), np.inf, -c_vector)
+        self._keys: np.ndarray = keys
+        self.top_k: int = min(top_k, len(keys))
+        self._order: Optional[np.ndarray] = None
+        self._ranks: Optional[np.ndarray] = None
+        if previous is not None and previous._order is not None and len(previous._order) == len(keys):
+            self._set_order(previous._order[np.argsort(keys[previous._order], kind="stable")])
+            self._top = self._order[:self.top_k]
+        else:
+            self._top = self._partial_top(keys, self.top_k)
+
+    @staticmethod
+    def _partial_top(keys: np.ndarray, k: int) -> np.ndarray:
+        if k == 0:
+            return np.empty(0, dtype=np.int64)
+        if k < len(keys):
+            candidates = np.argpartition(keys, k - 1)[:k]
+        else:
+            candidates = np.arange(len(keys))
+        # 同じ貢献度ならインデックス順になるように (キー, インデックス) で並べる
+        return candidates[np.lexsort((candidates, keys[candidates]))]
+
+    def _set_order(self, order: np.ndarray):
+        ranks = np.empty(len(order), dtype=np.int64)
+        ranks[order] = np.arange(1, len(order) + 1)
+        order.setflags(write=False)
+        ranks.setflags(write=False)
+        self._ranks = ranks
+        self._order = order  # 読み手は _order を見て全順位の有無を判断するので、最後に設定する
+
+    def _full_order(self) -> np.ndarray:
+        if self._order is None:
+            self._set_order(np.argsort(self._keys, kind="stable"))
+        return self._order
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def page(self, offset: int = 0, limit: int = 10) -> np.ndarray:
+        """順位 offset+1 位から limit 人分のインデックスを上位から順に返す。"""
+        end = min(offset + limit, len(self._keys))
+        if offset >= end:
+            return np.empty(0, dtype=np.int64)
+        if self._order is None and end <= self.top_k:
+            return self._top[offset:end]
+        return self._full_order()[offset:end]
+
+    def rank(self, idx: int) -> int:
+        """インデックス idx のユーザーの順位 (1始まり)。"""
+        self._full_order()  # 全順位がまだなら、ここで計算する
+        return int(self._ranks[idx])
+
+
+class PublishedResults:
+    """
+    貢献度計算1回分の結果 (貢献度・予算・購買力) を固めた読み取り専用のスナップショット。
+
+    エンジンは計算のたびに新しいインスタンスを作って差し替えるだけで、公開済みの
+    インスタンスは変更しない。読み手は engine.published を1回読んでから参照すれば、
+    計算中の途中状態を見ることはなく、ロックも要らない。配列は書き込み禁止にしてある。
+
+    version はエンジン内で計算のたびに1ずつ増える番号で、etag はエンジンの起動ごとに
+    異なる識別子と組み合わせた HTTP の ETag 用の文字列。
+    """
+
+    __slots__ = ("version", "engine_token", "membership_version", "user_ids", "user_names",
+                 "user_id_to_index", "c_vector", "budgets", "purchasing_power", "ranking")
+
+    def __init__(self, version: int, engine_token: str, membership_version: int,
+                 user_ids: Tuple[str, ...], user_names: Tuple[str, ...],
+                 user_id_to_index: Mapping[str, int], c_vector: np.ndarray, budgets: np.ndarray,
+                 previous_ranking: Optional[ContributionRanking] = None,
+                 purchasing_power: Optional[np.ndarray] = None,
+                 ranking: Optional[ContributionRanking] = None):
+        self.version: int = version
+        self.engine_token: str = engine_token
+        self.membership_version: int = membership_version
+        self.user_ids: Tuple[str, ...] = user_ids
+        self.user_names: Tuple[str, ...] = user_names
+        self.user_id_to_index: Mapping[str, int] = user_id_to_index
+        self.c_vector: np.ndarray = c_vector
+        self.budgets: np.ndarray = budgets
+        # 共有メモリから読む場合などは、計算済みの購買力を渡してコピーを作らない
+        self.purchasing_power: np.ndarray = c_vector * budgets if purchasing_power is None else purchasing_power
+        for array in (self.c_vector, self.budgets, self.purchasing_power):
+            array.setflags(write=False)
+        # 貢献度が同じ (予算だけを公開し直す) 場合は、前回の順位表をそのまま渡して使い回す
+        self.ranking: ContributionRanking = ranking if ranking is not None else \
+            ContributionRanking(c_vector, previous=previous_ranking)
+
+    @classmethod
+    def build(cls, version: int, engine_token: str, membership_version: int,
+              user_ids: List[str], user_names: List[str], c_vector: np.ndarray, budgets: np.ndarray,
+              previous: Optional["PublishedResults"] = None) -> "PublishedResults":
+        """
+        配列をコピーして新しい結果を作る。参加ユーザーが前回の公開から変わっていなければ
+        (membership_version が同じなら) ユーザーIDの対応表は前回のものを使い回す。
+        """
+        previous_ranking = None
+        if previous is not None and previous.membership_version == membership_version:
+            ids, names, index = previous.user_ids, previous.user_names, previous.user_id_to_index
+            previous_ranking = previous.ranking  # インデックスが同じなので前回の順位を並べ直しに使える
+        else:
+            ids, names = tuple(user_ids), tuple(user_names)
+            index = MappingProxyType({user_id: i for i, user_id in enumerate(ids)})
+        return cls(version, engine_token, membership_version, ids, names, index,
+                   np.array(c_vector, dtype=float), np.array(budgets, dtype=float),
+                   previous_ranking=previous_ranking)
+
+    def with_budgets(self, version: int, budgets: np.ndarray) -> "PublishedResults":
+        """
+        貢献度・順位・ユーザーIDの対応表はこのまま、予算 (と購買力) だけを差し替えた新しい結果を作る。
+        貢献度の再計算を省略したときに、予算を最新にするために使う。O(N) で済む。
+        """
+        return PublishedResults(version, self.engine_token, self.membership_version,
+                                self.user_ids, self.user_names, self.user_id_to_index,
+                                self.c_vector, np.array(budgets, dtype=float), ranking=self.ranking)
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.engine_token}-{self.version}"'
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def index_of(self, user_id: str) -> int:
+        idx = self.user_id_to_index.get(user_id)
+        if idx is None:
+            raise ValueError(f"ユーザーID '{user_id}' が見つかりません。")
+        return idx
+
+    def get_contribution(self, user_id: str) -> float:
+        return float(self.c_vector[self.index_of(user_id)])
+
+    def get_purchasing_power(self, user_id: str) -> float:
+        return float(self.purchasing_power[self.index_of(user_id)])
+
+    def get_status(self, user_id: str) -> Dict:
+        """PicsyEngine.get_user_status と同じ形式の dict を返す (貢献度が NaN なら "N/A")。"""
+        return self._status(user_id, self.index_of(user_id))
+
+    def get_status_many(self, user_ids: List[str]) -> List[Optional[Dict]]:
+        """複数ユーザーの状態を user_ids の順に返す。存在しないユーザーの位置は None。"""
+        index = self.user_id_to_index
+        return [None if (idx := index.get(user_id)) is None else self._status(user_id, idx)
+                for user_id in user_ids]
+
+    def get_rank(self, user_id: str) -> int:
+        """貢献度の順位 (1始まり)。"""
+        return self.ranking.rank(self.index_of(user_id))
+
+    def get_top(self, limit: int = 10, offset: int = 0) -> List[Dict]:
+        """貢献度の上位から offset 人を飛ばして limit 人分のステータスを、"rank" を付けて返す。"""
+        entries = []
+        for rank, idx in enumerate(self.ranking.page(offset, limit).tolist(), start=offset + 1):
+            status = self._status(self.user_ids[idx], idx)
+            status["rank"] = rank
+            entries.append(status)
+        return entries
+
+    def _status(self, user_id: str, idx: int) -> Dict:
+        contribution = float(self.c_vector[idx])
+        purchasing_power = float(self.purchasing_power[idx])
+        return {
+            "id": user_id,
+            "name": self.user_names[idx],
+            "contribution": contribution if not np.isnan(contribution) else "N/A",
+            "budget": float(self.budgets[idx]),
+            "purchasing_power": purchasing_power if not np.isnan(purchasing_power) else "N/A"
+        }
@@ -0,0 +1,250 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+# --- 貢献度計算のタイミング (policy) ---
+SCHEDULE_ON_MUTATION = "on_mutation"  # 変更が debounce 秒途切れたら計算する (最長でも max_staleness 秒で計算)
+SCHEDULE_PERIODIC = "periodic"        # 最初の変更から interval 秒後に、それまでの変更をまとめて計算する
+SCHEDULE_ON_PHASE = "on_phase"        # engine.phases_to_calculate_contribution のフェーズに入ったときだけ計算する
+SCHEDULE_POLICIES = (SCHEDULE_ON_MUTATION, SCHEDULE_PERIODIC, SCHEDULE_ON_PHASE)
+
+DEFAULT_DEBOUNCE_SECONDS = 0.05
+DEFAULT_MAX_STALENESS_SECONDS = 1.0
+DEFAULT_INTERVAL_SECONDS = 5.0
+DEFAULT_RETRY_SECONDS = 1.0  # 計算に失敗したとき、次に計算し直すまでの秒数
+
+
+class ContributionScheduler:
+    """
+    貢献度計算を「いいね」などの呼び出しから切り離し、バックグラウンドのスレッドでまとめて行う。
+
+    作成するとエンジンに登録され、以降のエンジンは「いいね」・自然回収・ユーザーの増減で
+    貢献度を計算し直す代わりに notify() を呼ぶ (変更あり = dirty)。スケジューラーは policy に従って
+    計算の時期を決め、その間の変更を1回の calculate_all_contributions() にまとめる。
+    読み手は engine.published を読むので、計算中もロックなしで直前の結果が見える。
+
+    エンジンへの変更と計算は lock (API では engine_lock) で直列化する。エンジンを変更する
+    呼び出し側は、これまで通り lock を取ってから変更すること。計算の重い部分 (NumPy / SciPy の
+    行列演算) は GIL を手放すので、スレッドでも他のリクエストの処理は止まらない。
+
+    最新の変更を反映した結果が必要な呼び出し側は wait_for_fresh() を使う
+    (lock を持ったまま呼ぶと、計算が lock を取れずに timeout まで待つことになる)。
+
+    計算が例外で失敗したときは、変更を未反映 (dirty) のままにして retry_delay 秒後に計算し直す。
+    失敗した計算は反映済みとは扱わないので、wait_for_fresh() は成功するまで True を返さない。
+    """
+
+    def __init__(self, engine, policy: str = SCHEDULE_ON_MUTATION,
+                 debounce: float = DEFAULT_DEBOUNCE_SECONDS,
+                 max_staleness: float = DEFAULT_MAX_STALENESS_SECONDS,
+                 interval: float = DEFAULT_INTERVAL_SECONDS,
+                 retry_delay: float = DEFAULT_RETRY_SECONDS,
+                 lock: Optional[threading.RLock] = None):
+        if policy not in SCHEDULE_POLICIES:
+            raise ValueError(f"policyは {SCHEDULE_POLICIES} のいずれかである必要があります。: '{policy}'")
+        if debounce < 0 or max_staleness < 0 or retry_delay < 0 or interval <= 0:
+            raise ValueError("debounce・max_staleness・retry_delayは0以上、intervalは0より大きい必要があります。")
+        self.engine = engine
+        self.policy: str = policy
+        self.debounce: float = debounce
+        self.max_staleness: float = max_staleness
+        self.interval: float = interval
+        self.retry_delay: float = retry_delay
+        self.lock = lock if lock is not None else threading.RLock()
+
+        # 以下は _cond で守る。engine.lock を持ったまま _cond を取ることはあるが、逆はしない
+        self._cond = threading.Condition()
+        self._mutation_seq: int = 0     # notify() のたびに増える
+        self._solved_seq: int = 0       # 最後に終わった計算が反映している _mutation_seq
+        self._dirty_since: Optional[float] = None  # 未反映の最初の変更の時刻 (time.monotonic)
+        self._last_mutation: float = 0.0
+        self._retry_at: float = 0.0     # 計算に失敗したとき、この時刻 (time.monotonic) まで計算し直さない
+        self._failure_count: int = 0    # 計算が失敗するたびに増える
+        self._phase_requested: bool = False
+        self._forced: bool = False
+        self._stopping: bool = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.solve_count: int = 0
+        self.last_solve_seconds: float = 0.0
+        self.last_error: Optional[BaseException] = None
+
+        engine.contribution_scheduler = self
+
+    def __enter__(self) -> "ContributionScheduler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def dirty(self) -> bool:
+        """最後の計算以降に、まだ反映されていない変更があるか。"""
+        with self._cond:
+            return self._solved_seq < self._mutation_seq
+
+    @property
+    def mutation_count(self) -> int:
+        """notify() などで知らされた変更の数。前に読んだ値と比べれば、その後に変更があったか分かる。"""
+        with self._cond:
+            return self._mutation_seq
+
+    def staleness(self) -> float:
+        """未反映の最初の変更からの経過秒数 (変更がなければ0)。"""
+        with self._cond:
+            if self._dirty_since is None:
+                return 0.0
+            return time.monotonic() - self._dirty_since
+
+    # --- エンジンからの通知 ---
+    def notify(self):
+        """貢献度に影響する変更があったことを知らせる (エンジンが呼ぶ)。"""
+        now = time.monotonic()
+        with self._cond:
+            self._mutation_seq += 1
+            if self._dirty_since is None:
+                self._dirty_since = now
+            self._last_mutation = now
+            if self.policy != SCHEDULE_ON_PHASE:
+                self._cond.notify_all()
+
+    def notify_phase(self, phase: str) -> bool:
+        """
+        フェーズが進んだことを知らせる (エンジンが呼ぶ)。on_phase のときに計算対象のフェーズなら
+        計算を予約して True を返す。
+        """
+        if self.policy != SCHEDULE_ON_PHASE or phase not in self.engine.phases_to_calculate_contribution:
+            return False
+        with self._cond:
+            self._mutation_seq += 1  # フェーズ前の変更がなくても、この時点の結果を計算する
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+            self._phase_requested = True
+            self._cond.notify_all()
+        return True
+
+    # --- 計算 ---
+    def _due_time(self) -> Optional[float]:
+        """次に計算する時刻 (time.monotonic)。今は計算しなくてよいなら None。_cond を持って呼ぶ。"""
+        if self._solved_seq >= self._mutation_seq:
+            return None
+        if self._forced or self._phase_requested:
+            due = 0.0
+        elif self.policy == SCHEDULE_ON_MUTATION:
+            due = min(self._last_mutation + self.debounce, self._dirty_since + self.max_staleness)
+        elif self.policy == SCHEDULE_PERIODIC:
+            due = self._dirty_since + self.interval
+        else:
+            return None  # on_phase: フェーズか wait_for_fresh() を待つ
+        return max(due, self._retry_at)
+
+    def solve_now(self) -> bool:
+        """
+        呼び出したスレッドで、今すぐ計算して結果を公開する。成功したら True を返す。
+        失敗したら (計算結果が有限でない場合も含む) 例外をログに出して last_error に残し、
+        変更は未反映のまま retry_delay 秒後の再計算を待つ。
+        """
+        started = time.monotonic()
+        with self._cond:
+            forced, phase_requested = self._forced, self._phase_requested
+            self._forced = False
+            self._phase_requested = False
+        try:
+            with self.lock:
+                with self._cond:
+                    target_seq = self._mutation_seq  # lock を取ったので、これ以降の変更は計算の後になる
+                self.engine.calculate_all_contributions()
+                # 計算に失敗したエンジンは例外を出さずに NaN の貢献度を公開するので、ここで失敗として扱う
+                c_vector = self.engine.c_vector
+                if c_vector is not None and not np.all(np.isfinite(c_vector)):
+                    raise FloatingPointError("貢献度の計算結果に NaN または無限大が含まれています。")
+        except Exception as e:
+            self.last_solve_seconds = time.monotonic() - started
+            self.last_error = e
+            logger.exception("バックグラウンドの貢献度計算に失敗しました。%s秒後に計算し直します。", self.retry_delay)
+            with self._cond:
+                # _solved_seq と _dirty_since は進めない (失敗した計算を反映済みとは扱わない)
+                self._forced = self._forced or forced
+                self._phase_requested = self._phase_requested or phase_requested
+                self._retry_at = time.monotonic() + self.retry_delay
+                self._failure_count += 1
+                self._cond.notify_all()
+            return False
+        self.last_solve_seconds = time.monotonic() - started
+        self.last_error = None
+        with self._cond:
+            self._solved_seq = max(self._solved_seq, target_seq)
+            self.solve_count += 1
+            self._retry_at = 0.0
+            self._dirty_since = None if self._solved_seq >= self._mutation_seq else time.monotonic()
+            self._cond.notify_all()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    due = self._due_time()
+                    now = time.monotonic()
+                    if due is not None and due <= now:
+                        break
+                    self._cond.wait(None if due is None else due - now)
+            self.solve_now()
+
+    def wait_for_fresh(self, timeout: Optional[float] = None) -> bool:
+        """
+        呼び出した時点までの変更を全て反映した計算が終わるまで待ち、終わったら True を返す。
+        スレッドが動いていなければ、呼び出したスレッドで計算する。
+        待っている間に計算が失敗したときや、timeout までに終わらなかったときは False を返す。
+        """
+        with self._cond:
+            target_seq = self._mutation_seq
+            if self._solved_seq >= target_seq:
+                return True
+            if self.running:
+                failure_count = self._failure_count
+                self._forced = True
+                self._retry_at = 0.0  # 呼び出し側が待っているので、失敗の後でもすぐに計算し直す
+                self._cond.notify_all()
+                self._cond.wait_for(lambda: self._solved_seq >= target_seq or self._failure_count != failure_count,
+                                    timeout)
+                return self._solved_seq >= target_seq
+        return self.solve_now()
+
+    # --- 開始・停止 ---
+    def start(self):
+        if self.running:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="picsy-contribution-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, flush: bool = True, timeout: Optional[float] = None):
+        """スレッドを止める。flush=True なら、未反映の変更があれば最後に1回計算してから止める。"""
+        if flush and self.dirty:
+            self.wait_for_fresh(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def detach(self):
+        """スレッドを止め、エンジンを貢献度をその場で計算する動作に戻す。"""
+        self.stop()
+        if self.engine.contribution_scheduler is self:
+            self.engine.contribution_scheduler = None
@@ -0,0 +1,386 @@
+import multiprocessing
+import os
+import threading
+import zlib
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from picsy_engine_prototype import PicsyEngine, PicsyUser
+
+
+class _EngineHost:
+    """
+    1つのプロセスの中でコミュニティごとの PicsyEngine を保持し、要求を実行する。
+    ワーカープロセスでも、num_workers=0 のときの呼び出し元プロセスでも同じものを使う。
+    """
+
+    def __init__(self):
+        self.engines: Dict[str, PicsyEngine] = {}
+
+    def handle(self, op: str, payload) -> Any:
+        if op == "create":
+            community_id, user_list, engine_kwargs = payload
+            if community_id in self.engines:
+                raise ValueError(f"コミュニティ '{community_id}' は既に存在します。")
+            self.engines[community_id] = PicsyEngine(user_list, **engine_kwargs)
+            return None
+        if op == "drop":
+            self.engines.pop(payload, None)
+            return None
+        if op == "call_many":
+            return [getattr(self._engine(community_id), method)(*args, **kwargs)
+                    for community_id, method, args, kwargs in payload]
+        if op == "save":
+            community_id, path = payload
+            self._engine(community_id).save_snapshot(path)
+            return None
+        if op == "load":
+            community_id, path, verbosity = payload
+            self.engines[community_id] = PicsyEngine.from_snapshot(path, verbosity=verbosity)
+            return None
+        if op == "sizes":
+            return {community_id: engine.num_users for community_id, engine in self.engines.items()}
+        raise ValueError(f"不明な要求です: {op}")
+
+    def _engine(self, community_id: str) -> PicsyEngine:
+        if community_id not in self.engines:
+            raise KeyError(f"コミュニティ '{community_id}' はこのワーカーにありません。")
+        return self.engines[community_id]
+
+
+def _worker_main(conn):
+    """ワーカープロセスの本体。("stop", None) を受け取るまで要求を順に処理する。"""
+    host = _EngineHost()
+    while True:
+        op, payload = conn.recv()
+        if op == "stop":
+            conn.close()
+            return
+        try:
+            conn.send((True, host.handle(op, payload)))
+        except Exception as e:  # 例外は呼び出し元で送出し直す
+            conn.send((False, e))
+
+
+class _Worker:
+    """ワーカープロセス1つへの接続。send と recv の組を lock で守る。"""
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.lock = threading.Lock()
+
+    def send(self, op: str, payload):
+        self.conn.send((op, payload))
+
+    def recv(self):
+        ok, result = self.conn.recv()
+        if not ok:
+            raise result
+        return result
+
+    def request(self, op: str, payload):
+        with self.lock:
+            self.send(op, payload)
+            return self.recv()
+
+
+class _CommunityGate:
+    """
+    コミュニティ1つへの呼び出しと移動を調停する読み書きロック。
+    呼び出しは shared() で同時にいくつでも入れるが、移動は exclusive() で、実行中の呼び出しが
+    終わるのを待ってから1つだけ入る。移動を待っている間は新しい呼び出しを入れない (移動が飢えないように)。
+    移動が終わったときに待っていた呼び出しは、次の移動より先に入れる (呼び出しが飢えないように)。
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_readers = 0
+        self._admitting = 0  # 移動が終わったときに待っていて、まだ入っていない呼び出しの数
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            if self._writer:
+                self._waiting_readers += 1
+                while self._writer:
+                    self._cond.wait()
+                self._waiting_readers -= 1
+                if self._admitting:
+                    self._admitting -= 1
+                    if not self._admitting:
+                        self._cond.notify_all()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            while self._writer or self._admitting:
+                self._cond.wait()
+            self._writer = True
+            while self._readers:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._admitting = self._waiting_readers
+                self._cond.notify_all()
+
+
+class EngineManager:
+    """
+    独立した多数のコミュニティの PicsyEngine を、ワーカープロセスに分けて持つマネージャー。
+
+    - コミュニティは既定で crc32(コミュニティID) % num_workers 番のワーカーに置かれ、
+      「いいね」やステータス取得などの呼び出しはそのワーカーに送られる。
+    - calculate_all() は全ワーカーに同時に要求を送るので、独立したコミュニティの貢献度計算が
+      CPUコアの数だけ並列に進む。
+    - move_community() / rebalance() はスナップショットを介してコミュニティを別のワーカーに移す。
+    - num_workers=0 ならワーカープロセスを作らず、呼び出し元のプロセスで同じように動く
+      (テストや小規模な運用向け)。
+
+    ワーカー間で受け渡すのは pickle できる値だけなので、公開結果 (engine.published) そのものではなく
+    get_user_status などの dict や配列を返すメソッドを呼ぶこと。
+    """
+
+    def __init__(self, num_workers: int = 0, snapshot_dir: Optional[str] = None,
+                 mp_context: Optional[str] = None):
+        if num_workers < 0:
+            raise ValueError("num_workersは0以上である必要があります。")
+        self.num_workers: int = num_workers
+        self.snapshot_dir: Optional[str] = snapshot_dir
+        self._placement: Dict[str, int] = {}  # コミュニティID -> ワーカー番号
+        self._gates: Dict[str, _CommunityGate] = {}  # 呼び出しと移動を調停する (コミュニティごと)
+        self._placement_lock = threading.Lock()
+        self._local: Optional[_EngineHost] = _EngineHost() if num_workers == 0 else None
+        self._local_lock = threading.Lock()
+        context = multiprocessing.get_context(mp_context)
+        self._workers: List[_Worker] = [_Worker(context) for _ in range(num_workers)]
+
+    def __enter__(self) -> "EngineManager":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for worker in self._workers:
+            with worker.lock:
+                worker.send("stop", None)
+            worker.process.join(timeout=5)
+        self._workers = []
+
+    # --- 振り分け ---
+    def default_worker(self, community_id: str) -> int:
+        return zlib.crc32(community_id.encode("utf-8")) % max(self.num_workers, 1)
+
+    def worker_for(self, community_id: str) -> int:
+        with self._placement_lock:
+            return self._placement.get(community_id, self.default_worker(community_id))
+
+    def communities(self) -> Dict[str, int]:
+        """コミュニティIDと、それを持つワーカー番号の対応。"""
+        with self._placement_lock:
+            return dict(self._placement)
+
+    def _gate(self, community_id: str) -> _CommunityGate:
+        with self._placement_lock:
+            gate = self._gates.get(community_id)
+        if gate is None:
+            raise KeyError(f"コミュニティ '{community_id}' は存在しません。")
+        return gate
+
+    def _placed_worker(self, community_id: str) -> int:
+        """ゲートを取った状態で、コミュニティを持つワーカー番号を返す (その間に削除されていれば KeyError)"""
+        with self._placement_lock:
+            if community_id not in self._placement:
+                raise KeyError(f"コミュニティ '{community_id}' は存在しません。")
+            return self._placement[community_id]
+
+    def _request(self, worker_idx: int, op: str, payload):
+        if self._local is not None:
+            with self._local_lock:
+                return self._local.handle(op, payload)
+        return self._workers[worker_idx].request(op, payload)
+
+    # --- コミュニティの作成・削除 ---
+    def create_community(self, community_id: str, user_list: List[PicsyUser], **engine_kwargs):
+        """コミュニティを作る。engine_kwargs は PicsyEngine の引数 (storage, solver など)。"""
+        with self._placement_lock:
+            if community_id in self._placement:
+                raise ValueError(f"コミュニティ '{community_id}' は既に存在します。")
+            worker_idx = self.default_worker(community_id)
+            self._request(worker_idx, "create", (community_id, list(user_list), engine_kwargs))
+            self._placement[community_id] = worker_idx
+            self._gates[community_id] = _CommunityGate()
+
+    def drop_community(self, community_id: str):
+        """コミュニティを削除する。実行中の呼び出しや移動が終わるのを待ってから消す。"""
+        try:
+            gate = self._gate(community_id)
+        except KeyError:
+            return
+        with gate.exclusive():
+            with self._placement_lock:
+                worker_idx = self._placement.pop(community_id, None)
+                self._gates.pop(community_id, None)
+            if worker_idx is not None:
+                self._request(worker_idx, "drop", community_id)
+
+    # --- 呼び出し ---
+    def call(self, community_id: str, method: str, *args, **kwargs):
+        """
+        コミュニティのエンジンのメソッドを、それを持つワーカーで呼び出して結果を返す。
+        コミュニティの移動中は、移動が終わってから移動先のワーカーで呼び出す。
+        """
+        with self._gate(community_id).shared():
+            return self._request(self._placed_worker(community_id), "call_many",
+                                 [(community_id, method, args, kwargs)])[0]
+
+    def perform_like(self, community_id: str, liker_user_id: str, liked_content_creator_id: str) -> bool:
+        return self.call(community_id, "perform_like", liker_user_id, liked_content_creator_id)
+
+    def perform_likes_batch(self, community_id: str, liker_user_ids, liked_content_creator_ids):
+        return self.call(community_id, "perform_likes_batch", liker_user_ids, liked_content_creator_ids)
+
+    def get_user_status(self, community_id: str, user_id: str) -> Dict:
+        return self.call(community_id, "get_user_status", user_id)
+
+    def get_status_many(self, community_id: str, user_ids: List[str]) -> List[Dict]:
+        return self.call(community_id, "get_status_many", user_ids)
+
+    def call_all(self, method: str, community_ids: Optional[Iterable[str]] = None,
+                 *args, **kwargs) -> Dict[str, Any]:
+        """
+        複数のコミュニティで同じメソッドを呼ぶ。要求を全ワーカーに送ってから結果を待つので、
+        ワーカー同士は並列に動く (同じワーカーのコミュニティは順に処理される)。
+        対象のコミュニティの移動は、呼び出しが終わるまで待たせる。
+        """
+        if community_ids is None:
+            community_ids = list(self.communities())
+        with ExitStack() as stack:
+            # 複数のゲートを取るので、デッドロックしないように決まった順に取る
+            for community_id in sorted(set(community_ids)):
+                stack.enter_context(self._gate(community_id).shared())
+            return self._call_all_locked(method, community_ids, args, kwargs)
+
+    def _call_all_locked(self, method: str, community_ids: Iterable[str], args, kwargs) -> Dict[str, Any]:
+        by_worker: Dict[int, List[Tuple[str, str, tuple, dict]]] = {}
+        for community_id in community_ids:
+            by_worker.setdefault(self._placed_worker(community_id), []).append(
+                (community_id, method, args, kwargs))
+
+        results: Dict[str, Any] = {}
+        if self._local is not None:
+            for calls in by_worker.values():
+                for (community_id, *_), result in zip(calls, self._request(0, "call_many", calls)):
+                    results[community_id] = result
+            return results
+
+        # 決まった順にロックを取り、全ワーカーに送ってから受け取る
+        worker_ids = sorted(by_worker)
+        for worker_idx in worker_ids:
+            self._workers[worker_idx].lock.acquire()
+        try:
+            for worker_idx in worker_ids:
+                self._workers[worker_idx].send("call_many", by_worker[worker_idx])
+            errors = []
+            for worker_idx in worker_ids:
+                try:
+                    worker_results = self._workers[worker_idx].recv()
+                except Exception as e:  # 他のワーカーの応答を読み切ってから送出する
+                    errors.append(e)
+                    continue
+                for (community_id, *_), result in zip(by_worker[worker_idx], worker_results):
+                    results[community_id] = result
+        finally:
+            for worker_idx in worker_ids:
+                self._workers[worker_idx].lock.release()
+        if errors:
+            raise errors[0]
+        return results
+
+    def calculate_all(self, community_ids: Optional[Iterable[str]] = None):
+        """全コミュニティ (または指定したコミュニティ) の貢献度を並列に計算し直す。"""
+        self.call_all("calculate_all_contributions", community_ids)
+
+    # --- 移動・再配置 ---
+    def move_community(self, community_id: str, target_worker: int, verbosity: int = 0):
+        """
+        スナップショットを介してコミュニティを target_worker 番のワーカーに移す。
+        実行中の呼び出しが終わるのを待ってから、保存 → 読み込み → 配置の更新 → 移動元の削除 を
+        ゲートを排他的に取ったまま行うので、移動中の呼び出しは移動が終わるまで待たされ、
+        移動先のワーカーで実行される (保存した後に移動元に届いて失われる「いいね」はない)。
+        """
+        if self._local is not None:
+            return  # ワーカーが1つ (呼び出し元プロセス) しかないので移動先がない
+        if not 0 <= target_worker < self.num_workers:
+            raise ValueError(f"target_workerは0以上{self.num_workers}未満である必要があります。")
+        if self.snapshot_dir is None:
+            raise ValueError("コミュニティを移動するには snapshot_dir を指定する必要があります。")
+        with self._gate(community_id).exclusive():
+            source_worker = self._placed_worker(community_id)
+            if source_worker == target_worker:
+                return
+            path = os.path.join(self.snapshot_dir, f"community-{zlib.crc32(community_id.encode('utf-8')):08x}-"
+                                f"{community_id.encode('utf-8').hex()[:32]}")
+            self._request(source_worker, "save", (community_id, path))
+            self._request(target_worker, "load", (community_id, path, verbosity))
+            with self._placement_lock:
+                self._placement[community_id] = target_worker
+            self._request(source_worker, "drop", community_id)
+
+    def worker_loads(self) -> List[int]:
+        """ワーカーごとの持っているユーザー数の合計。"""
+        loads = [0] * max(self.num_workers, 1)
+        if self._local is not None:
+            loads[0] = sum(self._request(0, "sizes", None).values())
+            return loads
+        for worker_idx in range(self.num_workers):
+            loads[worker_idx] = sum(self._request(worker_idx, "sizes", None).values())
+        return loads
+
+    def rebalance(self, tolerance: float = 0.1) -> List[Tuple[str, int, int]]:
+        """
+        ユーザー数の合計が最も多いワーカーから最も少ないワーカーへ、差を縮めるコミュニティを
+        移すことを、差が平均の tolerance 倍以下になるか移せるものがなくなるまで繰り返す。
+        行った移動の (コミュニティID, 移動元, 移動先) のリストを返す。
+        """
+        if self._local is not None or self.num_workers < 2:
+            return []
+        sizes = [self._request(worker_idx, "sizes", None) for worker_idx in range(self.num_workers)]
+        loads = [sum(worker_sizes.values()) for worker_sizes in sizes]
+        mean_load = sum(loads) / self.num_workers
+        moves = []
+        while True:
+            heaviest = max(range(self.num_workers), key=loads.__getitem__)
+            lightest = min(range(self.num_workers), key=loads.__getitem__)
+            gap = loads[heaviest] - loads[lightest]
+            if gap <= tolerance * mean_load:
+                break
+            # 差を最も縮める (移した後の差の絶対値が最小で、今の差より小さくなる) コミュニティを選ぶ
+            candidates = [(abs(gap - 2 * size), community_id, size)
+                          for community_id, size in sizes[heaviest].items() if 0 < size < gap]
+            if not candidates:
+                break
+            _, community_id, size = min(candidates)
+            self.move_community(community_id, lightest)
+            del sizes[heaviest][community_id]
+            sizes[lightest][community_id] = size
+            loads[heaviest] -= size
+            loads[lightest] += size
+            moves.append((community_id, heaviest, lightest))
+        return moves
@@ -0,0 +1,496 @@
+import json
+import os
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from types import MappingProxyType
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from picsy_results import PublishedResults
+from picsy_storage import STORAGE_DENSE, store_class
+
+# --- 共有メモリの配置 ---
+# 制御セグメント (名前は name): マジック番号、シーケンス番号 (seqlock)、データセグメントの世代。
+# データセグメント (名前は f"{name}_{世代}"): 先頭 _HEADER_BYTES バイトの後ろにスロットが2つ並ぶ。
+# 書き手は使われていない方のスロットに書き込み、シーケンス番号を進めて切り替える (ダブルバッファ)。
+# 1スロットは先頭のスロットヘッダ、64バイト境界に揃えた配列、最後にメタデータの JSON からなる。
+SHM_MAGIC = int.from_bytes(b"PICSYSM1", "little")
+
+CONTROL_DTYPE = np.dtype([
+    ("magic", "<u8"),
+    ("seq", "<u8"),          # 偶数: 安定 / 奇数: 書き込み中。使用中のスロットは (seq // 2) % 2
+    ("generation", "<u8"),   # 現在のデータセグメントの世代 (容量が足りなくなると作り直して1増やす)
+    ("writer_pid", "<i8"),
+])
+SLOT_HEADER_DTYPE = np.dtype([
+    ("stamp", "<u8"),        # このスロットが使用中になったときの seq
+    ("meta_offset", "<i8"),  # スロット先頭からのメタデータ JSON の位置
+    ("meta_len", "<i8"),
+    ("reserved", "<i8"),
+])
+SEGMENT_HEADER_DTYPE = np.dtype([
+    ("magic", "<u8"),
+    ("slot_size", "<i8"),
+])
+_HEADER_BYTES = 64
+_ALIGN = 64
+DEFAULT_SLOT_SIZE = 1 << 20  # 最初に確保する1スロットの大きさ。足りなくなったら必要量の2倍で作り直す
+DEFAULT_READ_RETRIES = 100
+
+_attach_lock = threading.Lock()
+
+
+class SharedMemoryError(RuntimeError):
+    """共有メモリが見つからない、形式が違う、または一貫した読み出しができなかったときに送出される。"""
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    既存の共有メモリを開く。読み手が終了したときに resource_tracker が共有メモリを
+    削除してしまわないように、追跡の対象にしない。
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # track 引数のない Python 3.12 以前
+        pass
+    # 開いた後で unregister すると、書き手と resource_tracker を共有している (同じプロセスや
+    # multiprocessing で起動した) 場合に書き手の登録まで消えてしまうので、登録そのものを止める
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _close(shm: Optional[shared_memory.SharedMemory]):
+    if shm is None:
+        return
+    try:
+        shm.close()
+    except BufferError:  # 配列のビューが残っている間は閉じられないので、GC に任せる
+        pass
+
+
+class SharedStateWriter:
+    """
+    メタデータ (JSON にできる dict) と配列の組を共有メモリに公開する書き手。1つの名前に書き手は1つだけ。
+
+    publish() のたびに使われていない方のスロットへ書き込み、シーケンス番号を進めて切り替える。
+    読み手は使用中のスロットを待たずに読め、読み終えた時点でシーケンス番号が2つ以上
+    進んでいなければ (次の次の publish が始まっていなければ)、読んだ内容は一貫している。
+    """
+
+    def __init__(self, name: str, slot_size: int = DEFAULT_SLOT_SIZE):
+        self.name: str = name
+        self._control = shared_memory.SharedMemory(name=name, create=True, size=CONTROL_DTYPE.itemsize)
+        self._ctrl = np.ndarray((), dtype=CONTROL_DTYPE, buffer=self._control.buf)
+        self._ctrl["magic"] = SHM_MAGIC
+        self._ctrl["seq"] = 0
+        self._ctrl["writer_pid"] = os.getpid()
+        self._generation: int = 0
+        self._data: Optional[shared_memory.SharedMemory] = None
+        self._slot_size: int = 0
+        self._open_segment(max(_aligned(slot_size), _ALIGN))
+        self._ctrl["generation"] = self._generation
+
+    def __enter__(self) -> "SharedStateWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def seq(self) -> int:
+        return int(self._ctrl["seq"])
+
+    def _open_segment(self, slot_size: int):
+        self._generation += 1
+        self._data = shared_memory.SharedMemory(
+            name=f"{self.name}_{self._generation}", create=True, size=_HEADER_BYTES + 2 * slot_size)
+        header = np.ndarray((), dtype=SEGMENT_HEADER_DTYPE, buffer=self._data.buf)
+        header["magic"] = SHM_MAGIC
+        header["slot_size"] = slot_size
+        self._slot_size = slot_size
+
+    def publish(self, metadata: dict, arrays: Dict[str, np.ndarray]):
+        """metadata と arrays を次の版として公開する。"""
+        arrays = {name: np.asarray(array) for name, array in arrays.items()}
+        entries = {}
+        offset = _aligned(SLOT_HEADER_DTYPE.itemsize)
+        for name, array in arrays.items():
+            entries[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset = _aligned(offset + array.nbytes)
+        meta = json.dumps({"metadata": metadata, "arrays": entries}, ensure_ascii=False).encode("utf-8")
+        required = offset + len(meta)
+
+        seq = self.seq
+        self._ctrl["seq"] = seq + 1  # 書き込み中 (読み手は引き続き使用中のスロットを読める)
+        old_data = None
+        if required > self._slot_size:
+            old_data = self._data
+            self._open_segment(_aligned(2 * required))
+        target = (seq // 2 + 1) % 2
+        slot_start = _HEADER_BYTES + target * self._slot_size
+        buf = self._data.buf
+        for name, array in arrays.items():
+            entry = entries[name]
+            dst = np.ndarray(array.shape, dtype=array.dtype, buffer=buf, offset=slot_start + entry["offset"])
+            dst[...] = array
+        buf[slot_start + offset:slot_start + offset + len(meta)] = meta
+        slot_header = np.ndarray((), dtype=SLOT_HEADER_DTYPE, buffer=buf, offset=slot_start)
+        slot_header["meta_offset"] = offset
+        slot_header["meta_len"] = len(meta)
+        slot_header["stamp"] = seq + 2
+        self._ctrl["generation"] = self._generation
+        self._ctrl["seq"] = seq + 2  # 切り替え
+        if old_data is not None:
+            # 既に開いている読み手の写像は残るので、名前だけ消してよい
+            _close(old_data)
+            old_data.unlink()
+
+    def close(self):
+        """共有メモリを閉じて削除する。"""
+        self._ctrl = None
+        for shm in (self._data, self._control):
+            if shm is not None:
+                _close(shm)
+                try:
+                    shm.unlink()
+                except FileNotFoundError:
+                    pass
+        self._data = None
+        self._control = None
+
+
+class SharedStateReader:
+    """
+    SharedStateWriter が公開した内容を、コピーせずに読み取り専用の配列ビューとして読む読み手。
+
+    read() が返す配列は共有メモリそのものを指すので、使い終わった後に is_valid(seq) で
+    読んでいる間に書き換えが始まっていないことを確かめる。read_consistent() はその確認と
+    再試行までを行う。
+    """
+
+    def __init__(self, name: str):
+        self.name: str = name
+        try:
+            self._control = _attach(name)
+        except FileNotFoundError as e:
+            raise SharedMemoryError(f"共有メモリ '{name}' が見つかりません。") from e
+        self._ctrl = np.ndarray((), dtype=CONTROL_DTYPE, buffer=self._control.buf)
+        if int(self._ctrl["magic"]) != SHM_MAGIC:
+            raise SharedMemoryError(f"共有メモリ '{name}' の形式が違います。")
+        self._generation: int = 0
+        self._data: Optional[shared_memory.SharedMemory] = None
+
+    def __enter__(self) -> "SharedStateReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def seq(self) -> int:
+        return int(self._ctrl["seq"])
+
+    def is_valid(self, seq: int) -> bool:
+        """read() が seq と一緒に返した内容が、今もまだ書き換えられていないか。"""
+        base = seq - seq % 2
+        return self.seq <= base + 2
+
+    def _segment(self, generation: int) -> shared_memory.SharedMemory:
+        if generation != self._generation:
+            data = _attach(f"{self.name}_{generation}")  # 既に作り直されていれば FileNotFoundError
+            _close(self._data)
+            self._data = data
+            self._generation = generation
+        return self._data
+
+    def read(self) -> Tuple[int, dict, Dict[str, np.ndarray]]:
+        """
+        使用中のスロットを読み、(seq, metadata, 配列の dict) を返す。まだ何も公開されていなければ
+        SharedMemoryError。配列は共有メモリのビューなので、使い終えたら is_valid(seq) で確かめる。
+        """
+        for _ in range(DEFAULT_READ_RETRIES):
+            seq = self.seq
+            if seq < 2:
+                raise SharedMemoryError(f"共有メモリ '{self.name}' にはまだ何も公開されていません。")
+            base = seq - seq % 2
+            try:
+                data = self._segment(int(self._ctrl["generation"]))
+            except FileNotFoundError:
+                continue
+            slot_size = int(np.ndarray((), dtype=SEGMENT_HEADER_DTYPE, buffer=data.buf)["slot_size"])
+            slot_start = _HEADER_BYTES + (base // 2) % 2 * slot_size
+            slot_header = np.ndarray((), dtype=SLOT_HEADER_DTYPE, buffer=data.buf, offset=slot_start)
+            if int(slot_header["stamp"]) != base:
+                continue  # 世代の切り替えと重なった
+            meta_offset = slot_start + int(slot_header["meta_offset"])
+            meta_bytes = bytes(data.buf[meta_offset:meta_offset + int(slot_header["meta_len"])])
+            if not self.is_valid(seq):
+                continue
+            try:
+                meta = json.loads(meta_bytes.decode("utf-8"))
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                continue
+            arrays = {}
+            for name, entry in meta["arrays"].items():
+                array = np.ndarray(tuple(entry["shape"]), dtype=np.dtype(entry["dtype"]),
+                                   buffer=data.buf, offset=slot_start + entry["offset"])
+                array.flags.writeable = False
+                arrays[name] = array
+            return seq, meta["metadata"], arrays
+        raise SharedMemoryError(f"共有メモリ '{self.name}' から一貫した内容を読めませんでした。")
+
+    def read_consistent(self, fn: Callable, retries: int = DEFAULT_READ_RETRIES):
+        """fn(metadata, arrays) を呼び、読んでいる間に書き換えが始まっていたらやり直す。"""
+        for _ in range(retries):
+            seq, metadata, arrays = self.read()
+            try:
+                result = fn(metadata, arrays)
+            except Exception:
+                if self.is_valid(seq):
+                    raise
+                continue  # 書き換え途中の値を読んで失敗した
+            if self.is_valid(seq):
+                return result
+        raise SharedMemoryError(f"共有メモリ '{self.name}' から一貫した内容を読めませんでした。")
+
+    def close(self):
+        self._ctrl = None
+        _close(self._data)
+        _close(self._control)
+        self._data = None
+        self._control = None
+
+
+# --- エンジン用 ---
+# 公開結果は name の共有メモリに、評価行列は name + _MATRIX_SUFFIX の共有メモリに分けて書き出す。
+# 評価行列はストアの snapshot_arrays() の配列をそのまま入れる。
+_MATRIX_SUFFIX = "_matrix"
+DEFAULT_MATRIX_INTERVAL_SECONDS = 10.0
+
+
+def engine_results_state(engine) -> Tuple[dict, Dict[str, np.ndarray]]:
+    """エンジンの公開結果 (貢献度・予算・購買力・ユーザー) を、SharedStateWriter.publish() に渡す形にする。"""
+    published = engine.published
+    users = json.dumps([published.user_ids, published.user_names], ensure_ascii=False).encode("utf-8")
+    arrays = {
+        "c_vector": published.c_vector,
+        "budgets": published.budgets,
+        "purchasing_power": published.purchasing_power,
+        "users": np.frombuffer(users, dtype=np.uint8),
+    }
+    metadata = {
+        "version": published.version,
+        "engine_token": published.engine_token,
+        "membership_version": published.membership_version,
+    }
+    return metadata, arrays
+
+
+def engine_matrix_state(engine) -> Tuple[dict, Dict[str, np.ndarray]]:
+    """エンジンの評価行列を、SharedStateWriter.publish() に渡す形にする。"""
+    store = engine._store
+    metadata = {
+        "version": engine.published.version,  # この時点の公開結果の版
+        "storage": store.mode,
+        "lazy_decay": store.lazy_decay,
+        "offdiag_scale": store.offdiag_scale,
+        "decay_epoch": store.decay_epoch,
+    }
+    return metadata, dict(store.snapshot_arrays())
+
+
+class SharedEngineWriter:
+    """
+    PicsyEngine の公開結果と評価行列を共有メモリに書き出す書き手 (attach_shared_memory() に渡す)。
+
+    貢献度・予算などの公開結果 (長さ N の配列) は計算のたびに name へ書き出すが、評価行列は
+    密行列モードでは N×N あり、毎回コピーすると計算1回ごとに O(N²) かかるので、
+    name + "_matrix" に分けて matrix_interval 秒に1回だけ書き出す。matrix_interval=None なら
+    publish_matrix() (engine.publish_shared_matrix()) を呼んだときだけ書き出す。
+    読み手から見える評価行列は公開結果より古いことがあり、どの版の時点のものかは
+    SharedEngineView.matrix_version で分かる。
+    """
+
+    def __init__(self, name: str, matrix_interval: Optional[float] = DEFAULT_MATRIX_INTERVAL_SECONDS,
+                 slot_size: int = DEFAULT_SLOT_SIZE):
+        if matrix_interval is not None and matrix_interval < 0:
+            raise ValueError("matrix_intervalは0以上である必要があります。")
+        self.name: str = name
+        self.matrix_interval: Optional[float] = matrix_interval
+        self.results = SharedStateWriter(name, slot_size)
+        try:
+            self.matrix = SharedStateWriter(name + _MATRIX_SUFFIX, slot_size)
+        except BaseException:
+            self.results.close()
+            raise
+        self._matrix_published_at: Optional[float] = None
+
+    def __enter__(self) -> "SharedEngineWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def publish(self, engine):
+        """公開結果を書き出し、前回から matrix_interval 秒以上たっていれば評価行列も書き出す。"""
+        self.results.publish(*engine_results_state(engine))
+        if self.matrix_interval is not None and (
+                self._matrix_published_at is None
+                or time.monotonic() - self._matrix_published_at >= self.matrix_interval):
+            self.publish_matrix(engine)
+
+    def publish_matrix(self, engine):
+        """評価行列を今すぐ書き出す。"""
+        self.matrix.publish(*engine_matrix_state(engine))
+        self._matrix_published_at = time.monotonic()
+
+    def close(self):
+        self.results.close()
+        self.matrix.close()
+
+
+class SharedEngineView:
+    """
+    共有メモリから読んだエンジンの1版分。published は PublishedResults、store は
+    評価行列の読み取り専用のストア (密行列モードでは共有メモリ上の E をそのまま指す)。
+    評価行列は公開結果とは別の間隔で書き出されるので、store は matrix_version の版の時点のもの
+    (まだ書き出されていなければ store も matrix_version も None)。
+    """
+
+    __slots__ = ("seq", "published", "matrix_seq", "matrix_version", "store")
+
+    def __init__(self, seq: int, published: PublishedResults, matrix_seq: Optional[int] = None,
+                 matrix_version: Optional[int] = None, store=None):
+        self.seq: int = seq
+        self.published: PublishedResults = published
+        self.matrix_seq: Optional[int] = matrix_seq
+        self.matrix_version: Optional[int] = matrix_version
+        self.store = store
+
+    @property
+    def E(self):
+        """評価行列E。遅延自然回収の倍率が溜まっている場合は実値に直したコピーを返す。"""
+        if self.store is None:
+            raise SharedMemoryError("評価行列はまだ共有メモリに書き出されていません。")
+        if self.store.mode == STORAGE_DENSE and self.store.offdiag_scale == 1.0:
+            return self.store.matrix  # 共有メモリをコピーせずに参照する
+        return self.store.to_matrix()
+
+
+class SharedEngineReader:
+    """
+    PicsyEngine が attach_shared_memory() で公開している結果と評価行列を、別のプロセス
+    (API のワーカーなど) から読む。大きな配列はコピーせず、共有メモリを直接参照する。
+
+    使い方:
+        reader = SharedEngineReader("picsy")
+        status = reader.read(lambda view: view.published.get_status(user_id))
+
+    read() は fn の実行中に書き手が同じスロットを書き換え始めていたら、やり直す。
+    ユーザーIDの対応表は参加ユーザーが変わったときだけ作り直し、同じ版の公開結果と評価行列は使い回す。
+    """
+
+    def __init__(self, name: str):
+        self._reader = SharedStateReader(name)
+        try:
+            self._matrix_reader = SharedStateReader(name + _MATRIX_SUFFIX)
+        except BaseException:
+            self._reader.close()
+            raise
+        self._view: Optional[SharedEngineView] = None
+        self._results: Optional[Tuple[int, PublishedResults]] = None
+        self._matrix: Optional[Tuple[int, Tuple[int, object]]] = None
+        self._users_key: Optional[Tuple[str, int]] = None
+        self._users = None
+
+    def __enter__(self) -> "SharedEngineReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def current(self) -> SharedEngineView:
+        """最新の版を返す。返した版を使い終えたら is_valid() で確かめること。"""
+        self._results = self._latest(self._reader, self._results, self._build_published)
+        if self._matrix_reader.seq >= 2:
+            self._matrix = self._latest(self._matrix_reader, self._matrix, self._build_store)
+        seq, published = self._results
+        matrix_seq, (matrix_version, store) = self._matrix if self._matrix is not None else (None, (None, None))
+        view = self._view
+        if view is None or view.seq != seq or view.matrix_seq != matrix_seq:
+            view = SharedEngineView(seq, published, matrix_seq, matrix_version, store)
+            self._view = view
+        return view
+
+    def is_valid(self, view: SharedEngineView) -> bool:
+        return self._reader.is_valid(view.seq) and (
+            view.matrix_seq is None or self._matrix_reader.is_valid(view.matrix_seq))
+
+    def read(self, fn: Callable[[SharedEngineView], object], retries: int = DEFAULT_READ_RETRIES):
+        for _ in range(retries):
+            view = self.current()
+            try:
+                result = fn(view)
+            except Exception:
+                if self.is_valid(view):
+                    raise
+                continue  # 書き換え途中の値を読んで失敗した
+            if self.is_valid(view):
+                return result
+        raise SharedMemoryError(f"共有メモリ '{self._reader.name}' から一貫した内容を読めませんでした。")
+
+    @staticmethod
+    def _latest(reader: SharedStateReader, cached, build):
+        """reader の最新の版を build(metadata, arrays) で組み立て、(seq, 結果) を返す。同じ版なら cached を返す。"""
+        seq = reader.seq
+        if cached is not None and cached[0] == seq - seq % 2:
+            return cached
+        for _ in range(DEFAULT_READ_RETRIES):
+            seq, metadata, arrays = reader.read()
+            try:
+                built = build(metadata, arrays)
+            except Exception:
+                if reader.is_valid(seq):
+                    raise
+                continue
+            if reader.is_valid(seq):
+                return seq - seq % 2, built
+        raise SharedMemoryError(f"共有メモリ '{reader.name}' から一貫した内容を読めませんでした。")
+
+    def _build_published(self, metadata: dict, arrays: Dict[str, np.ndarray]) -> PublishedResults:
+        users_key = (metadata["engine_token"], metadata["membership_version"])
+        if users_key != self._users_key or self._users is None:
+            ids, names = json.loads(arrays["users"].tobytes().decode("utf-8"))
+            ids, names = tuple(ids), tuple(names)
+            self._users = (ids, names, MappingProxyType({user_id: i for i, user_id in enumerate(ids)}))
+            self._users_key = users_key
+        ids, names, index = self._users
+        return PublishedResults(
+            metadata["version"], metadata["engine_token"], metadata["membership_version"],
+            ids, names, index, arrays["c_vector"], arrays["budgets"],
+            purchasing_power=arrays["purchasing_power"])
+
+    @staticmethod
+    def _build_store(metadata: dict, arrays: Dict[str, np.ndarray]):
+        store = store_class(metadata["storage"]).from_snapshot_arrays(
+            arrays, lazy_decay=metadata["lazy_decay"],
+            offdiag_scale=metadata["offdiag_scale"], decay_epoch=metadata["decay_epoch"])
+        return metadata["version"], store
+
+    def close(self):
+        self._view = None
+        self._results = None
+        self._matrix = None
+        self._reader.close()
+        self._matrix_reader.close()
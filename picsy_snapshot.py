@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# --- スナップショットの形式 ---
+# スナップショットは1つのディレクトリで、header.json と配列ごとの .npy ファイルからなる。
+# header.json には形式のバージョン、各 .npy の sha256、呼び出し側が渡したメタデータを書く。
+# 保存するたびに f"{path}.v-<番号>" という新しいディレクトリに書き、path はそれを指す
+# シンボリックリンクにする。リンクの差し替えは1回の rename なので、path は常にどれかの版を指す。
+SNAPSHOT_FORMAT = "picsy-engine-snapshot"
+SNAPSHOT_VERSION = 1
+HEADER_FILE = "header.json"
+
+_HASH_CHUNK_BYTES = 1 << 24  # チェックサム計算時に一度に読む量 (16MB)
+
+
+class SnapshotError(ValueError):
+    """スナップショットが壊れている、または対応していない形式のときに送出される。"""
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fsync_dir(path: str):
+    """ディレクトリの fsync。中のファイルの作成・rename を永続化する。"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _current_version(path: str) -> Optional[str]:
+    """path のリンクが指している版のディレクトリ (絶対パス)。リンクでなければ None。"""
+    if not os.path.islink(path):
+        return None
+    return os.path.join(os.path.dirname(path), os.readlink(path))
+
+
+def write_snapshot(path: str, metadata: dict, arrays: Dict[str, np.ndarray]):
+    """
+    metadata (JSON にできる dict) と配列をスナップショットとして path に書き出す。
+
+    新しい版のディレクトリに全て書いて fsync してから、path のシンボリックリンクを
+    新しい版に rename で差し替え、親ディレクトリを fsync する。書き込み中にプロセスやマシンが
+    落ちても、path は古いスナップショットか新しいスナップショットのどちらかを指している。
+    差し替えた後に、前の版のディレクトリを削除する。
+    """
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    version_path = f"{path}.v-{time.time_ns()}-{os.getpid()}"
+    os.makedirs(version_path)
+
+    array_entries = {}
+    for name, array in arrays.items():
+        array = np.asarray(array)
+        file_name = f"{name}.npy"
+        file_path = os.path.join(version_path, file_name)
+        with open(file_path, "wb") as f:
+            np.save(f, array, allow_pickle=False)
+            f.flush()
+            os.fsync(f.fileno())
+        array_entries[name] = {
+            "file": file_name,
+            "sha256": file_sha256(file_path),
+            "shape": list(array.shape),
+        }
+
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "arrays": array_entries,
+        "metadata": metadata,
+    }
+    with open(os.path.join(version_path, HEADER_FILE), "w", encoding="utf-8") as f:
+        json.dump(header, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    _fsync_dir(version_path)
+
+    previous = _current_version(path)
+    if previous is None and os.path.isdir(path):
+        # シンボリックリンクを使う前の形式 (path が実際のディレクトリ) は、版のディレクトリに移してから
+        # リンクに置き換える。この移行の1回だけは、2回の rename の間 path が存在しない
+        previous = f"{path}.v-0-{os.getpid()}"
+        os.replace(path, previous)
+    link_tmp = f"{path}.link-{os.getpid()}"
+    if os.path.lexists(link_tmp):
+        os.remove(link_tmp)
+    os.symlink(os.path.basename(version_path), link_tmp)
+    os.replace(link_tmp, path)
+    _fsync_dir(parent)
+    if previous is not None and os.path.isdir(previous):
+        shutil.rmtree(previous)
+
+
+def read_snapshot(path: str, mmap_mode: str = "c",
+                  verify: bool = True) -> Tuple[dict, Dict[str, np.ndarray]]:
+    """
+    スナップショットを読み込み、(metadata, 配列の dict) を返す。
+
+    Args:
+        mmap_mode: np.load に渡すメモリマップのモード。"c" (既定) なら書き込みはプロセス内だけに
+            反映され (copy-on-write)、スナップショット自体は変わらない。None なら全て読み込む。
+        verify: True なら各配列ファイルの sha256 を確かめる。ファイル全体を一度読むことになるので、
+            再起動の速さを優先する場合は False にする。
+    """
+    header_path = os.path.join(path, HEADER_FILE)
+    try:
+        with open(header_path, encoding="utf-8") as f:
+            header = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise SnapshotError(f"スナップショットのヘッダーを読み込めません: {header_path} ({e})") from e
+    if header.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"スナップショットの形式が違います: {header.get('format')}")
+    if header.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(
+            f"対応していないスナップショットのバージョンです: {header.get('version')} (対応: {SNAPSHOT_VERSION})")
+
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        file_path = os.path.join(path, entry["file"])
+        if verify and file_sha256(file_path) != entry["sha256"]:
+            raise SnapshotError(f"チェックサムが一致しません: {file_path}")
+        # 要素数0の配列はメモリマップできないので、そのまま読み込む
+        array = np.load(file_path, mmap_mode=mmap_mode if np.prod(entry["shape"]) > 0 else None,
+                        allow_pickle=False)
+        if list(array.shape) != entry["shape"]:
+            raise SnapshotError(f"配列の形状が一致しません: {file_path}")
+        arrays[name] = array
+    return header["metadata"], arrays
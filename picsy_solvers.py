@@ -0,0 +1,259 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+# --- 貢献度計算ソルバーの名前 ---
+SOLVER_POWER = "power"                # べき乗法 (従来の方式)
+SOLVER_EIGS = "eigs"                  # ARPACK (scipy.sparse.linalg.eigs) による左ペロン・ベクトル
+SOLVER_LINEAR = "linear"              # c(I - E') = 0 と正規化条件の直接解法
+SOLVER_EXTRAPOLATED = "extrapolated"  # Anderson 加速付きべき乗法
+
+ANDERSON_DEPTH = 5  # Anderson 加速で保持する過去の反復の数
+
+
+@dataclass
+class SolverResult:
+    """貢献度計算ソルバーの結果。c_vector は要素の合計がNになるよう正規化済み。"""
+    c_vector: np.ndarray
+    solver: str
+    iterations: int
+    residual: float        # ||c @ E' - c||_1
+    converged: bool
+    last_diff: float = np.nan  # 反復法の最後の反復での変化量 ||c_k - c_(k-1)||_1
+    message: str = ""
+
+
+class ContributionProblem:
+    """
+    貢献度計算用行列 E' を作らずに表した固有ベクトル問題 c @ E' = c, Σc = N。
+
+    E' = O + (予算_i / (N-1)) を i 行の対角以外に加えたもの、と表せるので、
+    他者評価行列 O (対角0) と予算ベクトルだけを持てばよい。
+    E' そのものを扱う場合は O = E', 予算 = 0 として表せる。
+
+    Args:
+        num_users: 総ユーザー数 N (2以上)。
+        budgets: 長さNの予算ベクトル。
+        offdiag_left_multiply: c を受け取り c @ O を返す関数。
+        offdiag_matrix: O を行列 (np.ndarray か scipy.sparse) として返す関数。直接解法でのみ使う。
+
+    from_E_prime() で作った問題は explicit_E_prime が True になる。この場合 O の対角が0ではなく、
+    直接解法の係数行列 I - O^T が特異になるので、solve_linear では解けない。
+    """
+
+    def __init__(self, num_users: int, budgets: np.ndarray,
+                 offdiag_left_multiply: Callable[[np.ndarray], np.ndarray],
+                 offdiag_matrix: Optional[Callable[[], object]] = None):
+        self.num_users: int = num_users
+        self.budgets: np.ndarray = budgets
+        self.offdiag_left_multiply = offdiag_left_multiply
+        self.offdiag_matrix = offdiag_matrix
+        self.explicit_E_prime: bool = False
+        self.matvec_count: int = 0
+
+    @classmethod
+    def from_E_prime(cls, E_prime_matrix: np.ndarray) -> "ContributionProblem":
+        num_users = E_prime_matrix.shape[0]
+        problem = cls(num_users, np.zeros(num_users),
+                      lambda c: c @ E_prime_matrix,
+                      lambda: E_prime_matrix)
+        problem.explicit_E_prime = True
+        return problem
+
+    def left_multiply(self, c: np.ndarray) -> np.ndarray:
+        """c @ E' を O(nnz + N) で計算する。"""
+        self.matvec_count += 1
+        weighted_budgets = c * self.budgets
+        return (self.offdiag_left_multiply(c)
+                + (np.sum(weighted_budgets) - weighted_budgets) / (self.num_users - 1))
+
+    def normalize(self, c: np.ndarray) -> Optional[np.ndarray]:
+        """要素の合計がNになるように正規化する。合計がほぼ0なら None を返す。"""
+        current_sum = np.sum(c)
+        if np.isclose(current_sum, 0):
+            return None
+        return (self.num_users / current_sum) * c
+
+    def residual(self, c: np.ndarray) -> float:
+        return float(np.sum(np.abs(self.left_multiply(c) - c)))
+
+
+def _initial_vector(problem: ContributionProblem, initial_c: Optional[np.ndarray]) -> np.ndarray:
+    if initial_c is not None and len(initial_c) == problem.num_users and np.all(np.isfinite(initial_c)):
+        return np.array(initial_c, dtype=float)
+    return np.ones(problem.num_users)
+
+
+def _failed_result(problem: ContributionProblem, solver: str, iterations: int, message: str) -> SolverResult:
+    return SolverResult(np.full(problem.num_users, np.nan), solver, iterations,
+                        np.nan, False, message=message)
+
+
+def _checked_result(c: np.ndarray, solver: str, iterations: int, residual: float, tolerance: float) -> SolverResult:
+    """反復の収束判定を持たない解法の結果を、残差が許容誤差以内かで収束したかどうかを決めて返す。"""
+    if residual < tolerance:
+        return SolverResult(c, solver, iterations, residual, True)
+    return SolverResult(c, solver, iterations, residual, False,
+                        message=f"残差 {residual:.3e} が許容誤差 {tolerance:.3e} を超えました。")
+
+
+def solve_power(problem: ContributionProblem, max_iterations: int, tolerance: float,
+                initial_c: Optional[np.ndarray] = None, progress: Optional[Callable] = None) -> SolverResult:
+    """べき乗法。progress(iteration, diff, c) は各反復の後に呼ばれる。"""
+    c_k = _initial_vector(problem, initial_c)
+    diff = np.nan
+    for iteration in range(max_iterations):
+        c_k_old = c_k
+        c_k = problem.normalize(problem.left_multiply(c_k_old))
+        if c_k is None:
+            return _failed_result(problem, SOLVER_POWER, iteration + 1,
+                                  f"Iter {iteration+1}: 貢献度の合計が0に近いため、計算を中断しました。")
+        diff = float(np.sum(np.abs(c_k - c_k_old)))
+        if progress is not None:
+            progress(iteration + 1, diff, c_k)
+        if diff < tolerance:
+            return SolverResult(c_k, SOLVER_POWER, iteration + 1, problem.residual(c_k), True, diff)
+    return SolverResult(c_k, SOLVER_POWER, max_iterations, problem.residual(c_k), False, diff,
+                        f"最大反復回数 ({max_iterations}回) に到達しましたが、収束しませんでした。")
+
+
+def solve_extrapolated(problem: ContributionProblem, max_iterations: int, tolerance: float,
+                       initial_c: Optional[np.ndarray] = None, progress: Optional[Callable] = None) -> SolverResult:
+    """
+    Anderson 加速付きべき乗法。直近 ANDERSON_DEPTH 回の反復から外挿して次の反復点を決める。
+    外挿した点に負の要素が出た場合は、その回だけ通常のべき乗法の1ステップに戻す。
+    E' の第2固有値が1に近い (密な「いいね」の仲良しグループがある) 場合に効果が大きい。
+    """
+    c_k = _initial_vector(problem, initial_c)
+    g_history = []  # 写像 G(c) = N * (c @ E') / Σ(c @ E') の値の履歴
+    f_history = []  # 残差 G(c) - c の履歴
+    diff = np.nan
+    for iteration in range(max_iterations):
+        g_k = problem.normalize(problem.left_multiply(c_k))
+        if g_k is None:
+            return _failed_result(problem, SOLVER_EXTRAPOLATED, iteration + 1,
+                                  f"Iter {iteration+1}: 貢献度の合計が0に近いため、計算を中断しました。")
+        f_k = g_k - c_k
+        diff = float(np.sum(np.abs(f_k)))
+        if progress is not None:
+            progress(iteration + 1, diff, g_k)
+        if diff < tolerance:
+            return SolverResult(g_k, SOLVER_EXTRAPOLATED, iteration + 1, problem.residual(g_k), True, diff)
+
+        g_history.append(g_k)
+        f_history.append(f_k)
+        if len(f_history) > ANDERSON_DEPTH + 1:
+            g_history.pop(0)
+            f_history.pop(0)
+
+        c_next = g_k
+        if len(f_history) > 1:
+            delta_f = np.diff(np.array(f_history), axis=0).T
+            delta_g = np.diff(np.array(g_history), axis=0).T
+            gamma, *_ = np.linalg.lstsq(delta_f, f_k, rcond=None)
+            extrapolated = problem.normalize(g_k - delta_g @ gamma)
+            if extrapolated is not None and np.all(extrapolated >= 0):
+                c_next = extrapolated
+            else:
+                g_history = [g_k]
+                f_history = [f_k]
+        c_k = c_next
+    return SolverResult(c_k, SOLVER_EXTRAPOLATED, max_iterations, problem.residual(c_k), False, diff,
+                        f"最大反復回数 ({max_iterations}回) に到達しましたが、収束しませんでした。")
+
+
+def solve_eigs(problem: ContributionProblem, max_iterations: int, tolerance: float,
+               initial_c: Optional[np.ndarray] = None, progress: Optional[Callable] = None) -> SolverResult:
+    """
+    ARPACK で E'^T の絶対値最大の固有ベクトル (= E' の左ペロン・ベクトル) を求める。
+    E' は作らず、c @ E' を LinearOperator として渡す。ARPACK は N >= 3 が必要なため、
+    それより小さい場合はべき乗法で解く。
+
+    max_iterations は ARPACK の Arnoldi 法の再始動の回数の上限としてそのまま渡す。
+    1回の再始動で c @ E' を最大 ncv (既定は min(N, 20)) 回計算するので、c @ E' の計算回数の
+    上限はべき乗法の max_iterations 回よりも多くなるが、N には比例しない。
+    実際の計算回数は SolverResult.iterations に入る。
+    """
+    n = problem.num_users
+    if n < 3:
+        return solve_power(problem, max_iterations, tolerance, initial_c, progress)
+    operator = spla.LinearOperator((n, n), matvec=problem.left_multiply, dtype=float)
+    start_count = problem.matvec_count
+    try:
+        _, vectors = spla.eigs(operator, k=1, which="LM",
+                               v0=_initial_vector(problem, initial_c),
+                               tol=tolerance / n, maxiter=max_iterations)
+    except spla.ArpackNoConvergence as e:
+        if e.eigenvectors.shape[1] == 0:
+            return _failed_result(problem, SOLVER_EIGS, problem.matvec_count - start_count,
+                                  "ARPACKが収束しませんでした。")
+        vectors = e.eigenvectors
+    iterations = problem.matvec_count - start_count
+    c = problem.normalize(np.real(vectors[:, 0]))
+    if c is None:
+        return _failed_result(problem, SOLVER_EIGS, iterations, "固有ベクトルの合計が0に近いため、正規化できませんでした。")
+    return _checked_result(c, SOLVER_EIGS, iterations, problem.residual(c), tolerance)
+
+
+def solve_linear(problem: ContributionProblem, max_iterations: int, tolerance: float,
+                 initial_c: Optional[np.ndarray] = None, progress: Optional[Callable] = None) -> SolverResult:
+    """
+    c(I - E') = 0, Σc = N を連立一次方程式として直接解く。
+
+    E'^T = O^T + (1 b^T - diag(b)) / (N-1) なので、正規化条件 1 1^T c / N = 1 を足した
+        (I - E'^T + 1 1^T / N) c = 1
+    の係数行列は、疎行列 S = I - O^T + diag(b)/(N-1) と階数1の行列 1 w^T
+    (w = 1/N - b/(N-1)) の和になる。Sherman-Morrison の公式から
+        c = y / (1 + w・y),  S y = 1
+    となり、疎行列 S の LU 分解1回で解ける (E' の密な部分は作らない)。
+
+    E' をそのまま表した問題 (ContributionProblem.from_E_prime) では S = I - E'^T が常に特異なので、
+    解こうとせずに ValueError を送出する。
+    """
+    n = problem.num_users
+    if problem.explicit_E_prime:
+        raise ValueError("E' をそのまま渡した問題は I - E'^T が特異になるため、直接解法では解けません。"
+                         "べき乗法などの反復法を使ってください。")
+    if problem.offdiag_matrix is None:
+        return _failed_result(problem, SOLVER_LINEAR, 0, "直接解法には他者評価行列が必要です。")
+    offdiag = problem.offdiag_matrix()
+    budget_part = problem.budgets / (n - 1)
+    ones = np.ones(n)
+    try:
+        if sp.issparse(offdiag):
+            S = (sp.eye_array(n, format="csc") - offdiag.T.tocsc()
+                 + sp.diags_array(budget_part, format="csc"))
+            y = spla.splu(S).solve(ones)
+        else:
+            S = np.eye(n) - offdiag.T + np.diag(budget_part)
+            y = np.linalg.solve(S, ones)
+    except (RuntimeError, np.linalg.LinAlgError) as e:
+        return _failed_result(problem, SOLVER_LINEAR, 1, f"連立一次方程式を解けませんでした: {e}")
+    w = ones / n - budget_part
+    c = problem.normalize(y / (1 + w @ y))
+    if c is None or not np.all(np.isfinite(c)):
+        return _failed_result(problem, SOLVER_LINEAR, 1, "解が有限の値になりませんでした。")
+    return _checked_result(c, SOLVER_LINEAR, 1, problem.residual(c), tolerance)
+
+
+CONTRIBUTION_SOLVERS: Dict[str, Callable[..., SolverResult]] = {
+    SOLVER_POWER: solve_power,
+    SOLVER_EIGS: solve_eigs,
+    SOLVER_LINEAR: solve_linear,
+    SOLVER_EXTRAPOLATED: solve_extrapolated,
+}
+
+
+def register_contribution_solver(name: str, solver: Callable[..., SolverResult]):
+    """独自の貢献度計算ソルバーを登録する。シグネチャは solve_power と同じ。"""
+    CONTRIBUTION_SOLVERS[name] = solver
+
+
+def get_contribution_solver(name: str) -> Callable[..., SolverResult]:
+    if name not in CONTRIBUTION_SOLVERS:
+        raise ValueError(
+            f"solverは {list(CONTRIBUTION_SOLVERS)} のいずれかである必要があります。: '{name}'")
+    return CONTRIBUTION_SOLVERS[name]
@@ -0,0 +1,458 @@
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+# --- 評価行列Eの保持方式 ---
+STORAGE_DENSE = "dense"    # N×N の密行列（小規模コミュニティ向け）
+STORAGE_SPARSE = "sparse"  # 予算ベクトル + 疎な他者評価（大規模コミュニティ向け）
+STORAGE_MODES = (STORAGE_DENSE, STORAGE_SPARSE)
+
+# 遅延自然回収で、全体倍率がこれを下回ったら保存値に倍率を掛けて実値に戻す
+DEFAULT_RENORMALIZE_THRESHOLD = 1e-6
+
+
+class DenseEvaluationStore:
+    """
+    評価行列Eを N×N の密行列としてそのまま保持するストア。
+    対角成分 E_ii が予算、非対角成分 E_ij が i から j への評価。
+
+    lazy_decay=True の場合、自然回収では非対角成分を書き換えずに全体倍率
+    offdiag_scale だけを更新する。このとき非対角成分の実値は
+    offdiag_scale * matrix[i, j] で、対角成分 (予算) は常に実値で持つ。
+
+    ユーザーの追加に備えて capacity × capacity の領域を確保しておき、
+    matrix はその左上 num_users × num_users のビューとする。
+    容量が足りなくなったら2倍に広げるので、追加のたびに全体をコピーすることはない。
+    """
+
+    mode = STORAGE_DENSE
+
+    def __init__(self, num_users: int, lazy_decay: bool = False,
+                 renormalize_threshold: float = DEFAULT_RENORMALIZE_THRESHOLD):
+        self.num_users: int = num_users
+        self._buffer: np.ndarray = np.zeros((num_users, num_users), dtype=float)
+        self.matrix: np.ndarray = self._buffer
+        if num_users > 0:
+            np.fill_diagonal(self.matrix, 1.0)
+        self.lazy_decay: bool = lazy_decay
+        self.renormalize_threshold: float = renormalize_threshold
+        self.offdiag_scale: float = 1.0
+        self.decay_epoch: int = 0  # 実行された自然回収の回数
+
+    @property
+    def capacity(self) -> int:
+        return self._buffer.shape[0]
+
+    @property
+    def nnz(self) -> int:
+        return int(np.count_nonzero(self.matrix))
+
+    def set_matrix(self, new_E: np.ndarray):
+        """評価行列を丸ごと差し替える (容量は new_E の大きさになる)。"""
+        self._buffer = new_E
+        self.matrix = new_E
+        self.num_users = new_E.shape[0]
+        self.offdiag_scale = 1.0
+
+    def add_users(self, count: int):
+        """予算1・評価0のユーザーを count 人、末尾に追加する。"""
+        new_size = self.num_users + count
+        if new_size > self.capacity:
+            new_capacity = max(2 * self.capacity, new_size)
+            new_buffer = np.zeros((new_capacity, new_capacity), dtype=float)
+            new_buffer[:self.num_users, :self.num_users] = self.matrix
+            self._buffer = new_buffer
+        self.num_users = new_size
+        self.matrix = self._buffer[:new_size, :new_size]
+        for i in range(new_size - count, new_size):
+            self.matrix[i, i] = 1.0
+
+    def remove_users(self, indices):
+        """
+        指定したユーザーを取り除く。各ユーザーの位置には末尾のユーザーを移す (swap-remove)。
+        取り除くユーザーが受け取っていた評価は、評価していた側の予算に戻す (行和1を保つ)。
+        インデックスの大きい順に処理するので、結果の並びは swap_remove_order と一致する。
+        """
+        for r in sorted(set(indices), reverse=True):
+            last = self.num_users - 1
+            incoming = self.offdiag_scale * self.matrix[:, r]
+            incoming[r] = 0.0
+            self.matrix[np.arange(last + 1), np.arange(last + 1)] += incoming
+            self.matrix[:, r] = 0.0
+            if r != last:
+                self.matrix[r, :] = self.matrix[last, :]
+                self.matrix[:, r] = self.matrix[:, last]
+            self.matrix[last, :] = 0.0
+            self.matrix[:, last] = 0.0
+            self.num_users = last
+            self.matrix = self._buffer[:last, :last]
+
+    def get(self, i: int, j: int) -> float:
+        if i == j:
+            return float(self.matrix[i, i])
+        return float(self.offdiag_scale * self.matrix[i, j])
+
+    def budget(self, i: int) -> float:
+        return float(self.matrix[i, i])
+
+    def budgets(self) -> np.ndarray:
+        return np.diag(self.matrix).copy()
+
+    def transfer(self, i: int, j: int, alpha: float):
+        self.matrix[i, i] -= alpha
+        self.matrix[i, j] += alpha / self.offdiag_scale
+
+    def transfer_many(self, rows: np.ndarray, cols: np.ndarray, alphas: np.ndarray):
+        """複数の評価移転をまとめて適用する（同じ要素への重複も正しく加算される）。"""
+        np.subtract.at(self.matrix, (rows, rows), alphas)
+        np.add.at(self.matrix, (rows, cols), alphas / self.offdiag_scale)
+
+    def decay(self, gamma: float):
+        """
+        自然回収: 他者評価を (1 - gamma) 倍し、予算を行和が1になるように設定し直す。
+        コピーを作らず、行列全体への配列演算1回でその場で書き換える。
+        遅延モードでは全体倍率と予算だけを更新する (O(N))。
+        """
+        self.decay_epoch += 1
+        if self.lazy_decay:
+            self.offdiag_scale *= (1 - gamma)
+            budgets = np.diagonal(self.matrix)
+            np.fill_diagonal(self.matrix, 1.0 - (1 - gamma) * (1.0 - budgets))
+            if self.offdiag_scale < self.renormalize_threshold:
+                self.renormalize()
+            return
+        np.fill_diagonal(self.matrix, 0.0)
+        self.matrix *= (1 - gamma)
+        np.fill_diagonal(self.matrix, 1.0 - np.sum(self.matrix, axis=1))
+
+    def renormalize(self):
+        """遅延させていた自然回収の倍率を非対角成分に反映し、予算を行和から計算し直す。"""
+        if self.offdiag_scale == 1.0:
+            return
+        np.fill_diagonal(self.matrix, 0.0)
+        self.matrix *= self.offdiag_scale
+        np.fill_diagonal(self.matrix, 1.0 - np.sum(self.matrix, axis=1))
+        self.offdiag_scale = 1.0
+
+    def left_multiply_offdiag(self, c: np.ndarray) -> np.ndarray:
+        """c @ (E - diag(E)) を計算する。"""
+        return self.offdiag_scale * (c @ self.matrix - c * np.diag(self.matrix))
+
+    def offdiag_matrix(self) -> np.ndarray:
+        """対角を0にした他者評価の実値を新しい密行列として返す。"""
+        offdiag = self.offdiag_scale * self.matrix
+        np.fill_diagonal(offdiag, 0.0)
+        return offdiag
+
+    def row_sums(self) -> np.ndarray:
+        budgets = np.diag(self.matrix)
+        return self.offdiag_scale * (np.sum(self.matrix, axis=1) - budgets) + budgets
+
+    def offdiag_norm(self) -> float:
+        """他者評価部分のフロベニウスノルム。"""
+        budgets = np.diag(self.matrix)
+        return float(self.offdiag_scale * np.sqrt(max(np.sum(self.matrix ** 2) - np.sum(budgets ** 2), 0.0)))
+
+    def to_matrix(self) -> np.ndarray:
+        """
+        評価行列Eの実値を新しい密行列として返す。遅延させていた自然回収の倍率はコピーにだけ掛け、
+        保存値は変えない (再正規化は renormalize() か、倍率が閾値を下回ったときだけ行う)。
+        """
+        matrix = self.offdiag_scale * self.matrix
+        np.fill_diagonal(matrix, np.diagonal(self.matrix))
+        return matrix
+
+    def snapshot_arrays(self) -> dict:
+        """スナップショットに保存する配列 (保存値のまま。実値に戻すには offdiag_scale を掛ける)。"""
+        return {"E": self.matrix}
+
+    @classmethod
+    def from_snapshot_arrays(cls, arrays: dict, lazy_decay: bool = False,
+                             offdiag_scale: float = 1.0, decay_epoch: int = 0) -> "DenseEvaluationStore":
+        """
+        snapshot_arrays() の配列からストアを作る。E はコピーせずにそのまま使うので、
+        np.load(mmap_mode="c") で開いた配列を渡せば必要な部分だけが読み込まれる。
+        """
+        store = cls(0, lazy_decay=lazy_decay)
+        store.set_matrix(arrays["E"])
+        store.offdiag_scale = offdiag_scale
+        store.decay_epoch = decay_epoch
+        return store
+
+    def to_coo(self):
+        """他者評価の非ゼロ要素の実値を COO 形式 (rows, cols, values) で返す。"""
+        offdiag = self.offdiag_matrix()
+        rows, cols = np.nonzero(offdiag)
+        return rows, cols, offdiag[rows, cols]
+
+    @classmethod
+    def from_coo(cls, budgets: np.ndarray, rows: np.ndarray, cols: np.ndarray, values: np.ndarray,
+                 lazy_decay: bool = False) -> "DenseEvaluationStore":
+        """
+        予算ベクトルと他者評価の COO 形式 (rows, cols, values) からストアを作る。
+        要素ごとに代入せず、ファンシーインデックスで一度に書き込む (対角の要素は無視する)。
+        """
+        store = cls(len(budgets), lazy_decay=lazy_decay)
+        offdiag = rows != cols
+        store.matrix[rows[offdiag], cols[offdiag]] = values[offdiag]
+        np.fill_diagonal(store.matrix, budgets)
+        return store
+
+
+class SparseEvaluationStore:
+    """
+    評価行列Eを「予算ベクトル」と「疎な他者評価行列」に分けて保持するストア。
+    N×N の密行列は一切確保しない。
+
+    「いいね」による加算は COO 形式の保留バッファに溜めておき、
+    行列が必要になった時点でまとめて CSR 行列に畳み込む。
+    lazy_decay=True の扱いは DenseEvaluationStore と同じ (実値 = offdiag_scale * 保存値)。
+    """
+
+    mode = STORAGE_SPARSE
+
+    def __init__(self, num_users: int, lazy_decay: bool = False,
+                 renormalize_threshold: float = DEFAULT_RENORMALIZE_THRESHOLD):
+        self.num_users: int = num_users
+        self.lazy_decay: bool = lazy_decay
+        self.renormalize_threshold: float = renormalize_threshold
+        self.offdiag_scale: float = 1.0
+        self.decay_epoch: int = 0
+        # 予算ベクトルも容量を倍々で確保し、budget_vector はその先頭のビューとする
+        self._budget_buffer: np.ndarray = np.ones(num_users, dtype=float)
+        self.budget_vector: np.ndarray = self._budget_buffer
+        self._offdiag = sp.csr_array((num_users, num_users), dtype=float)
+        self._pending_rows: list = []
+        self._pending_cols: list = []
+        self._pending_vals: list = []
+        self._pending_chunks: list = []  # transfer_many で受け取った (rows, cols, vals) 配列
+
+    def _fold_pending(self):
+        if not self._pending_rows and not self._pending_chunks:
+            return
+        chunks = list(self._pending_chunks)
+        if self._pending_rows:
+            chunks.append((np.asarray(self._pending_rows, dtype=np.int64),
+                           np.asarray(self._pending_cols, dtype=np.int64),
+                           np.asarray(self._pending_vals, dtype=float)))
+        rows, cols, vals = (np.concatenate(parts) for parts in zip(*chunks))
+        pending = sp.coo_array(
+            (vals, (rows, cols)), shape=(self.num_users, self.num_users))
+        self._offdiag = (self._offdiag + pending.tocsr()).tocsr()
+        self._offdiag.sum_duplicates()
+        self._pending_rows.clear()
+        self._pending_cols.clear()
+        self._pending_vals.clear()
+        self._pending_chunks.clear()
+
+    @property
+    def offdiag(self) -> sp.csr_array:
+        """対角成分を含まない他者評価の CSR 行列 (遅延モードでは offdiag_scale 倍する前の保存値)。"""
+        self._fold_pending()
+        return self._offdiag
+
+    @property
+    def nnz(self) -> int:
+        return int(self.offdiag.nnz + np.count_nonzero(self.budget_vector))
+
+    def get(self, i: int, j: int) -> float:
+        if i == j:
+            return float(self.budget_vector[i])
+        return float(self.offdiag_scale * self.offdiag[i, j])
+
+    def budget(self, i: int) -> float:
+        return float(self.budget_vector[i])
+
+    def budgets(self) -> np.ndarray:
+        return self.budget_vector.copy()
+
+    def add_users(self, count: int):
+        """予算1・評価0のユーザーを count 人、末尾に追加する。"""
+        new_size = self.num_users + count
+        if new_size > len(self._budget_buffer):
+            new_buffer = np.ones(
+                max(2 * len(self._budget_buffer), new_size), dtype=float)
+            new_buffer[:self.num_users] = self.budget_vector
+            self._budget_buffer = new_buffer
+        self._budget_buffer[self.num_users:new_size] = 1.0
+        self.budget_vector = self._budget_buffer[:new_size]
+        self._fold_pending()
+        self._offdiag.resize((new_size, new_size))
+        self.num_users = new_size
+
+    def remove_users(self, indices):
+        """
+        指定したユーザーを取り除き、空いた位置に末尾のユーザーを移す (swap-remove)。
+        取り除くユーザーが受け取っていた評価は、評価していた側の予算に戻す。O(nnz + N)。
+        """
+        offdiag = self.offdiag
+        removed = np.array(sorted(set(indices)), dtype=np.int64)
+        incoming = self.offdiag_scale * \
+            np.asarray(offdiag[:, removed].sum(axis=1)).ravel()
+        budgets = self.budget_vector + incoming
+        new_order = swap_remove_order(self.num_users, removed)
+        new_size = len(new_order)
+        self._offdiag = offdiag[new_order][:, new_order].tocsr()
+        self._budget_buffer[:new_size] = budgets[new_order]
+        self.budget_vector = self._budget_buffer[:new_size]
+        self.num_users = new_size
+
+    def transfer(self, i: int, j: int, alpha: float):
+        self.budget_vector[i] -= alpha
+        self._pending_rows.append(i)
+        self._pending_cols.append(j)
+        self._pending_vals.append(alpha / self.offdiag_scale)
+
+    def transfer_many(self, rows: np.ndarray, cols: np.ndarray, alphas: np.ndarray):
+        np.subtract.at(self.budget_vector, rows, alphas)
+        self._pending_chunks.append((np.asarray(rows, dtype=np.int64),
+                                     np.asarray(cols, dtype=np.int64),
+                                     np.asarray(alphas, dtype=float) / self.offdiag_scale))
+
+    def decay(self, gamma: float):
+        """
+        自然回収: 保存されている他者評価だけを (1 - gamma) 倍する。O(nnz + N)。
+        遅延モードでは全体倍率と予算だけを更新する (O(N))。
+        """
+        self.decay_epoch += 1
+        if self.lazy_decay:
+            self.offdiag_scale *= (1 - gamma)
+            np.subtract(1.0, (1 - gamma) * (1.0 - self.budget_vector),
+                        out=self.budget_vector)
+            if self.offdiag_scale < self.renormalize_threshold:
+                self.renormalize()
+            return
+        offdiag = self.offdiag
+        offdiag.data *= (1 - gamma)
+        np.subtract(1.0, np.asarray(offdiag.sum(axis=1)).ravel(),
+                    out=self.budget_vector)
+
+    def renormalize(self):
+        """遅延させていた自然回収の倍率を保存値に反映し、予算を行和から計算し直す。"""
+        if self.offdiag_scale == 1.0:
+            return
+        offdiag = self.offdiag
+        offdiag.data *= self.offdiag_scale
+        self.offdiag_scale = 1.0
+        np.subtract(1.0, np.asarray(offdiag.sum(axis=1)).ravel(),
+                    out=self.budget_vector)
+
+    def left_multiply_offdiag(self, c: np.ndarray) -> np.ndarray:
+        """c @ (E - diag(E)) を疎行列積で計算する。"""
+        return self.offdiag_scale * (self.offdiag.T @ c)
+
+    def offdiag_matrix(self) -> sp.csr_array:
+        """他者評価の実値を CSR 行列として返す。"""
+        return self.offdiag_scale * self.offdiag
+
+    def row_sums(self) -> np.ndarray:
+        return self.offdiag_scale * np.asarray(self.offdiag.sum(axis=1)).ravel() + self.budget_vector
+
+    def offdiag_norm(self) -> float:
+        """他者評価部分のフロベニウスノルム。"""
+        return float(self.offdiag_scale * spla.norm(self.offdiag))
+
+    def to_matrix(self) -> sp.csr_array:
+        """
+        対角に予算を載せた新しい疎行列としてEの実値を返す（密行列は作らない）。
+        遅延させていた自然回収の倍率はコピーにだけ掛け、保存値は変えない。
+        """
+        return (self.offdiag_matrix() + sp.diags_array(self.budget_vector)).tocsr()
+
+    def snapshot_arrays(self) -> dict:
+        """スナップショットに保存する配列 (予算と、他者評価の CSR 形式の3配列)。"""
+        offdiag = self.offdiag
+        return {"budgets": self.budget_vector, "offdiag_data": offdiag.data,
+                "offdiag_indices": offdiag.indices, "offdiag_indptr": offdiag.indptr}
+
+    @classmethod
+    def from_snapshot_arrays(cls, arrays: dict, lazy_decay: bool = False,
+                             offdiag_scale: float = 1.0, decay_epoch: int = 0) -> "SparseEvaluationStore":
+        """snapshot_arrays() の配列からストアを作る。"""
+        budgets = arrays["budgets"]
+        num_users = len(budgets)
+        store = cls(0, lazy_decay=lazy_decay)
+        store.num_users = num_users
+        store._budget_buffer = np.array(budgets, dtype=float)  # 予算は書き換えるのでメモリに読み込む
+        store.budget_vector = store._budget_buffer
+        store._offdiag = sp.csr_array(
+            (arrays["offdiag_data"], arrays["offdiag_indices"], arrays["offdiag_indptr"]),
+            shape=(num_users, num_users))
+        store.offdiag_scale = offdiag_scale
+        store.decay_epoch = decay_epoch
+        return store
+
+    def to_coo(self):
+        """他者評価の非ゼロ要素の実値を COO 形式 (rows, cols, values) で返す。"""
+        coo = self.offdiag.tocoo()
+        nonzero = coo.data != 0
+        return coo.row[nonzero], coo.col[nonzero], self.offdiag_scale * coo.data[nonzero]
+
+    @classmethod
+    def from_coo(cls, budgets: np.ndarray, rows: np.ndarray, cols: np.ndarray, values: np.ndarray,
+                 lazy_decay: bool = False) -> "SparseEvaluationStore":
+        """
+        予算ベクトルと他者評価の COO 形式 (rows, cols, values) からストアを作る。
+        CSR 行列は COO から一度に組み立てる (対角の要素は無視し、重複は足し合わせる)。
+        """
+        num_users = len(budgets)
+        store = cls(0, lazy_decay=lazy_decay)
+        store.num_users = num_users
+        store._budget_buffer = np.array(budgets, dtype=float)
+        store.budget_vector = store._budget_buffer
+        offdiag = rows != cols
+        store._offdiag = sp.coo_array(
+            (values[offdiag], (rows[offdiag], cols[offdiag])), shape=(num_users, num_users)).tocsr()
+        store._offdiag.sum_duplicates()
+        return store
+
+
+def swap_remove_order(num_users: int, indices) -> np.ndarray:
+    """
+    インデックスの大きい順に swap-remove (取り除く位置に末尾の要素を移す) を行ったときの、
+    新しい並びにおける各位置の元のインデックスを返す。
+    """
+    order = np.arange(num_users)
+    size = num_users
+    for r in sorted(set(indices), reverse=True):
+        size -= 1
+        order[r] = order[size]
+    return order[:size]
+
+
+class LazyStoreSummary:
+    """
+    評価行列の要約 (形状・非ゼロ要素数・行和が1でない行の数・ノルムなど)。
+    ログに渡しておくと、実際に出力されるときにだけ str() で計算される。
+    """
+
+    ROW_SUM_ATOL = 1e-8
+
+    def __init__(self, store):
+        self.store = store
+
+    def __str__(self) -> str:
+        store = self.store
+        if store.num_users == 0:
+            return "shape=(0, 0)"
+        row_sum_errors = np.abs(store.row_sums() - 1.0)
+        budgets = store.budgets()
+        return (f"shape=({store.num_users}, {store.num_users}), mode={store.mode}, nnz={store.nnz}, "
+                f"row_sum_violations={int(np.sum(row_sum_errors > self.ROW_SUM_ATOL))}, "
+                f"max_row_sum_error={np.max(row_sum_errors):.3e}, "
+                f"offdiag_norm={store.offdiag_norm():.4f}, "
+                f"budget_min={np.min(budgets):.4f}, budget_mean={np.mean(budgets):.4f}, "
+                f"offdiag_scale={store.offdiag_scale:.3e}")
+
+
+def store_class(mode: str):
+    if mode == STORAGE_DENSE:
+        return DenseEvaluationStore
+    if mode == STORAGE_SPARSE:
+        return SparseEvaluationStore
+    raise ValueError(
+        f"storageは {STORAGE_MODES} のいずれかである必要があります。: '{mode}'")
+
+
+def create_evaluation_store(mode: str, num_users: int, lazy_decay: bool = False):
+    return store_class(mode)(num_users, lazy_decay=lazy_decay)
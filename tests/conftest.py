@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from picsy_engine_prototype import PicsyEngine, PicsyUser
+
+
+def _make_users(count, start=0, username="user{}"):
+    """ユーザーID u{i}、名前 username.format(i) のユーザーを i = start, ..., start+count-1 の順に作る。"""
+    return [PicsyUser(user_id=f"u{i}", username=username.format(i)) for i in range(start, start + count)]
+
+
+def _make_engine(num_users, random_likes=0, seed=0, username="user{}", **engine_kwargs):
+    """
+    num_users 人のエンジンを作る。engine_kwargs は PicsyEngine にそのまま渡す。
+    random_likes > 0 なら、乱数 (seed) で選んだ「いいね」をその件数だけ1回のバッチで加える。
+    """
+    engine = PicsyEngine(_make_users(num_users, username=username), **engine_kwargs)
+    if random_likes > 0:
+        rng = np.random.default_rng(seed)
+        likers, creators = rng.integers(0, num_users, size=(2, random_likes))
+        engine.perform_likes_batch([f"u{i}" for i in likers], [f"u{i}" for i in creators])
+    return engine
+
+
+def _to_dense(E):
+    """評価行列 (密行列または scipy.sparse) を新しい密行列にする。"""
+    return E.toarray() if hasattr(E, "toarray") else np.array(E)
+
+
+@pytest.fixture(scope="session")
+def make_users():
+    return _make_users
+
+
+@pytest.fixture(scope="session")
+def make_engine():
+    return _make_engine
+
+
+@pytest.fixture(scope="session")
+def to_dense():
+    return _to_dense
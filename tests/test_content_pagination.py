@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.crud import crud_content
+from app.database import Base
+
+NUM_CONTENTS = 23
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=db_engine)
+    base_time = datetime(2024, 1, 1)
+    with sessionmaker(bind=db_engine)() as session:
+        session.add_all([models.User(id=i, username=f"user{i}", email=f"user{i}@example.com", hashed_password="x")
+                         for i in range(1, 4)])
+        # 4件ずつ同じ created_at にして、ページの境目が同じ時刻の途中に来るようにする
+        session.add_all([models.Content(id=i, title=f"content{i}", creator_id=1 + i % 3,
+                                        created_at=base_time + timedelta(minutes=i // 4))
+                         for i in range(1, NUM_CONTENTS + 1)])
+        session.commit()
+    yield db_engine
+    db_engine.dispose()
+
+
+def test_cursor_pages_have_no_duplicates_or_gaps_and_constant_queries(db_engine):
+    statements = []
+    event.listen(db_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    seen, queries_per_page, cursor = [], [], None
+    with sessionmaker(bind=db_engine)() as db:
+        while True:
+            statements.clear()
+            rows, cursor = crud_content.get_contents(db, limit=5, cursor=cursor)
+            creators = [row.creator.username for row in rows]  # 作成者は一覧と同じクエリで読まれている
+            queries_per_page.append(len(statements))
+            assert creators == [f"user{1 + row.id % 3}" for row in rows]
+            seen.extend(row.id for row in rows)
+            if cursor is None:
+                break
+
+    # 新しい順 (created_at, id の降順) に、全件がちょうど1回ずつ並ぶ
+    expected = sorted(range(1, NUM_CONTENTS + 1), key=lambda i: (i // 4, i), reverse=True)
+    assert seen == expected
+    assert queries_per_page == [1] * 5
+
+
+def test_invalid_cursor_is_rejected(db_engine):
+    with sessionmaker(bind=db_engine)() as db:
+        with pytest.raises(ValueError):
+            crud_content.get_contents(db, cursor="not-a-cursor")
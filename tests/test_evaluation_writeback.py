@@ -0,0 +1,130 @@
+import time
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.core import engine_provider
+from app.crud import crud_evaluation
+from app.database import Base
+from picsy_engine_prototype import PicsyEngine, PicsyUser
+
+NUM_USERS = 4
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=db_engine)
+    factory = sessionmaker(bind=db_engine)
+    with factory() as db:
+        db.add_all([models.User(id=i, username=f"user{i}", email=f"user{i}@example.com", hashed_password="x")
+                    for i in range(1, NUM_USERS + 1)])
+        db.commit()
+    yield factory
+    engine_provider.reset_engine()
+    db_engine.dispose()
+
+
+def load_engine(db):
+    user_ids = list(range(1, NUM_USERS + 1))
+    budgets, rows, cols, values, state = crud_evaluation.load_evaluations(db, user_ids)
+    users = [PicsyUser(user_id=str(user_id), username=f"user{user_id}") for user_id in user_ids]
+    return PicsyEngine.from_evaluations(users, budgets, rows, cols, values), state
+
+
+def count_rows(db, model):
+    return db.scalar(select(func.count()).select_from(model))
+
+
+def test_unchanged_engine_writes_nothing(session_factory):
+    with session_factory() as db:
+        engine, state = load_engine(db)
+        counts = crud_evaluation.write_evaluation_changes(
+            db, state, crud_evaluation.engine_evaluation_state(engine))
+        assert counts == {"evaluations_upserted": 0, "evaluations_deleted": 0,
+                          "budgets_upserted": 0, "budgets_deleted": 0}
+        assert count_rows(db, models.UserBudget) == 0
+
+
+def test_only_changed_rows_are_written_and_reload_matches(session_factory):
+    with session_factory() as db:
+        engine, state = load_engine(db)
+        engine.perform_like("1", "2")
+        current = crud_evaluation.engine_evaluation_state(engine)
+        counts = crud_evaluation.write_evaluation_changes(db, state, current)
+        assert counts == {"evaluations_upserted": 1, "evaluations_deleted": 0,
+                          "budgets_upserted": 1, "budgets_deleted": 0}
+
+        engine.perform_like("3", "2")
+        counts = crud_evaluation.write_evaluation_changes(
+            db, current, crud_evaluation.engine_evaluation_state(engine))
+        assert counts["evaluations_upserted"] == 1
+        assert counts["budgets_upserted"] == 1
+
+        reloaded, _ = load_engine(db)
+    np.testing.assert_allclose(reloaded.E, engine.E)
+
+
+def test_flusher_writes_back_while_running(session_factory):
+    with session_factory() as db:
+        with engine_provider.engine_lock:
+            engine = engine_provider.get_engine(db)
+    engine_provider.stop_evaluation_flusher()  # 既定の間隔は長いので、短い間隔のものに差し替える
+    flusher = engine_provider.EvaluationFlusher(session_factory, interval=0.01)
+    flusher.start()
+    try:
+        with engine_provider.engine_lock:
+            engine.perform_like("1", "2")
+        deadline = time.monotonic() + 5
+        with session_factory() as db:
+            while count_rows(db, models.Evaluation) == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+                db.expire_all()
+            assert count_rows(db, models.Evaluation) == 1
+            assert db.get(models.UserBudget, 1).budget == pytest.approx(engine.E[0, 0])
+    finally:
+        flusher.stop()
+
+    # 最後の書き戻し以降に評価行列が変わっていなければ、終了時の書き戻しは行を書き込まない
+    # (バックグラウンドの貢献度計算で公開番号だけが進んだ場合は、差分を取り直すだけになる)
+    with session_factory() as db:
+        assert not any(engine_provider.flush_evaluations(db).values())
+
+
+def test_other_dialects_fall_back_to_delete_and_insert(session_factory, monkeypatch):
+    with session_factory() as db:
+        engine, state = load_engine(db)
+        monkeypatch.setattr(db.get_bind().dialect, "name", "mssql")  # ON CONFLICT のないDBとして扱う
+        engine.perform_like("1", "2")
+        current = crud_evaluation.engine_evaluation_state(engine)
+        crud_evaluation.write_evaluation_changes(db, state, current)
+        engine.perform_like("1", "2")  # 既存の行を更新する
+        counts = crud_evaluation.write_evaluation_changes(
+            db, current, crud_evaluation.engine_evaluation_state(engine))
+        assert counts["evaluations_upserted"] == 1
+        assert count_rows(db, models.Evaluation) == 1
+
+        reloaded, _ = load_engine(db)
+        np.testing.assert_allclose(reloaded.E, engine.E, rtol=0, atol=1e-15)
+
+
+def test_user_ids_beyond_31_bits_round_trip(session_factory):
+    large_ids = [2 ** 31 + 1, 2 ** 32 - 1]
+    empty = crud_evaluation._sorted_state(np.empty(0), np.empty(0), [], [], [])
+    current = crud_evaluation._sorted_state(np.array(large_ids), np.array(large_ids[::-1]), [0.1, 0.2],
+                                            large_ids, [0.9, 0.8])
+    with session_factory() as db:
+        crud_evaluation.write_evaluation_changes(db, empty, current)
+        rows = db.execute(select(models.Evaluation.from_user_id, models.Evaluation.to_user_id,
+                                 models.Evaluation.value).order_by(models.Evaluation.from_user_id)).all()
+        assert [tuple(row) for row in rows] == [(large_ids[0], large_ids[1], 0.1), (large_ids[1], large_ids[0], 0.2)]
+
+        # 削除も同じキーから元のIDに戻して行う
+        crud_evaluation.write_evaluation_changes(db, current, empty)
+        assert count_rows(db, models.Evaluation) == 0
+
+    with pytest.raises(ValueError):
+        crud_evaluation._sorted_state(np.array([2 ** 32]), np.array([1]), [0.1], [1], [1.0])
@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+
+def test_skipped_solve_still_publishes_budgets(make_engine):
+    engine = make_engine(50, contribution_update="incremental", perturbation_bound=1e-2)
+    c_before = engine.published.c_vector
+    ranking_before = engine.published.ranking
+    solves_before = engine.last_solver_result
+
+    engine.perform_like("u0", "u1")
+    assert engine.last_solver_result is solves_before  # 再計算は省略されている
+    assert engine.get_user_budget("u0") == pytest.approx(0.95)
+    assert engine.get_user_status("u0")["budget"] == pytest.approx(0.95)
+    assert engine.get_user_purchasing_power("u0") == pytest.approx(0.95 * c_before[0])
+    assert engine.get_status_many(["u0", "u1"])[1]["budget"] == pytest.approx(1.0)
+    # 貢献度と順位は前回のものを使い回す
+    np.testing.assert_array_equal(engine.published.c_vector, c_before)
+    assert engine.published.ranking is ranking_before
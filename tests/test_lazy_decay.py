@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+NUM_USERS = 8
+
+
+def drive(engine, num_rounds=150):
+    """「いいね」と自然回収を交互に繰り返す (遅延モードでは途中で倍率が閾値を下回る)。"""
+    rng = np.random.default_rng(0)
+    for _ in range(num_rounds):
+        likers, creators = rng.integers(0, NUM_USERS, size=(2, 3))
+        engine.perform_likes_batch([f"u{i}" for i in likers], [f"u{i}" for i in creators])
+        engine.perform_natural_recovery()
+
+
+@pytest.mark.parametrize("storage", ["dense", "sparse"])
+def test_lazy_decay_matches_eager_recovery(storage, make_engine, to_dense):
+    eager, lazy = (make_engine(NUM_USERS, storage=storage, lazy_decay=lazy_decay, gamma_rate=0.1)
+                   for lazy_decay in (False, True))
+    drive(eager)
+    drive(lazy)
+    assert lazy.decay_epoch == eager.decay_epoch == 150
+    np.testing.assert_allclose(to_dense(lazy.E), to_dense(eager.E), rtol=0, atol=1e-15)
+    np.testing.assert_allclose(lazy._store.budgets(), eager._store.budgets(), rtol=0, atol=1e-15)
+    np.testing.assert_allclose(lazy.c_vector, eager.c_vector, rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize("storage", ["dense", "sparse"])
+def test_reading_E_does_not_renormalize(storage, make_engine, to_dense):
+    engine = make_engine(NUM_USERS, storage=storage, lazy_decay=True, gamma_rate=0.1)
+    engine.perform_like("u0", "u1")
+    engine.perform_natural_recovery()
+    scale = engine._store.offdiag_scale
+    assert scale == pytest.approx(0.9)
+
+    E = to_dense(engine.E)
+    assert engine._store.offdiag_scale == scale  # 読むだけでは保存値を書き換えない
+    assert E[0, 1] == pytest.approx(0.9 * engine.get_user_alpha_like("u0"))
+    np.testing.assert_allclose(E.sum(axis=1), 1.0, rtol=0, atol=1e-15)
+    E[0, 1] = 0.0  # コピーなので、書き換えてもエンジンには影響しない
+    assert to_dense(engine.E)[0, 1] == pytest.approx(0.9 * engine.get_user_alpha_like("u0"))
+
+    engine.renormalize_evaluations()
+    assert engine._store.offdiag_scale == 1.0
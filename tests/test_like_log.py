@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from picsy_like_log import LIKE_LOG_SPILL, LikeLog
+
+
+def append_range(log, start, stop):
+    """liker=i, liked=i+1, alpha=i/100, timestamp_ns=i の記録を1件ずつ追加する。"""
+    for i in range(start, stop):
+        log.append(i, i + 1, i / 100, timestamp_ns=i)
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_ring_keeps_the_latest_records(batch):
+    log = LikeLog(capacity=4)
+    if batch:
+        append_range(log, 0, 3)
+        stamps = np.arange(3, 10)
+        log.append_many(stamps, stamps + 1, stamps / 100, stamps)
+    else:
+        append_range(log, 0, 10)
+
+    assert len(log) == 10
+    assert log.dropped == 6
+    records = log.tail(10)
+    np.testing.assert_array_equal(records["timestamp_ns"], [6, 7, 8, 9])
+    np.testing.assert_array_equal(records["liker"], [6, 7, 8, 9])
+    np.testing.assert_array_equal(records["liked"], [7, 8, 9, 10])
+    np.testing.assert_allclose(records["alpha"], [0.06, 0.07, 0.08, 0.09], rtol=1e-6)
+    np.testing.assert_array_equal(log.tail(2)["timestamp_ns"], [8, 9])
+
+
+def test_spill_writes_full_blocks_to_disk(tmp_path):
+    log = LikeLog(capacity=4, retention=LIKE_LOG_SPILL, spill_path=str(tmp_path / "likes.bin"))
+    append_range(log, 0, 5)
+    stamps = np.arange(5, 11)
+    log.append_many(stamps, stamps + 1, stamps / 100, stamps)
+
+    assert len(log) == 11
+    assert log.spilled == 8
+    assert log.dropped == 0
+    np.testing.assert_array_equal(log.read_spilled()["timestamp_ns"], np.arange(8))
+    np.testing.assert_array_equal(log.read_spilled(mmap=False)["liked"], np.arange(1, 9))
+    np.testing.assert_array_equal(log.tail(10)["timestamp_ns"], [8, 9, 10])
+
+
+@pytest.mark.parametrize("retention", ["ring", "spill"])
+def test_restore_state_after_snapshot(retention, tmp_path):
+    spill_path = str(tmp_path / "likes.bin")
+    log = LikeLog(capacity=4, retention=retention, spill_path=spill_path)
+    for user_id in ("a", "b", "c"):
+        log.user_key(user_id)
+    append_range(log, 0, 6)
+    records, state = log.snapshot_state()
+
+    restored = LikeLog(state["capacity"], state["retention"], state["spill_path"])
+    restored.restore_state(records, state)
+    assert (len(restored), restored.dropped, restored.spilled) == (len(log), log.dropped, log.spilled)
+    assert [restored.user_id(key) for key in range(3)] == ["a", "b", "c"]
+    np.testing.assert_array_equal(restored.tail(10), log.tail(10))
+
+    # 読み戻したログに続けて追加しても、元のログと同じ結果になる
+    for target in (log, restored):
+        append_range(target, 6, 9)
+    np.testing.assert_array_equal(restored.tail(10), log.tail(10))
+    assert restored.user_key("d") == log.user_key("d") == 3
+
+
+def test_names_resolve_after_user_is_removed(capsys, make_engine):
+    engine = make_engine(4)
+    engine.perform_like("u0", "u1")
+    engine.perform_like("u3", "u1")
+    engine.remove_users(["u0"])  # u3 が u0 の位置 (インデックス0) に移る
+    engine.perform_like("u3", "u2")
+
+    records = engine.like_log.tail(10)
+    assert [(engine.like_log.user_id(r["liker"]), engine.like_log.user_id(r["liked"])) for r in records] \
+        == [("u0", "u1"), ("u3", "u1"), ("u3", "u2")]
+
+    capsys.readouterr()
+    engine.display_like_log()
+    lines = capsys.readouterr().out.splitlines()
+    assert "(退会済み) (u0) -> user1 (u1)" in lines[-1]
+    assert "user3 (u3) -> user1 (u1)" in lines[-2]
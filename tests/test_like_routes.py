@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+from app.core import engine_provider
+from app.core.token_cache import AuthenticatedUser
+from app.database import Base
+from app.routers.contents import like_content
+from app.routers.likes import like_contents_batch
+
+
+@pytest.fixture
+def db(tmp_path):
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=db_engine)
+    with sessionmaker(bind=db_engine)() as session:
+        session.add_all([models.User(id=i, username=f"user{i}", email=f"user{i}@example.com", hashed_password="x")
+                         for i in (1, 2)])
+        session.add_all([models.Content(id=10, title="by user2", creator_id=2),
+                         models.Content(id=11, title="by user1", creator_id=1)])
+        session.commit()
+        yield session
+    engine_provider.reset_engine()
+    db_engine.dispose()
+
+
+def liker():
+    return AuthenticatedUser(id=1, username="user1", email="user1@example.com")
+
+
+def spent(db):
+    with engine_provider.engine_lock:
+        budgets = engine_provider.get_engine(db).export_evaluations()[0]
+    return 1.0 - budgets[0]
+
+
+def count_likes(db):
+    return db.scalar(select(func.count()).select_from(models.Like))
+
+
+def fail_commit(*args, **kwargs):
+    raise OperationalError("INSERT INTO likes", {}, Exception("database is locked"))
+
+
+def test_like_is_recorded_and_applied(db):
+    db_like = like_content(10, db=db, current_user=liker())
+    assert db_like.accepted
+    assert spent(db) == pytest.approx(db_like.alpha_used)
+
+    result = like_contents_batch(schemas.LikeBatchCreate(content_ids=[10, 11, 999]), db=db, current_user=liker())
+    assert result["results"] == [True, False, False]
+    assert count_likes(db) == 3  # 存在しないコンテンツの「いいね」は記録しない
+    assert spent(db) == pytest.approx(2 * db_like.alpha_used)
+
+
+def test_failed_db_write_leaves_engine_unchanged(db, monkeypatch):
+    like_content(10, db=db, current_user=liker())
+    before = spent(db)
+
+    monkeypatch.setattr(crud.crud_like, "create_like", fail_commit)
+    with pytest.raises(OperationalError):
+        like_content(10, db=db, current_user=liker())
+    monkeypatch.setattr(crud.crud_like, "create_likes_bulk", fail_commit)
+    with pytest.raises(OperationalError):
+        like_contents_batch(schemas.LikeBatchCreate(content_ids=[10, 10]), db=db, current_user=liker())
+
+    assert spent(db) == pytest.approx(before)
+    assert count_likes(db) == 1
+    with engine_provider.engine_lock:
+        assert engine_provider.get_engine(db)._reserved_budget == {}  # 予約は取り消されている
+
+
+def test_db_write_runs_without_engine_lock(db, monkeypatch):
+    create_like = crud.crud_like.create_like
+    lock_free = []
+
+    def create_like_checking_lock(*args, **kwargs):
+        # 別スレッドから engine_lock を取れるなら、DBへの書き込み中にロックを持っていない
+        thread = threading.Thread(target=lambda: lock_free.append(_try_lock()))
+        thread.start()
+        thread.join()
+        return create_like(*args, **kwargs)
+
+    monkeypatch.setattr(crud.crud_like, "create_like", create_like_checking_lock)
+    assert like_content(10, db=db, current_user=liker()).accepted
+    assert lock_free == [True]
+
+
+def _try_lock():
+    if not engine_provider.engine_lock.acquire(timeout=1.0):
+        return False
+    engine_provider.engine_lock.release()
+    return True
+
+
+def test_reserved_budget_is_not_spent_twice(db):
+    with engine_provider.engine_lock:
+        engine = engine_provider.get_engine(db)
+        alpha = engine.get_user_alpha_like("1")
+        num_affordable = int(1.0 / alpha + 1e-9)
+        accepted, _ = engine.reserve_likes("1", ["2"] * num_affordable)
+        assert accepted.all()
+        # 予約で予算を使い切っているので、予約中の「いいね」は成功しない
+        assert not engine.perform_like("1", "2")
+        assert not engine.reserve_likes("1", ["2"])[0].any()
+        engine.apply_reserved_likes("1", ["2"] * num_affordable, alpha)
+        assert engine._reserved_budget == {}
+    assert spent(db) == pytest.approx(num_affordable * alpha)
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+NUM_USERS = 6
+ENGINE_KWARGS = {"random_likes": 40, "tolerance": 1e-13, "max_iterations": 1000}
+
+
+def capacity(store):
+    return store.capacity if hasattr(store, "capacity") else len(store._budget_buffer)
+
+
+def record_warm_start(engine, monkeypatch):
+    """ユーザー増減後の再計算に渡された初期値を記録する。"""
+    warm_starts = []
+    calculate = engine._calculate_contribution_vector
+
+    def recording(*args, initial_c=None, **kwargs):
+        warm_starts.append(None if initial_c is None else np.array(initial_c))
+        return calculate(*args, initial_c=initial_c, **kwargs)
+
+    monkeypatch.setattr(engine, "_calculate_contribution_vector", recording)
+    return warm_starts
+
+
+def assert_consistent(engine, E):
+    """対応表が users の並びと一致し、評価行列 E (密行列にしたもの) の行和が1であることを確かめる。"""
+    assert len(engine.users) == engine.num_users
+    for idx, user in enumerate(engine.users):
+        assert engine.user_id_to_index[user.user_id] == idx
+        assert engine.user_index_to_id[idx] == user.user_id
+        assert engine.user_index_to_name[idx] == user.username
+    assert len(engine.user_id_to_index) == engine.num_users
+    assert E.shape == (engine.num_users, engine.num_users)
+    np.testing.assert_allclose(E.sum(axis=1), 1.0, rtol=0, atol=1e-12)
+    assert engine.published.user_ids == tuple(user.user_id for user in engine.users)
+
+
+def expected_after_removal(E, removed, new_order):
+    """取り除くユーザーが受け取っていた評価を、評価していた側の予算に戻してから並べ替えた E。"""
+    E = E.copy()
+    for k in range(len(E)):
+        if k not in removed:
+            E[k, k] += E[k, removed].sum()
+    return E[np.ix_(new_order, new_order)]
+
+
+@pytest.mark.parametrize("storage", ["dense", "sparse"])
+@pytest.mark.parametrize("removed_id, expected_ids", [
+    ("u2", ["u0", "u1", "u5", "u3", "u4"]),  # 途中のユーザーの位置には末尾のユーザーが移る
+    ("u5", ["u0", "u1", "u2", "u3", "u4"]),  # 末尾のユーザーなら他は動かない
+])
+def test_remove_user(storage, removed_id, expected_ids, monkeypatch, make_engine, to_dense):
+    engine = make_engine(NUM_USERS, storage=storage, **ENGINE_KWARGS)
+    E_before = to_dense(engine.E)
+    c_before = engine.c_vector.copy()
+    warm_starts = record_warm_start(engine, monkeypatch)
+
+    engine.remove_users([removed_id])
+
+    assert [user.user_id for user in engine.users] == expected_ids
+    assert removed_id not in engine.user_id_to_index
+    assert_consistent(engine, to_dense(engine.E))
+    new_order = [int(user_id[1:]) for user_id in expected_ids]
+    np.testing.assert_allclose(to_dense(engine.E),
+                               expected_after_removal(E_before, [int(removed_id[1:])], new_order),
+                               rtol=0, atol=1e-15)
+    # 残ったユーザーの貢献度を合計Nに正規化し直したものから計算し直す
+    warm_start = c_before[new_order]
+    np.testing.assert_allclose(warm_starts[0], warm_start * (len(new_order) / warm_start.sum()))
+    assert np.sum(engine.c_vector) == pytest.approx(len(new_order))
+
+
+@pytest.mark.parametrize("storage", ["dense", "sparse"])
+def test_add_users_grows_past_capacity(storage, monkeypatch, make_users, make_engine, to_dense):
+    engine = make_engine(NUM_USERS, storage=storage, **ENGINE_KWARGS)
+    E_before = to_dense(engine.E)
+    c_before = engine.c_vector.copy()
+    assert capacity(engine._store) == NUM_USERS
+    warm_starts = record_warm_start(engine, monkeypatch)
+
+    engine.add_users(make_users(1, start=NUM_USERS))
+    assert capacity(engine._store) == 2 * NUM_USERS  # 容量は2倍に広げる
+    np.testing.assert_allclose(warm_starts[0], np.r_[c_before, 1.0])
+
+    engine.add_users(make_users(NUM_USERS - 1, start=NUM_USERS + 1))
+    assert capacity(engine._store) == 2 * NUM_USERS  # 容量内なら広げ直さない
+    engine.add_users(make_users(1, start=2 * NUM_USERS))
+    assert capacity(engine._store) == 4 * NUM_USERS
+
+    assert_consistent(engine, to_dense(engine.E))
+    E = to_dense(engine.E)
+    np.testing.assert_array_equal(E[:NUM_USERS, :NUM_USERS], E_before)
+    np.testing.assert_array_equal(E[NUM_USERS:, :], np.eye(2 * NUM_USERS + 1)[NUM_USERS:])
+    np.testing.assert_array_equal(E[:NUM_USERS, NUM_USERS:], 0.0)
+
+    # 追加したユーザーにも「いいね」でき、取り除いても行和は1のまま
+    assert engine.perform_like(f"u{2 * NUM_USERS}", "u0")
+    engine.remove_users(["u0", f"u{NUM_USERS}"])
+    assert_consistent(engine, to_dense(engine.E))
@@ -0,0 +1,94 @@
+import time
+
+import numpy as np
+import pytest
+
+import picsy_engine_prototype
+from picsy_scheduler import ContributionScheduler
+from picsy_solvers import SolverResult
+
+
+NUM_USERS = 5
+
+
+class FailingSolve:
+    """最初の failures 回だけ失敗する calculate_all_contributions。"""
+
+    def __init__(self, engine, failures):
+        self.solve = engine.calculate_all_contributions
+        self.failures = failures
+
+    def __call__(self):
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError("solve failed")
+        return self.solve()
+
+
+def test_wait_for_fresh_publishes_the_latest_likes(make_engine):
+    engine = make_engine(NUM_USERS)
+    with ContributionScheduler(engine, debounce=0.01) as scheduler:
+        engine.perform_like("u0", "u1")
+        assert scheduler.dirty
+        assert scheduler.wait_for_fresh(timeout=5)
+        assert not scheduler.dirty
+        assert scheduler.staleness() == 0.0
+        assert scheduler.solve_count >= 1
+        assert engine.published.c_vector[1] > engine.published.c_vector[2]
+
+
+def test_failed_solve_is_not_reported_as_fresh(monkeypatch, make_engine):
+    engine = make_engine(NUM_USERS)
+    scheduler = ContributionScheduler(engine)
+    monkeypatch.setattr(engine, "calculate_all_contributions", FailingSolve(engine, failures=1))
+    engine.perform_like("u0", "u1")
+
+    assert not scheduler.wait_for_fresh()
+    assert scheduler.dirty
+    assert scheduler.staleness() > 0.0
+    assert isinstance(scheduler.last_error, RuntimeError)
+    assert scheduler.solve_count == 0
+
+    assert scheduler.wait_for_fresh()
+    assert not scheduler.dirty
+    assert scheduler.last_error is None
+    assert scheduler.solve_count == 1
+
+
+def test_nan_solve_is_not_reported_as_fresh(monkeypatch, make_engine):
+    engine = make_engine(NUM_USERS)
+    scheduler = ContributionScheduler(engine)
+
+    def nan_solver(problem, max_iterations, tolerance, **kwargs):
+        return SolverResult(np.full(problem.num_users, np.nan), "power", 0, np.nan, False)
+
+    monkeypatch.setattr(picsy_engine_prototype, "get_contribution_solver", lambda name: nan_solver)
+    engine.perform_like("u0", "u1")
+    assert not scheduler.wait_for_fresh()
+    assert scheduler.dirty
+    assert isinstance(scheduler.last_error, FloatingPointError)
+    assert scheduler.solve_count == 0
+
+    monkeypatch.undo()
+    assert scheduler.wait_for_fresh()
+    assert np.all(np.isfinite(engine.published.c_vector))
+    assert scheduler.solve_count == 1
+
+
+def test_background_thread_retries_after_a_failed_solve(monkeypatch, caplog, make_engine):
+    engine = make_engine(NUM_USERS)
+    monkeypatch.setattr(engine, "calculate_all_contributions", FailingSolve(engine, failures=2))
+    with ContributionScheduler(engine, debounce=0.0, retry_delay=0.01) as scheduler:
+        engine.perform_like("u0", "u1")
+        deadline = time.monotonic() + 5
+        while scheduler.dirty and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not scheduler.dirty
+        assert scheduler.solve_count == 1
+    assert sum("失敗しました" in record.getMessage() for record in caplog.records) == 2
+
+
+@pytest.mark.parametrize("kwargs", [{"retry_delay": -1}, {"interval": 0}])
+def test_rejects_invalid_timings(kwargs, make_engine):
+    with pytest.raises(ValueError):
+        ContributionScheduler(make_engine(NUM_USERS), **kwargs)
@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from picsy_engine_prototype import DEFAULT_ALPHA_LIKE
+from picsy_sharding import EngineManager
+
+NUM_USERS = 20
+
+
+def total_spent(manager, community_id):
+    statuses = manager.get_status_many(community_id, [f"u{i}" for i in range(NUM_USERS)])
+    return sum(1.0 - status["budget"] for status in statuses)
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_calls_are_routed_to_the_owning_worker(tmp_path, num_workers, make_users):
+    with EngineManager(num_workers=num_workers, snapshot_dir=str(tmp_path)) as manager:
+        manager.create_community("c1", make_users(NUM_USERS))
+        assert manager.perform_like("c1", "u0", "u1")
+        assert manager.get_user_status("c1", "u0")["budget"] == pytest.approx(1.0 - DEFAULT_ALPHA_LIKE)
+        with pytest.raises(KeyError):
+            manager.perform_like("missing", "u0", "u1")
+
+
+def test_likes_sent_during_moves_are_not_lost(tmp_path, make_users):
+    likes_per_thread = 30
+    num_threads = 4
+    with EngineManager(num_workers=2, snapshot_dir=str(tmp_path)) as manager:
+        manager.create_community("c1", make_users(NUM_USERS))
+        errors = []
+        accepted = []
+
+        def send_likes(thread_idx):
+            try:
+                for k in range(likes_per_thread):
+                    liker = (thread_idx * likes_per_thread + k) % NUM_USERS
+                    accepted.append(manager.perform_like("c1", f"u{liker}", f"u{(liker + 1) % NUM_USERS}"))
+            except Exception as e:  # noqa: BLE001  スレッドの例外は本体で確かめる
+                errors.append(e)
+
+        threads = [threading.Thread(target=send_likes, args=(i,)) for i in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        moves = 0
+        while any(thread.is_alive() for thread in threads):
+            manager.move_community("c1", 1 - manager.worker_for("c1"))
+            moves += 1
+        for thread in threads:
+            thread.join()
+
+        assert not errors
+        assert moves > 0
+        assert len(accepted) == likes_per_thread * num_threads
+        assert all(accepted)
+        # 受け付けられた「いいね」が全て、最終的なワーカーのエンジンに反映されている
+        assert total_spent(manager, "c1") == pytest.approx(DEFAULT_ALPHA_LIKE * len(accepted))
+
+
+def test_drop_waits_for_moves_and_rejects_later_calls(tmp_path, make_users):
+    with EngineManager(num_workers=2, snapshot_dir=str(tmp_path)) as manager:
+        manager.create_community("c1", make_users(NUM_USERS))
+        manager.move_community("c1", 1 - manager.worker_for("c1"))
+        manager.drop_community("c1")
+        assert "c1" not in manager.communities()
+        with pytest.raises(KeyError):
+            manager.get_user_status("c1", "u0")
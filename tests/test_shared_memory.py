@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import pytest
+
+from picsy_shared_memory import SharedEngineReader, SharedEngineWriter, SharedMemoryError
+
+
+@pytest.fixture
+def name():
+    return f"picsy_test_{os.getpid()}"
+
+
+@pytest.mark.parametrize("storage", ["dense", "sparse"])
+def test_reader_sees_results_and_matrix(name, storage, make_engine, to_dense):
+    engine = make_engine(4, storage=storage)
+    with SharedEngineWriter(name, matrix_interval=0) as writer, SharedEngineReader(name) as reader:
+        engine.attach_shared_memory(writer)
+        engine.perform_like("u0", "u1")
+        engine.calculate_all_contributions()
+        view = reader.current()
+        assert view.published.version == engine.published.version
+        np.testing.assert_allclose(view.published.c_vector, engine.published.c_vector)
+        assert view.matrix_version == engine.published.version
+        np.testing.assert_allclose(to_dense(view.E), to_dense(engine.E))
+
+
+def test_matrix_is_published_only_on_demand(name, make_engine):
+    engine = make_engine(4)
+    with SharedEngineWriter(name, matrix_interval=None) as writer, SharedEngineReader(name) as reader:
+        engine.attach_shared_memory(writer)
+        with pytest.raises(SharedMemoryError):
+            reader.current().E
+        engine.perform_like("u0", "u1")
+        engine.calculate_all_contributions()
+        assert writer.matrix.seq == 0  # 計算のたびに評価行列はコピーしない
+
+        engine.publish_shared_matrix()
+        view = reader.current()
+        assert view.matrix_version == engine.published.version
+        np.testing.assert_allclose(view.E, engine.E)
+
+        engine.perform_like("u2", "u3")
+        engine.calculate_all_contributions()
+        view = reader.current()
+        assert view.published.version > view.matrix_version
+        assert writer.matrix.seq == 2
@@ -0,0 +1,99 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from picsy_engine_prototype import PicsyEngine
+from picsy_journal import JOURNAL_PAYLOAD, JOURNAL_USERS_ADDED, LikeJournal, read_journal
+from picsy_snapshot import read_snapshot, write_snapshot
+
+
+USERNAME = "ユーザー{}"  # 名前が UTF-8 の複数バイトになる場合もジャーナルから読み戻せることを確かめる
+
+
+def drive(engine, make_users):
+    """ジャーナルに残るいろいろな種類の変更を加える。"""
+    engine.perform_like("u0", "u1")
+    engine.perform_likes_batch(["u1", "u2", "u2"], ["u2", "u0", "u3"])
+    engine.set_gamma_rate(0.2)
+    engine.perform_natural_recovery()
+    engine.add_users(make_users(2, start=4, username=USERNAME))
+    engine.perform_like("u5", "u0")
+    engine.remove_users(["u3"])
+    engine.perform_like("u4", "u1")
+
+
+@pytest.mark.parametrize("storage", ["dense", "sparse"])
+def test_replaying_the_journal_reproduces_the_engine(tmp_path, storage, make_users, make_engine, to_dense):
+    path = str(tmp_path / "likes.journal")
+    engine = make_engine(4, username=USERNAME, storage=storage)
+    with LikeJournal(path, fsync_interval=None) as journal:
+        engine.attach_journal(journal)
+        drive(engine, make_users)
+
+    replayed = make_engine(4, username=USERNAME, storage=storage)
+    replayed.replay_journal(path)
+    assert [user.user_id for user in replayed.users] == [user.user_id for user in engine.users]
+    assert [user.username for user in replayed.users] == [user.username for user in engine.users]
+    assert replayed.gamma_rate == engine.gamma_rate
+    np.testing.assert_allclose(to_dense(replayed.E), to_dense(engine.E), atol=1e-12)
+    np.testing.assert_allclose(replayed.c_vector, engine.c_vector, atol=1e-8)
+
+
+def test_payload_records_are_tagged(tmp_path):
+    path = str(tmp_path / "likes.journal")
+    with LikeJournal(path, fsync_interval=None) as journal:
+        journal.append_users_added([(f"u{i}", "長い名前" * 5) for i in range(3)])
+    records = read_journal(path)
+    assert records[0]["kind"] == JOURNAL_USERS_ADDED
+    assert len(records) == 1 + records[0]["b"]
+    assert np.all(records[1:]["kind"] == JOURNAL_PAYLOAD)
+
+
+def test_buffered_records_are_flushed_without_further_appends(tmp_path):
+    path = str(tmp_path / "likes.journal")
+    with LikeJournal(path, fsync_interval=0.2) as journal:
+        journal.append_like(0, 1, 0.05)
+        assert len(read_journal(path)) == 0  # まだバッファの中
+        deadline = time.monotonic() + 5
+        while len(read_journal(path)) == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(read_journal(path)) == 1
+
+
+@pytest.mark.parametrize("storage", ["dense", "sparse"])
+def test_snapshot_round_trip_and_restore(tmp_path, storage, make_users, make_engine, to_dense):
+    snapshot_path = str(tmp_path / "snapshot")
+    engine = make_engine(4, username=USERNAME, storage=storage)
+    with LikeJournal(str(tmp_path / "likes.journal"), fsync_interval=None) as journal:
+        engine.attach_journal(journal)
+        engine.perform_like("u0", "u1")
+        engine.save_snapshot(snapshot_path)
+
+        loaded = PicsyEngine.from_snapshot(snapshot_path)
+        np.testing.assert_array_equal(to_dense(loaded.E), to_dense(engine.E))
+        np.testing.assert_array_equal(loaded.c_vector, engine.c_vector)
+
+        drive(engine, make_users)
+    restored = PicsyEngine.restore(snapshot_path)
+    assert [user.user_id for user in restored.users] == [user.user_id for user in engine.users]
+    np.testing.assert_allclose(to_dense(restored.E), to_dense(engine.E), atol=1e-12)
+
+
+def test_snapshot_swap_keeps_the_previous_version_until_the_link_moves(tmp_path, monkeypatch):
+    snapshot_path = str(tmp_path / "snapshot")
+    write_snapshot(snapshot_path, {"n": 1}, {"x": np.arange(3)})
+    write_snapshot(snapshot_path, {"n": 2}, {"x": np.arange(4)})
+    assert os.path.islink(snapshot_path)
+    assert len([name for name in os.listdir(tmp_path) if name.startswith("snapshot.v-")]) == 1
+
+    def crash(src, dst):  # リンクを差し替える直前に落ちたことにする
+        raise OSError("crash")
+
+    monkeypatch.setattr(os, "replace", crash)
+    with pytest.raises(OSError):
+        write_snapshot(snapshot_path, {"n": 3}, {"x": np.arange(5)})
+    metadata, arrays = read_snapshot(snapshot_path)
+    assert metadata == {"n": 2}
+    np.testing.assert_array_equal(arrays["x"], np.arange(4))
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from picsy_solvers import CONTRIBUTION_SOLVERS, ContributionProblem, solve_eigs, solve_linear
+
+NUM_USERS = 30
+
+
+def solved_engine(make_engine, storage, solver):
+    engine = make_engine(NUM_USERS, random_likes=200, storage=storage, solver=solver,
+                         tolerance=1e-13, max_iterations=1000)
+    engine.calculate_all_contributions()
+    return engine
+
+
+@pytest.fixture(scope="module")
+def contributions(make_engine):
+    return {(storage, solver): solved_engine(make_engine, storage, solver)
+            for storage in ("dense", "sparse") for solver in CONTRIBUTION_SOLVERS}
+
+
+@pytest.mark.parametrize("storage", ["dense", "sparse"])
+@pytest.mark.parametrize("solver", sorted(CONTRIBUTION_SOLVERS))
+def test_solvers_agree(contributions, storage, solver):
+    engine = contributions[(storage, solver)]
+    reference = contributions[(storage, "linear")]
+    assert engine.last_solver_result.converged
+    assert engine.last_solver_result.solver == solver
+    assert np.sum(engine.c_vector) == pytest.approx(NUM_USERS)
+    np.testing.assert_allclose(engine.c_vector, reference.c_vector, rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize("solver", sorted(CONTRIBUTION_SOLVERS))
+def test_dense_and_sparse_storage_agree(contributions, solver, to_dense):
+    dense, sparse = contributions[("dense", solver)], contributions[("sparse", solver)]
+    np.testing.assert_allclose(to_dense(sparse.E), dense.E, rtol=0, atol=1e-15)
+    np.testing.assert_allclose(sparse.c_vector, dense.c_vector, rtol=0, atol=1e-12)
+
+
+def test_eigs_iteration_budget_does_not_scale_with_users():
+    rng = np.random.default_rng(1)
+    for num_users in (50, 400):
+        E_prime = rng.random((num_users, num_users))
+        E_prime /= E_prime.sum(axis=1, keepdims=True)
+        result = solve_eigs(ContributionProblem.from_E_prime(E_prime), max_iterations=1, tolerance=1e-14)
+        assert result.iterations <= 2 * 20  # 再始動1回分 (ncv 回) 程度で打ち切られる
+
+
+def test_linear_solver_rejects_explicit_E_prime(make_engine):
+    engine = solved_engine(make_engine, "dense", "linear")
+    with pytest.raises(ValueError):
+        solve_linear(ContributionProblem.from_E_prime(engine.E_prime), 100, 1e-10)
+    # エンジンは E' をそのまま渡されたときは反復法で解く
+    c_vector = engine._calculate_contribution_vector(E_prime_matrix=engine.E_prime)
+    np.testing.assert_allclose(c_vector, engine.c_vector, rtol=0, atol=1e-10)
+
+
+@pytest.mark.parametrize("solver", ["eigs", "linear"])
+def test_unconverged_result_is_reported(solver, caplog, make_engine):
+    engine = solved_engine(make_engine, "sparse", solver)
+    engine.tolerance = 0.0  # 残差は0にはならないので、収束しなかったことになる
+    with caplog.at_level("WARNING", logger="picsy_engine_prototype"):
+        engine.calculate_all_contributions()
+    result = engine.last_solver_result
+    assert not result.converged
+    assert "許容誤差" in result.message
+    assert any(result.message in record.getMessage() for record in caplog.records)
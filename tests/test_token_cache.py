@@ -0,0 +1,94 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.core.token_cache import AuthenticatedUser, TokenCache, token_cache
+from app.database import Base
+
+
+def user(user_id):
+    return AuthenticatedUser(id=user_id, username=f"user{user_id}", email=f"user{user_id}@example.com")
+
+
+def test_entries_expire_after_ttl_or_token_exp():
+    cache = TokenCache(ttl_seconds=0.05)
+    cache.put("short", user(1))
+    cache.put("expired", user(1), token_expires_at=time.time() - 1)  # 期限切れのトークンは登録しない
+    cache.put("exp", user(2), token_expires_at=time.time() + 0.05)
+    assert cache.get("short") == user(1)
+    assert cache.get("expired") is None
+    time.sleep(0.1)
+    assert cache.get("short") is None
+    assert cache.get("exp") is None
+    assert cache.stats()["expirations"] == 2
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TokenCache(max_entries=2)
+    cache.put("a", user(1))
+    cache.put("b", user(2))
+    assert cache.get("a") == user(1)  # a を使ったので、次に捨てられるのは b
+    cache.put("c", user(3))
+    assert cache.get("b") is None
+    assert cache.get("a") == user(1)
+    assert cache.get("c") == user(3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_user_removes_all_their_tokens():
+    cache = TokenCache()
+    cache.put("a1", user(1))
+    cache.put("a2", user(1))
+    cache.put("b", user(2))
+    cache.invalidate_user(1)
+    assert cache.get("a1") is None
+    assert cache.get("a2") is None
+    assert cache.get("b") == user(2)
+    assert cache.stats()["invalidations"] == 2
+
+
+@pytest.fixture
+def db(tmp_path):
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=db_engine)
+    with sessionmaker(bind=db_engine)() as session:
+        session.add_all([models.User(id=i, username=f"user{i}", email=f"user{i}@example.com", hashed_password="x")
+                         for i in (1, 2)])
+        session.commit()
+        yield session
+    token_cache.clear()
+    db_engine.dispose()
+
+
+def test_user_update_and_delete_invalidate_cached_tokens(db):
+    token_cache.put("token1", user(1))
+    token_cache.put("token2", user(2))
+
+    db.get(models.User, 1).username = "renamed"
+    db.commit()
+    assert token_cache.get("token1") is None
+    assert token_cache.get("token2") == user(2)
+
+    db.delete(db.get(models.User, 2))
+    db.commit()
+    assert token_cache.get("token2") is None
+
+
+def test_bulk_update_clears_the_cache(db):
+    token_cache.put("token1", user(1))
+    db.query(models.User).filter(models.User.id == 1).update({"username": "renamed"})
+    db.commit()
+    assert token_cache.get("token1") is None
+
+    token_cache.put("token2", user(2))
+    db.execute(update(models.User).where(models.User.id == 2).values(email="new@example.com"))
+    db.commit()
+    assert token_cache.get("token2") is None
+
+    token_cache.put("token1", user(1))
+    db.query(models.Content).filter(models.Content.id == 1).update({"title": "x"})  # User 以外は消さない
+    assert token_cache.get("token1") == user(1)